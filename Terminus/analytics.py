@@ -0,0 +1,294 @@
+"""
+Graph analytics over the exported knowledge graphs.
+
+The graph is turned into an edge list of integer node indices once, and
+every measure is a sparse matrix operation on it (SciPy CSR), so a million
+edges take seconds:
+
+  - degree, counted over links in both directions;
+  - connected components, ignoring link direction;
+  - communities by label propagation;
+  - PageRank on one relation, e.g. the people's vouches_for trust graph;
+  - co-occurrence of attribute values on the same documents, e.g. which
+    topics go with which blockchain ecosystems.
+
+annotate_graph stores the per-node measures on the graph's entities, which
+is how they get into the export, and search_updates turns them into
+partial documents for the sortable fields of the search index:
+
+    python analytics.py ../src/components/CTA/knowledge_graph.bin --index people
+"""
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from search import short_id
+
+EdgeList = namedtuple('EdgeList', 'ids sources targets relation relation_types entities')
+
+# relation PageRank runs on, per document type
+TRUST = {'person': 'vouches_for'}
+# entity fields written by annotate_graph
+METRICS = ('degree', 'component_size', 'community', 'pagerank')
+COUNTS = ('degree', 'component_size')
+
+DAMPING = 0.85
+PROPAGATION_ROUNDS = 50
+
+
+def edge_list(graph):
+    """Index the nodes of a {'entities', 'relations'} graph."""
+    ids = [entity['id'] for entity in graph['entities']]
+    index = {entity_id: i for i, entity_id in enumerate(ids)}
+    entities = len(ids)
+    for relation in graph['relations']:
+        for end in (relation['source'], relation['target']):
+            if end not in index:
+                index[end] = len(ids)
+                ids.append(end)
+    relation_types = list(dict.fromkeys(r['type'] for r in graph['relations']))
+    kind = {t: i for i, t in enumerate(relation_types)}
+    relations = graph['relations']
+    return EdgeList(ids,
+                    np.fromiter((index[r['source']] for r in relations), np.int64, len(relations)),
+                    np.fromiter((index[r['target']] for r in relations), np.int64, len(relations)),
+                    np.fromiter((kind[r['type']] for r in relations), np.int64, len(relations)),
+                    relation_types, entities)
+
+
+def edge_list_from_arrays(arrays):
+    """The same from graph_format.decode_arrays, without building dicts."""
+    offsets = arrays.offsets.astype(np.int64)
+    sources = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    return EdgeList(arrays.ids, sources, arrays.targets.astype(np.int64),
+                    arrays.relation_type.astype(np.int64), list(arrays.relation_types),
+                    arrays.entities)
+
+
+def adjacency(edges, relation=None, symmetric=False):
+    """Sparse adjacency (nodes x nodes), of one relation type if given."""
+    keep = slice(None)
+    if relation is not None:
+        if relation not in edges.relation_types:
+            keep = np.zeros(len(edges.sources), dtype=bool)
+        else:
+            keep = edges.relation == edges.relation_types.index(relation)
+    sources, targets = edges.sources[keep], edges.targets[keep]
+    if symmetric:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    n = len(edges.ids)
+    matrix = sparse.csr_matrix((np.ones(len(sources)), (sources, targets)), shape=(n, n))
+    # the same link listed twice still counts once
+    matrix.data[:] = 1
+    return matrix
+
+
+def degrees(edges):
+    return np.asarray(adjacency(edges, symmetric=True).sum(axis=1)).ravel().astype(np.int64)
+
+
+def components(edges):
+    """Component label of every node, ignoring link direction."""
+    _, labels = csgraph.connected_components(adjacency(edges), directed=True, connection='weak')
+    return labels
+
+
+def _row_argmax(matrix, default):
+    # csr_matrix.argmax(axis=1) loops in Python; this is the same with
+    # reduceat, `default` for empty rows
+    matrix.sum_duplicates()
+    best = default.copy()
+    filled = np.diff(matrix.indptr) > 0
+    if not filled.any():
+        return best
+    row = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    top = np.maximum.reduceat(matrix.data, matrix.indptr[:-1][filled])
+    peak = np.zeros(matrix.shape[0])
+    peak[filled] = top
+    hit = np.nonzero(matrix.data == peak[row])[0]
+    # first maximum of each row
+    hit = hit[np.r_[True, row[hit][1:] != row[hit][:-1]]]
+    best[row[hit]] = matrix.indices[hit]
+    return best
+
+
+def communities(edges, rounds=PROPAGATION_ROUNDS, seed=0):
+    """
+    Label propagation: every node repeatedly takes the label most common
+    among its neighbours, keeping its own on a tie. Only a random half of
+    the nodes is updated per round, which keeps bipartite graphs (documents
+    <-> attribute values) from flipping back and forth. Returns one label
+    per node.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = adjacency(edges, symmetric=True).tocoo()
+    rows, cols = matrix.row, matrix.col
+    n = len(edges.ids)
+    labels = np.arange(n)
+    has_neighbours = np.bincount(rows, minlength=n) > 0
+    for _ in range(rounds):
+        # votes[i, l] = number of i's neighbours labelled l. Random noise
+        # breaks ties between other labels, and the node's own label gets
+        # a bonus above the noise so it only changes for a strictly better one.
+        neighbour = labels[cols]
+        weight = 1 + rng.random(len(rows)) * 1e-3 + (neighbour == labels[rows]) * 1e-2
+        votes = sparse.csr_matrix((weight, (rows, neighbour)), shape=(n, n))
+        best = _row_argmax(votes, labels)
+        update = has_neighbours & (rng.random(n) < 0.5)
+        changed = update & (best != labels)
+        labels[changed] = best[changed]
+        if changed.sum() <= n * 1e-4:
+            break
+    return labels
+
+
+def pagerank(edges, relation=None, damping=DAMPING, tol=1e-10, max_iter=200):
+    """
+    PageRank of the entities over `relation` links between them (all links
+    if None), summing to 1. Attribute values take no part.
+    """
+    matrix = adjacency(edges, relation)[:edges.entities, :edges.entities]
+    n = matrix.shape[0]
+    out = np.asarray(matrix.sum(axis=1)).ravel()
+    dangling = out == 0
+    inverse = np.divide(1.0, out, out=np.zeros(n), where=~dangling)
+    transposed = matrix.T.tocsr()
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        spread = damping * (transposed @ (rank * inverse))
+        spread += (damping * rank[dangling].sum() + 1 - damping) / n
+        if np.abs(spread - rank).sum() < tol:
+            return spread
+        rank = spread
+    return rank
+
+
+def cooccurrence(edges, first, second):
+    """
+    How often a `first` value (e.g. 'topic') appears on the same document
+    as a `second` one (e.g. 'blockchain ecosystem'), with the lift over
+    what independent values would give. Sorted by count.
+    """
+    a, b = adjacency(edges, first), adjacency(edges, second)
+    counts = (a.T @ b).tocoo()
+    documents = max(np.count_nonzero(np.asarray((a + b).sum(axis=1)).ravel()), 1)
+    frequency_a = np.asarray(a.sum(axis=0)).ravel()
+    frequency_b = np.asarray(b.sum(axis=0)).ravel()
+    pairs = pd.DataFrame({
+        first: [edges.ids[i] for i in counts.row],
+        second: [edges.ids[i] for i in counts.col],
+        'count': counts.data.astype(np.int64),
+        'lift': counts.data * documents / (frequency_a[counts.row] * frequency_b[counts.col]),
+    })
+    return pairs.sort_values(['count', 'lift'], ascending=False, ignore_index=True)
+
+
+def _representatives(labels, degree, ids):
+    """Name every group after its best-connected member (ties by ID)."""
+    order = np.lexsort((np.array(ids, dtype=object), -degree, labels))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = labels[order][1:] != labels[order][:-1]
+    names = np.empty(labels.max() + 1, dtype=object)
+    names[labels[order][first]] = np.array(ids, dtype=object)[order][first]
+    return names[labels]
+
+
+def node_metrics(edges, trust=None):
+    """One row of measures per entity, indexed by entity ID."""
+    degree = degrees(edges)
+    component = components(edges)
+    community = communities(edges)
+    metrics = pd.DataFrame({
+        'degree': degree,
+        'component_size': np.bincount(component)[component],
+        'community': _representatives(community, degree, edges.ids),
+    }, index=edges.ids).iloc[:edges.entities]
+    if trust is not None:
+        metrics['pagerank'] = pagerank(edges, trust)
+    return metrics
+
+
+def annotate_graph(graph, doc_type):
+    """
+    Store the measures on the entities of `graph`, in place. Returns the
+    measures that changed with their previous values, as {entity ID:
+    {measure: previous value or None}}.
+    """
+    metrics = node_metrics(edge_list(graph), TRUST.get(doc_type))
+    changed = {}
+    for entity, row in zip(graph['entities'], metrics.itertuples(index=False)):
+        values = row._asdict()
+        values = {k: v.item() if isinstance(v, np.generic) else v for k, v in values.items()}
+        if 'pagerank' in values:
+            # six significant digits survive the float32 column of the binary
+            # graph, so a reloaded graph compares equal
+            values['pagerank'] = float(f"{values['pagerank']:.6g}")
+        previous = {k: entity.get(k) for k, v in values.items() if entity.get(k) != v}
+        if previous:
+            entity.update(values)
+            changed[entity['id']] = previous
+    return changed
+
+
+def search_updates(graph):
+    """Partial search documents carrying the measures of every document node."""
+    updates = []
+    for entity in graph['entities']:
+        if entity.get('type') == 'attribute' or 'degree' not in entity:
+            continue
+        update = {'id': short_id(entity['id'])}
+        update.update({k: entity[k] for k in METRICS if k in entity})
+        for key in COUNTS:
+            # counts come back as floats from the binary graph's number columns
+            if key in update:
+                update[key] = int(update[key])
+        if 'community' in update:
+            update['community'] = short_id(update['community'])
+        updates.append(update)
+    return updates
+
+
+if __name__ == '__main__':
+    from graph_format import load_graph
+
+    parser = argparse.ArgumentParser(description="Summarize a knowledge graph and push its measures to search")
+    parser.add_argument("graph", help="knowledge_graph.bin (or .json)")
+    parser.add_argument("--type", choices=["Organization", "person"],
+                        help="document type, guessed from the entity types if not given")
+    parser.add_argument("--index", help="Meilisearch index to add the measures to, e.g. people")
+    parser.add_argument("--meilisearch", default="https://ms-9ea4a96f02a8-1969.sfo.meilisearch.io")
+    parser.add_argument("--meilisearch-key", default=os.environ.get("MEILISEARCH_KEY"),
+                        help="admin key, needed with --index (default: $MEILISEARCH_KEY)")
+    args = parser.parse_args()
+    if args.index and not args.meilisearch_key:
+        sys.exit("--index needs a Meilisearch key: pass --meilisearch-key or set MEILISEARCH_KEY")
+
+    graph = load_graph(args.graph)
+    doc_type = args.type or ('person' if any(e['type'] == 'person' for e in graph['entities'])
+                             else 'Organization')
+    annotate_graph(graph, doc_type)
+    edges = edge_list(graph)
+    metrics = pd.DataFrame(graph['entities']).set_index('id')
+    print(f"{edges.entities} entities, {len(edges.sources)} relations, "
+          f"{len(set(components(edges)))} components, {metrics['community'].nunique()} communities")
+    print(metrics.sort_values('degree', ascending=False)[['label', 'degree', 'community']].head(10))
+    if 'pagerank' in metrics:
+        print(metrics.sort_values('pagerank', ascending=False)[['label', 'pagerank']].head(10))
+    if {'topic', 'blockchain ecosystem'} <= set(edges.relation_types):
+        print(cooccurrence(edges, 'topic', 'blockchain ecosystem').head(20))
+
+    if args.index:
+        import meilisearch
+        from search_sink import SearchSink
+
+        index = meilisearch.Client(args.meilisearch, args.meilisearch_key).index(args.index)
+        sink = SearchSink(index, partial=True)
+        sink.add(search_updates(graph))
+        sink.close()
+        print(sink.report())
@@ -0,0 +1,64 @@
+"""
+Near-duplicate detection cost and quality: synthetic organizations with
+injected variants (case, punctuation, trailing whitespace, "www." and
+trailing slashes on the website), timed at growing sizes, with the
+number of comparisons against all pairs and how many variants are found.
+
+    python benchmarks/bench_dedup.py [organizations ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dedup import Deduplicator
+
+WORDS = ("regen carbon dao forest soil water climate solar coop land seed bio "
+         "earth green impact chain token credit farm ocean").split()
+
+
+def variant(record, rng):
+    name, site = record['name'], record['assignee']
+    change = rng.randrange(4)
+    if change == 0:
+        name = name.upper() + '\n'
+    elif change == 1:
+        name = name.replace(' ', '-') + '!'
+    elif change == 2:
+        site = site.replace('https://', 'http://www.') + '/'
+    else:
+        name, site = name.title() + ' ', ''
+    return {'name': name, 'assignee': site}
+
+
+def synthetic(count, duplicates=0.05, seed=1):
+    """Records, and {variant index: original index} of the injected duplicates."""
+    rng = random.Random(seed)
+    records, truth = [], {}
+    for n in range(count):
+        if records and rng.random() < duplicates:
+            original = rng.randrange(len(records))
+            while original in truth:
+                original = truth[original]
+            truth[len(records)] = original
+            records.append(variant(records[original], rng))
+        else:
+            name = ' '.join(rng.sample(WORDS, 2)) + f" {n}"
+            records.append({'name': name, 'assignee': f"https://org{n}.example.org"})
+    return records, truth
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+    for count in sizes:
+        records, truth = synthetic(count)
+        duplicates = Deduplicator(url_fields=('assignee',))
+        start = time.perf_counter()
+        matches = {i: duplicates.add(i, record) for i, record in enumerate(records)}
+        elapsed = time.perf_counter() - start
+        found = sum(matches[i] == j for i, j in truth.items())
+        wrong = sum(m is not None and truth.get(i) != m for i, m in matches.items())
+        print(f"{count:>7} records: {elapsed:.2f}s, {duplicates.comparisons} comparisons "
+              f"({duplicates.comparisons / (count * (count - 1) / 2):.3%} of all pairs), "
+              f"{found}/{len(truth)} duplicates found, {wrong} false")
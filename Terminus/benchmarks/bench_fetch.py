@@ -0,0 +1,47 @@
+"""
+Wall-clock benchmark for fetching Murmurations profiles.
+
+Starts a local stub server with ~1k profiles and a fixed per-request delay,
+then compares the old serial requests.get loop (which fetched most profiles
+twice) with ProfileFetcher.
+
+    python benchmarks/bench_fetch.py [profiles] [delay_seconds]
+"""
+import os
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetcher import ProfileFetcher
+from stub_server import StubServer
+
+
+def serial(urls):
+    # what murmuration/insert_data.py did: one bare GET per profile, twice
+    for _ in range(2):
+        for url in urls:
+            requests.get(url, headers={'accept': 'application/json'}).json()
+
+
+def pooled(urls):
+    with ProfileFetcher() as fetcher:
+        fetcher.fetch_all(urls)
+        # the second pass is served from the in-run cache
+        for url in urls:
+            fetcher.get_json(url)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    with StubServer(count=count, delay=delay) as server:
+        urls = list(server.profiles)
+        for name, fn in (('serial requests.get', serial), ('ProfileFetcher', pooled)):
+            server.hits = 0
+            start = time.perf_counter()
+            fn(urls)
+            elapsed = time.perf_counter() - start
+            print(f"{name:20s} {elapsed:8.2f}s  {server.hits:6d} requests  "
+                  f"{count / elapsed:8.1f} profiles/s")
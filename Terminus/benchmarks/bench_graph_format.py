@@ -0,0 +1,36 @@
+"""
+Size and load time of the knowledge graph as JSON and in the binary form
+of graph_format.py, for synthetic organization graphs of growing size.
+
+    python benchmarks/bench_graph_format.py [organizations ...]
+"""
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_subgraph import synthetic
+from graph_format import decode_arrays, decode_graph, encode_graph
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    print(f"{'orgs':>7} {'json KB':>9} {'bin KB':>8} {'ratio':>6} {'json.gz':>8} {'bin.gz':>7} "
+          f"{'json ms':>8} {'bin ms':>7} {'arrays ms':>9}")
+    for count in sizes:
+        _, graph = synthetic(count)
+        as_json = json.dumps(graph).encode('utf-8')
+        as_bin = encode_graph(graph)
+        print(f"{count:>7} {len(as_json) / 1024:>9.0f} {len(as_bin) / 1024:>8.0f} "
+              f"{len(as_json) / len(as_bin):>6.1f} {len(gzip.compress(as_json)) / 1024:>8.0f} "
+              f"{len(gzip.compress(as_bin)) / 1024:>7.0f} {timed(lambda: json.loads(as_json)):>8.1f} "
+              f"{timed(lambda: decode_graph(as_bin)):>7.1f} {timed(lambda: decode_arrays(as_bin)):>9.1f}")
@@ -0,0 +1,211 @@
+"""
+End-to-end ingestion benchmark, entirely offline.
+
+Runs the real loaders, Terminus/insert_data.py on a synthetic
+Organizations.csv and murmuration/insert_data.py against a stub
+Murmurations index (stub_server.py), with WOQLClient replaced by
+fake_terminusdb.FakeWOQLClient and meilisearch.Client pointed at
+fake_meilisearch.FakeMeilisearch, then exports the knowledge graph the
+way the json_graph.py exporters do (graph_delta.update_graph). Every
+scenario runs in its own process, so peak RSS is its own; the fake
+TerminusDB is in that process and its store counts towards it.
+
+Reports rows/s of the load, the export time, peak RSS and where the time
+went: fetching profiles, transforming rows, duplicate detection, calls to
+TerminusDB and Meilisearch, layout and analytics, and everything else.
+
+    python benchmarks/bench_ingest.py [--orgs N ...] [--people N ...]
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(here)
+from fake_meilisearch import FakeMeilisearch
+from stub_server import StubServer
+
+STAGES = ('fetch', 'transform', 'dedup', 'terminusdb', 'meilisearch', 'layout', 'analytics')
+
+
+def synthetic_csv(rows, path, source=os.path.join(here, 'Organizations.csv')):
+    """Organizations.csv rows repeated to `rows`, each with its own name and website."""
+    with open(source, newline='') as f:
+        header, *data = list(csv.reader(f))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for n in range(rows):
+            row = list(data[n % len(data)])
+            row[0] = f"https://org{n}.example.org/"
+            row[6] = f"{row[6]} {n}"
+            writer.writerow(row)
+
+
+class Stages:
+    """Wall-clock time per stage, taken by wrapping the functions doing the work."""
+
+    def __init__(self):
+        self.seconds = Counter()
+        self._active = None
+
+    def wrap(self, owner, attribute, stage):
+        function = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            # time spent in a stage called from another one belongs to the outer one
+            if self._active is not None:
+                return function(*args, **kwargs)
+            self._active = stage
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                self._active = None
+
+        setattr(owner, attribute, timed)
+
+
+def run_script(path, argv):
+    sys.argv = [path] + argv
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            runpy.run_path(path, run_name='__main__')
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                raise
+
+
+def scenario(args):
+    """Run one load and export in this process, return its measurements."""
+    import meilisearch
+    import terminusdb_client
+    from meilisearch._httprequests import HttpRequests
+
+    import knowledge_graph
+    import organizations
+    from dedup import Deduplicator
+    from fake_terminusdb import FakeWOQLClient
+    from fetcher import ProfileFetcher
+    from graph_delta import update_graph
+
+    client = FakeWOQLClient(latency=args.latency)
+    connect = meilisearch.Client
+    terminusdb_client.WOQLClient = lambda *a, **kw: client
+    meilisearch.Client = lambda *a, **kw: connect(args.meilisearch, 'masterKey')
+    # the loaders refuse to index without a key
+    os.environ['MEILISEARCH_KEY'] = 'masterKey'
+
+    stages = Stages()
+    for method in ('insert_document', 'replace_document', 'delete_document', 'get_document',
+                   'query_document', 'query'):
+        stages.wrap(FakeWOQLClient, method, 'terminusdb')
+    stages.wrap(HttpRequests, 'send_request', 'meilisearch')
+    stages.wrap(ProfileFetcher, 'fetch_all', 'fetch')
+    stages.wrap(ProfileFetcher, 'get_json', 'fetch')
+    stages.wrap(organizations, 'transform_chunk', 'transform')
+    stages.wrap(Deduplicator, 'add', 'dedup')
+    stages.wrap(knowledge_graph, 'layout_graph', 'layout')
+    stages.wrap(knowledge_graph, 'annotate_graph', 'analytics')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.scenario == 'orgs':
+            doc_type = 'Organization'
+            path = os.path.join(tmp, 'Organizations.csv')
+            synthetic_csv(args.rows, path)
+            script = os.path.join(here, 'insert_data.py')
+            argv = [path, '--workers', str(args.workers)]
+        else:
+            doc_type = 'person'
+            sys.path.insert(0, os.path.join(here, 'murmuration'))
+            script = os.path.join(here, 'murmuration', 'insert_data.py')
+            argv = ['--cache', os.path.join(tmp, 'cache.sqlite'), '--nodes-url', args.nodes_url]
+
+        start = time.perf_counter()
+        run_script(script, argv)
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        update_graph(client, doc_type, os.path.join(tmp, 'knowledge_graph.bin'))
+        export = time.perf_counter() - start
+
+    return {
+        'scenario': args.scenario,
+        'rows': args.rows,
+        'stored': client.stored().get(doc_type, 0),
+        'load_seconds': load,
+        'export_seconds': export,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'terminusdb_bytes': client.bytes_sent + client.bytes_received,
+        'stages': dict(stages.seconds),
+    }
+
+
+def measure(name, rows, args, **extra):
+    command = [sys.executable, os.path.abspath(__file__), '--scenario', name, '--rows', str(rows),
+               '--meilisearch', args.meilisearch, '--latency', str(args.latency),
+               '--workers', str(args.workers)]
+    for option, value in extra.items():
+        command += [f"--{option.replace('_', '-')}", value]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def report(result):
+    total = result['load_seconds'] + result['export_seconds']
+    stages = result['stages']
+    other = total - sum(stages.values())
+    breakdown = '  '.join(f"{stage} {stages[stage]:.2f}s" for stage in STAGES if stages.get(stage))
+    print(f"{result['scenario']:>6} {result['rows']:>8} rows: "
+          f"load {result['load_seconds']:6.2f}s ({result['rows'] / result['load_seconds']:7.0f} rows/s), "
+          f"export {result['export_seconds']:5.2f}s, peak RSS {result['peak_rss_mb']:6.0f} MB, "
+          f"{result['stored']} stored, {result['terminusdb_bytes'] / 2 ** 20:.0f} MB to/from TerminusDB")
+    print(f"{'':>22}{breakdown}  other {other:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end ingestion benchmark against local fakes")
+    parser.add_argument("--orgs", type=int, nargs="*", default=[10000],
+                        help="synthetic Organizations.csv sizes (default: 10000)")
+    parser.add_argument("--people", type=int, nargs="*", default=[2000],
+                        help="synthetic Murmurations profile counts (default: 2000)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every TerminusDB call")
+    parser.add_argument("--task-delay", type=float, default=0.0,
+                        help="seconds every Meilisearch task takes")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="--workers for Terminus/insert_data.py")
+    parser.add_argument("--json", help="also write the measurements to this file")
+    # used for the per-scenario child processes
+    parser.add_argument("--scenario", choices=('orgs', 'people'), help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--meilisearch", help=argparse.SUPPRESS)
+    parser.add_argument("--nodes-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(scenario(args)))
+        sys.exit(0)
+
+    results = []
+    with FakeMeilisearch(task_delay=args.task_delay) as fake:
+        args.meilisearch = fake.url
+        for rows in args.orgs:
+            results.append(measure('orgs', rows, args))
+            report(results[-1])
+        for count in args.people:
+            with StubServer(count=count) as server:
+                results.append(measure('people', count, args, nodes_url=server.nodes_url))
+            report(results[-1])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
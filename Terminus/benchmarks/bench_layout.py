@@ -0,0 +1,58 @@
+"""
+Layout cost and accuracy: the Barnes-Hut repulsion of layout.py against
+the exact O(n^2) sum, and full versus incremental layouts of synthetic
+organization graphs. The incremental cost should follow the number of
+new organizations, not the size of the graph.
+
+    python benchmarks/bench_layout.py [organizations ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_subgraph import synthetic
+from layout import EDGE_LENGTH, layout_graph, repulsion
+
+
+def exact_repulsion(positions, k):
+    delta = positions[:, None, :] - positions[None, :, :]
+    distance2 = (delta ** 2).sum(axis=2)
+    np.fill_diagonal(distance2, np.inf)
+    return (delta * (k * k / distance2)[..., None]).sum(axis=1)
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [100, 500, 2000]
+    for count in sizes:
+        _, graph = synthetic(count)
+        start = time.perf_counter()
+        layout_graph(graph)
+        full = time.perf_counter() - start
+
+        positions = np.array([(e['x'], e['y']) for e in graph['entities']])
+        start = time.perf_counter()
+        approx = repulsion(positions, EDGE_LENGTH)
+        step = time.perf_counter() - start
+        error = ''
+        if len(positions) <= 5000:
+            exact = exact_repulsion(positions, EDGE_LENGTH)
+            relative = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+            error = f", force error median {np.median(relative):.2%} p95 {np.percentile(relative, 95):.2%}"
+
+        print(f"{len(positions):>6} nodes: full {full:.2f}s ({step * 1000:.1f}ms/step{error})")
+
+        laid_out = [dict(entity) for entity in graph['entities']]
+        for new_count in (1, 10, 100):
+            graph['entities'] = [dict(entity) for entity in laid_out]
+            new = [f'Organization/new{i}' for i in range(new_count)]
+            for i, entity_id in enumerate(new):
+                graph['entities'].append({'id': entity_id, 'label': entity_id, 'type': 'organization'})
+                graph['relations'].append({'source': entity_id, 'target': f'topic{i % 10 + 1}',
+                                           'type': 'topic'})
+            start = time.perf_counter()
+            moved = layout_graph(graph, set(new))
+            incremental = time.perf_counter() - start
+            print(f"{'':>6}  {new_count:>3} new orgs: {incremental:.3f}s, {len(moved)} nodes moved")
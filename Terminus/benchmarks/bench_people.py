@@ -0,0 +1,49 @@
+"""
+Scaling benchmark for resolving the Murmurations `knows` graph.
+
+Builds synthetic profile graphs and times people.build_people against the
+old resolution loop, which scanned profile_urls.values() for every
+`knows` entry (only run on the smaller sizes, it is quadratic).
+
+    python benchmarks/bench_people.py [sizes...]
+"""
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(here, 'murmuration'))
+from people import build_people
+from stub_server import make_profiles
+
+LEGACY_LIMIT = 5000
+
+
+def legacy(profiles):
+    # the relationship pass of the old murmuration/insert_data.py
+    profile_urls = {p['primary_url']: url for url, p in profiles.items()}
+    people_dict = {p['name']: p for p in profiles.values()}
+    edges = 0
+    for profile in profiles.values():
+        for person_data in profile.get('knows', []):
+            if person_data.get('url') not in profile_urls.values():
+                continue
+            if person_data.get('name') in people_dict:
+                edges += 1
+    return edges
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 5000, 10000, 100000]
+    print(f"{'people':>8} {'edges':>8} {'build_people':>13} {'legacy':>10}")
+    for size in sizes:
+        profiles = make_profiles('https://murmurations.example.org', size, knows=5)
+        elapsed = timed(build_people, profiles)
+        old = f"{timed(legacy, profiles):9.3f}s" if size <= LEGACY_LIMIT else '        -'
+        print(f"{size:8d} {size * 5:8d} {elapsed:12.3f}s {old}")
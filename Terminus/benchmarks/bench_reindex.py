@@ -0,0 +1,53 @@
+"""
+Availability of the live index during search_sink.rebuild_index, against
+the local fake Meilisearch. A reader thread polls the live index's document
+count while the shadow is filled and swapped in; it should never drop.
+
+    python benchmarks/bench_reindex.py [documents] [task_delay_seconds]
+"""
+import os
+import sys
+import threading
+import time
+
+import meilisearch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_search_sink import synthetic_documents
+from fake_meilisearch import FakeMeilisearch
+from search_sink import SearchSink, rebuild_index
+
+
+def watch(index, counts, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        count = index.get_stats().number_of_documents
+        counts.append((count, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    with FakeMeilisearch(task_delay=delay) as fake:
+        client = meilisearch.Client(fake.url, 'masterKey')
+        live = client.index('people')
+        sink = SearchSink(live)
+        sink.add(synthetic_documents(count))
+        sink.close()
+
+        counts, stop = [], threading.Event()
+        reader = threading.Thread(target=watch, args=(live, counts, stop))
+        reader.start()
+        start = time.perf_counter()
+        rebuild_index(client, 'people', synthetic_documents(count + 1000), expected=count + 1000,
+                      max_bytes=1024 * 1024)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reader.join()
+
+        seen = [c for c, _ in counts]
+        latencies = sorted(s for _, s in counts)
+        print(f"rebuilt {count + 1000} documents in {elapsed:.2f}s")
+        print(f"live index during rebuild: {len(seen)} reads, min {min(seen)} docs, "
+              f"max {max(seen)} docs, p99 read {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+        print(f"indexes left: {sorted(fake.indexes)}")
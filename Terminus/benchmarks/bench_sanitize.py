@@ -0,0 +1,61 @@
+"""
+Micro-benchmark for emoji stripping on Organizations.csv.
+
+Compares the old per-cell regex rebuild against sanitize.sanitize_row and
+prints rows/second for both.
+
+    python benchmarks/bench_sanitize.py [path/to/Organizations.csv] [repeat]
+"""
+import csv
+import os
+import re
+import sys
+import time
+
+import emoji
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sanitize
+
+
+def legacy_remove_emojis(string):
+    # What insert_data.py used to do for every cell
+    emojis = sorted(emoji.EMOJI_DATA, key=len, reverse=True)
+    pattern = u'(' + u'|'.join(re.escape(u) for u in emojis) + u')'
+    return re.compile(pattern).sub(r'', string)
+
+
+def load_rows(path):
+    with open(path) as file:
+        csv_file = csv.reader(file)
+        next(csv_file)
+        return list(csv_file)
+
+
+def rows_per_second(fn, rows, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            fn(row)
+    return len(rows) * repeat / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, 'Organizations.csv')
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rows = load_rows(path)
+
+    # the legacy path is slow enough that a handful of rows is plenty
+    legacy_rows = rows[:20]
+    legacy = rows_per_second(
+        lambda row: [legacy_remove_emojis(cell) for cell in row], legacy_rows, 1)
+
+    sanitize.remove_emojis.cache_clear()
+    cold = rows_per_second(sanitize.sanitize_row, rows, 1)
+    warm = rows_per_second(sanitize.sanitize_row, rows, repeat)
+
+    print(f"rows: {len(rows)}")
+    print(f"legacy regex per cell: {legacy:12.1f} rows/s")
+    print(f"sanitize (cold cache): {cold:12.1f} rows/s  ({cold / legacy:.0f}x)")
+    print(f"sanitize (warm cache): {warm:12.1f} rows/s  ({warm / legacy:.0f}x)")
@@ -0,0 +1,41 @@
+"""
+Indexing throughput of search_sink.SearchSink against a local fake
+Meilisearch (benchmarks/fake_meilisearch.py).
+
+    python benchmarks/bench_search_sink.py [documents] [task_delay_seconds]
+"""
+import os
+import sys
+import time
+
+import meilisearch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_meilisearch import FakeMeilisearch
+from search_sink import SearchSink
+
+
+def synthetic_documents(count):
+    for n in range(count):
+        yield {
+            'id': str(n),
+            'name': f"organization {n}",
+            'description': 'lorem ipsum ' * 20,
+            'topic': ['Land', 'Water'],
+            'upvotes': n % 50,
+        }
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    with FakeMeilisearch(task_delay=delay, max_payload=2 * 1024 * 1024, fail_every=7) as fake:
+        index = meilisearch.Client(fake.url, 'masterKey').index('orgs')
+        sink = SearchSink(index, max_bytes=1024 * 1024, max_in_flight=4)
+        start = time.perf_counter()
+        sink.add(synthetic_documents(count))
+        sink.close()
+        elapsed = time.perf_counter() - start
+        print(sink.report().splitlines()[0])
+        print(f"{len(sink.results)} batches, {len(sink.failures)} failed (injected), "
+              f"{len(fake.indexes.get('orgs', {}))} documents stored, {elapsed:.2f}s")
@@ -0,0 +1,58 @@
+"""
+Similar-organization index build: exact batched sparse products against
+MinHash-LSH on synthetic organizations, the share of the exact top-k
+similarity that LSH recovers, and the cost of a lookup.
+
+    python benchmarks/bench_similar.py [organizations ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from similar import SimilarIndex, exact_neighbours, lsh_neighbours, vectorize
+
+EXACT_MAX = 50000
+
+
+def synthetic(count, seed=1):
+    """Organizations with Zipf-distributed topics, impact areas and ecosystems."""
+    rng = np.random.default_rng(seed)
+
+    def draw(values, size):
+        weights = 1 / np.arange(1, values + 1)
+        return rng.choice(values, size, replace=False, p=weights / weights.sum())
+
+    return [{'@id': f"Organization/{n:064x}", 'name': f"organization {n}",
+             'topic': [f"topic{v}" for v in draw(400, 3)],
+             'impactarea': [f"impact{v}" for v in draw(40, 2)],
+             'blockchainecosystem': [f"chain{v}" for v in draw(30, 1)]}
+            for n in range(count)]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [5000, 20000, 100000]
+    for count in sizes:
+        records = synthetic(count)
+        vectors = vectorize(records)
+        (neighbours, similarity), lsh = timed(lsh_neighbours, vectors)
+        line = f"{count:>7} organizations: lsh {lsh:.2f}s"
+        if count <= EXACT_MAX:
+            (_, best), exact = timed(exact_neighbours, vectors)
+            line += f", exact {exact:.2f}s, lsh recovers {similarity.sum() / best.sum():.1%} of the top-k similarity"
+        index = SimilarIndex([r['@id'] for r in records], [r['name'] for r in records],
+                             neighbours, similarity)
+        ids = [r['@id'][-64:] for r in records[:1000]]
+        start = time.perf_counter()
+        for document_id in ids:
+            index.similar(document_id)
+        line += f", lookup {(time.perf_counter() - start) / len(ids) * 1e6:.1f}us"
+        print(line)
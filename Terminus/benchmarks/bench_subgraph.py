@@ -0,0 +1,79 @@
+"""
+Subgraph assembly for search hits: the list-scanning approach the views
+used (ported from cytoscape.ts) against subgraph.SubgraphIndex, cold and
+through the service's LRU cache.
+
+    python benchmarks/bench_subgraph.py [organizations] [hits]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from subgraph import SubgraphIndex, SubgraphService
+
+TOPICS = [f"topic{n}" for n in range(300)]
+WEB3 = [f"web3 {n}" for n in range(20)]
+
+
+def synthetic(count):
+    random.seed(1)
+    hits, entities, relations = [], [], []
+    for n in range(count):
+        document = {'id': f"{n:064x}", 'name': f"organization {n}",
+                    'topic': random.sample(TOPICS, 3), 'web3': random.sample(WEB3, 2)}
+        hits.append(document)
+        org = 'Organization/' + document['id']
+        entities.append({'id': org, 'label': document['name'], 'type': 'organization'})
+        for field in ('topic', 'web3'):
+            relations.extend({'source': org, 'target': v, 'type': field} for v in document[field])
+    entities.extend({'id': t, 'label': t, 'type': 'attribute'} for t in TOPICS + WEB3)
+    return hits, {'entities': entities, 'relations': relations}
+
+
+def scan(hits):
+    entities, relations = [], []
+    for document in hits:
+        org = 'Organization/' + document['id']
+        if not next((e for e in entities if e['id'] == org), None):
+            entities.append({'id': org, 'label': document['name'], 'type': 'organization'})
+        for field in ('topic', 'web3'):
+            for value in document[field]:
+                if not next((e for e in entities if e['id'] == value), None):
+                    entities.append({'id': value, 'label': value, 'type': 'attribute'})
+                if not next((r for r in relations if r['source'] == org and r['target'] == value), None):
+                    relations.append({'source': org, 'target': value, 'type': field})
+    return {'entities': entities, 'relations': relations}
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:>22}: {(time.perf_counter() - start) / repeat * 1000:9.2f} ms")
+    return result
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    hit_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    documents, graph = synthetic(count)
+    hits = documents[:hit_count]
+    ids = [hit['id'] for hit in hits]
+
+    slow = timed("list scan", lambda: scan(hits))
+    index = timed("build index", lambda: SubgraphIndex(graph))
+    fast = timed("indexed subgraph", lambda: index.subgraph(ids), repeat=20)
+    assert {e['id'] for e in slow['entities']} == {e['id'] for e in fast['entities']}
+    assert len(slow['relations']) == len(fast['relations'])
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(graph, f)
+    service = SubgraphService({'orgs': f.name})
+    timed("service, cold", lambda: service.subgraph('orgs', ids=ids))
+    timed("service, cached", lambda: service.subgraph('orgs', ids=ids), repeat=100)
+    os.unlink(f.name)
+    print(f"{len(fast['entities'])} entities, {len(fast['relations'])} relations for {hit_count} hits")
@@ -0,0 +1,56 @@
+"""
+Throughput of the Organizations.csv transform stage (sanitize, enum
+normalization, date parsing) with 1, 2, ... worker processes, on a copy of
+the CSV repeated to `rows` rows. Also checks that the parallel output is
+identical and in the same order as the sequential one.
+
+    python benchmarks/bench_transform.py [rows] [workers ...]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(here)
+from normalize import UnknownValues
+from organizations import read_records
+
+
+def repeated_csv(rows, source=os.path.join(here, 'Organizations.csv')):
+    with open(source, newline='') as f:
+        header, *data = list(csv.reader(f))
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for n in range(rows):
+            row = list(data[n % len(data)])
+            # distinct names, so the cached string cleaning doesn't do all the work
+            row[6] = f"{row[6]} {n}"
+            writer.writerow(row)
+    return path
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    counts = [int(n) for n in sys.argv[2:]] or sorted({1, 2, os.cpu_count() or 1})
+    path = repeated_csv(rows)
+    try:
+        baseline = None
+        for workers in counts:
+            unknown = UnknownValues()
+            start = time.perf_counter()
+            records = [r for batch in read_records(path, 1000, unknown, workers=workers) for r in batch]
+            elapsed = time.perf_counter() - start
+            names = [r['name'] for r in records]
+            same = ''
+            if baseline is None:
+                baseline = names, unknown.report()
+            else:
+                same = ", same output" if (names, unknown.report()) == baseline else ", OUTPUT DIFFERS"
+            print(f"{workers:>2} workers: {len(records) / elapsed:9.0f} rows/s ({elapsed:.2f}s){same}")
+    finally:
+        os.remove(path)
+    print(f"({os.cpu_count()} cores available)")
@@ -0,0 +1,226 @@
+"""
+A local fake of the parts of the Meilisearch HTTP API the loaders use.
+
+Documents are kept in memory per index. Every write returns an enqueued
+task that reports success once `task_delay` seconds have passed, so task
+polling and backpressure behave like against the real engine. Payloads
+larger than `max_payload` bytes are rejected with 413, as Meilisearch does.
+
+    with FakeMeilisearch() as fake:
+        client = meilisearch.Client(fake.url, 'key')
+"""
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class FakeMeilisearch:
+
+    def __init__(self, task_delay=0.0, max_payload=100 * 1024 * 1024, fail_every=0):
+        self.task_delay = task_delay
+        self.max_payload = max_payload
+        # make every n-th document task fail, to exercise error reporting
+        self.fail_every = fail_every
+        self.indexes = {}
+        self.settings = {}
+        self.tasks = {}
+        self.requests = 0
+        self._next = 0
+        self._last_ready = 0.0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _task(self, index_uid, task_type, apply, fail=False):
+        with self._lock:
+            uid = len(self.tasks)
+            # tasks are processed one after another, like the real queue
+            self._last_ready = max(self._last_ready, time.monotonic()) + self.task_delay
+            self.tasks[uid] = {
+                'uid': uid, 'indexUid': index_uid, 'type': task_type,
+                'enqueuedAt': _now(), 'ready': self._last_ready,
+                'apply': apply, 'fail': fail, 'status': 'enqueued',
+            }
+        return {'taskUid': uid, 'indexUid': index_uid, 'status': 'enqueued',
+                'type': task_type, 'enqueuedAt': _now()}
+
+    def _process(self):
+        """Finish, in order, every task whose processing time has passed."""
+        now = time.monotonic()
+        with self._lock:
+            while self._next in self.tasks and self.tasks[self._next]['ready'] <= now:
+                task = self.tasks[self._next]
+                error = {'message': 'injected failure', 'code': 'internal'} \
+                    if task['fail'] else task['apply']()
+                if error:
+                    task['status'] = 'failed'
+                    task['error'] = error
+                else:
+                    task['status'] = 'succeeded'
+                task['finishedAt'] = _now()
+                self._next += 1
+
+    def _task_view(self, uid):
+        with self._lock:
+            task = self.tasks[uid]
+            return {k: v for k, v in task.items() if k not in ('ready', 'apply', 'fail')}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length)
+
+            def _route(self, method):
+                fake.requests += 1
+                url = urlsplit(self.path)
+                parts = [p for p in url.path.split('/') if p]
+                query = parse_qs(url.query)
+                body = self._body() if method in ('POST', 'PUT', 'PATCH') else b''
+                if len(body) > fake.max_payload:
+                    return self._send(413, {'code': 'payload_too_large'})
+                return fake.route(method, parts, query, body, self.headers)
+
+            def _dispatch(self, method):
+                status, body = self._route(method)
+                self._send(status, body)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_PATCH(self):
+                self._dispatch('PATCH')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+        return Handler
+
+    def _documents(self, body, headers):
+        if 'ndjson' in (headers.get('Content-Type') or ''):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        return json.loads(body or b'[]')
+
+    def route(self, method, parts, query, body, headers):
+        self._process()
+        if parts[:1] == ['tasks'] and len(parts) == 2 and method == 'GET':
+            uid = int(parts[1])
+            if uid not in self.tasks:
+                return 404, {'code': 'task_not_found'}
+            return 200, self._task_view(uid)
+
+        if parts == ['swap-indexes'] and method == 'POST':
+            swaps = [tuple(swap['indexes']) for swap in json.loads(body)]
+
+            def apply():
+                for a, b in swaps:
+                    if a not in self.indexes or b not in self.indexes:
+                        return {'message': f"index {a} or {b} not found", 'code': 'index_not_found'}
+                for a, b in swaps:
+                    self.indexes[a], self.indexes[b] = self.indexes[b], self.indexes[a]
+                    self.settings[a], self.settings[b] = self.settings.get(b, {}), self.settings.get(a, {})
+            return 202, self._task(None, 'indexSwap', apply)
+
+        if parts == ['indexes'] and method == 'POST':
+            uid = json.loads(body)['uid']
+
+            def apply():
+                if uid in self.indexes:
+                    return {'message': f"index {uid} already exists", 'code': 'index_already_exists'}
+                self.indexes[uid] = {}
+            return 202, self._task(uid, 'indexCreation', apply)
+
+        if parts[:1] != ['indexes'] or len(parts) < 2:
+            return 404, {'code': 'not_found'}
+        uid = parts[1]
+        rest = parts[2:]
+
+        if rest == ['documents'] and method in ('POST', 'PUT'):
+            documents = self._documents(body, headers)
+            key = (query.get('primaryKey') or ['id'])[0]
+            fail = bool(self.fail_every) and (len(self.tasks) + 1) % self.fail_every == 0
+
+            def apply():
+                index = self.indexes.setdefault(uid, {})
+                for document in documents:
+                    if method == 'PUT':
+                        # updates merge into the stored document
+                        document = {**index.get(str(document[key]), {}), **document}
+                    index[str(document[key])] = document
+            return 202, self._task(uid, 'documentAdditionOrUpdate', apply, fail)
+
+        if rest == ['documents'] and method == 'DELETE':
+
+            def apply():
+                self.indexes.setdefault(uid, {}).clear()
+            return 202, self._task(uid, 'documentDeletion', apply)
+
+        if rest == ['documents', 'delete-batch'] and method == 'POST':
+            ids = [str(i) for i in json.loads(body or b'[]')]
+            fail = bool(self.fail_every) and (len(self.tasks) + 1) % self.fail_every == 0
+
+            def apply():
+                index = self.indexes.setdefault(uid, {})
+                for i in ids:
+                    index.pop(i, None)
+            return 202, self._task(uid, 'documentDeletion', apply, fail)
+
+        if rest == ['settings'] and method == 'PATCH':
+            settings = json.loads(body or b'{}')
+
+            def apply():
+                self.indexes.setdefault(uid, {})
+                self.settings.setdefault(uid, {}).update(settings)
+            return 202, self._task(uid, 'settingsUpdate', apply)
+
+        if rest == ['stats'] and method == 'GET':
+            if uid not in self.indexes:
+                return 404, {'code': 'index_not_found'}
+            return 200, {'numberOfDocuments': len(self.indexes[uid]),
+                         'isIndexing': False, 'fieldDistribution': {}}
+
+        if rest == [] and method == 'DELETE':
+            def apply():
+                if self.indexes.pop(uid, None) is None:
+                    return {'message': f"index {uid} not found", 'code': 'index_not_found'}
+                self.settings.pop(uid, None)
+            return 202, self._task(uid, 'indexDeletion', apply)
+
+        return 404, {'code': 'not_found'}
@@ -0,0 +1,247 @@
+"""
+An in-process fake of the parts of WOQLClient the loaders and exporters use.
+
+Documents are kept per type as JSON strings, so every write and read pays
+for serialization the way a request to the real server would, and
+`bytes_sent`/`bytes_received` approximate the traffic. Every write is a
+commit; `log` reports the latest one and `diff_version` the documents
+inserted, deleted or modified between two of them (a modified document
+as one SwapValue per changed field, which is all graph_delta.py reads).
+Documents are read back with the short IDs ("person/abc") the real
+document API returns. WOQL is only understood for the queries this repo
+sends: counting documents of a type (documents.py) and selecting or
+deleting them (purge.py).
+
+    client = FakeWOQLClient()
+    client.connect(db="play", team="Myseelia")
+"""
+import hashlib
+import json
+import time
+from collections import Counter
+
+from terminusdb_client.woqlschema import DocumentTemplate
+
+from search import template_to_document
+
+PREFIX = "terminusdb:///data/"
+
+
+def _compress(value):
+    if isinstance(value, str):
+        return value[len(PREFIX):] if value.startswith(PREFIX) else value
+    if isinstance(value, list):
+        return [_compress(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _compress(v) for k, v in value.items()}
+    return value
+
+
+def _commit_number(version):
+    # "commit12", as returned by log
+    return int(version[len('commit'):])
+
+
+def _schema_type(triple):
+    # {'@type': 'Triple', ..., 'object': {'node': '@schema:person'}}
+    return triple['object']['node'].split(':', 1)[1]
+
+
+class FakeWOQLClient:
+
+    def __init__(self, server_url=None, latency=0.0):
+        self.server_url = server_url
+        # seconds added to every call, to mimic a round trip
+        self.latency = latency
+        self.db = self.team = None
+        self.branch = 'main'
+        self.documents = {}
+        self.commits = 0
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._ids = {}
+        self._next = 0
+        # (commit, document ID, payload before, payload after) for every change
+        self._changes = []
+
+    def connect(self, db=None, team=None, **kwargs):
+        self.db, self.team = db, team
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _commit(self):
+        self.commits += 1
+
+    def _new_id(self, doc_type):
+        self._next += 1
+        return f"{PREFIX}{doc_type}/{hashlib.sha256(str(self._next).encode()).hexdigest()}"
+
+    def _type_ids(self, doc_type):
+        # insertion order, cached between writes so paging stays O(page)
+        if doc_type not in self._ids:
+            self._ids[doc_type] = list(self.documents.get(doc_type, ()))
+        return self._ids[doc_type]
+
+    def _changed(self, document_id, before, after):
+        # the change belongs to the commit that _commit is about to make
+        self._changes.append((self.commits + 1, document_id, before, after))
+
+    def _store(self, document):
+        payload = json.dumps(document)
+        self.bytes_sent += len(payload)
+        doc_type = document['@type']
+        stored = self.documents.setdefault(doc_type, {})
+        self._changed(document['@id'], stored.get(document['@id']), payload)
+        stored[document['@id']] = payload
+        self._ids.pop(doc_type, None)
+
+    def _load(self, payload):
+        self.bytes_received += len(payload)
+        return _compress(json.loads(payload))
+
+    def _document(self, document):
+        if not isinstance(document, DocumentTemplate):
+            return dict(document)
+        custom_id = document._id
+        document = template_to_document(document)
+        if custom_id:
+            document['@id'] = custom_id if custom_id.startswith(PREFIX) else PREFIX + custom_id
+        return document
+
+    def _exists(self, document_id):
+        doc_type = document_id[len(PREFIX):].split('/', 1)[0]
+        return document_id in self.documents.get(doc_type, {})
+
+    def insert_document(self, documents, commit_msg=None, **kwargs):
+        return self._write('insert_document', documents)
+
+    def replace_document(self, documents, commit_msg=None, create=False, **kwargs):
+        return self._write('replace_document', documents, create)
+
+    def _write(self, method, documents, create=None):
+        start = time.perf_counter()
+        self._call(method)
+        if not isinstance(documents, list):
+            documents = [documents]
+        documents = [self._document(d) for d in documents]
+        captures = {}
+        for document in documents:
+            document_id = document.get('@id')
+            if document_id and not document_id.startswith(PREFIX):
+                document_id = PREFIX + document_id
+            document['@id'] = document_id or self._new_id(document['@type'])
+            if create is None and self._exists(document['@id']):
+                raise ValueError(f"{document['@id']} already exists")
+            if create is False and not self._exists(document['@id']):
+                raise ValueError(f"{document['@id']} doesn't exist")
+            capture = document.pop('@capture', None)
+            if capture is not None:
+                captures[capture] = document['@id']
+        for document in documents:
+            for field, value in document.items():
+                if isinstance(value, list):
+                    document[field] = [captures[v['@ref']] if isinstance(v, dict) and '@ref' in v
+                                       else v for v in value]
+            self._store(document)
+        self._commit()
+        self.seconds[method] += time.perf_counter() - start
+        return [document['@id'] for document in documents]
+
+    def delete_document(self, documents, commit_msg=None, **kwargs):
+        start = time.perf_counter()
+        self._call('delete_document')
+        if not isinstance(documents, list):
+            documents = [documents]
+        for document in documents:
+            document_id = document['@id'] if isinstance(document, dict) else document
+            if not document_id.startswith(PREFIX):
+                document_id = PREFIX + document_id
+            doc_type = document_id[len(PREFIX):].split('/', 1)[0]
+            payload = self.documents.get(doc_type, {}).pop(document_id, None)
+            if payload is not None:
+                self._changed(document_id, payload, None)
+            self._ids.pop(doc_type, None)
+        self._commit()
+        self.seconds['delete_document'] += time.perf_counter() - start
+
+    def get_document(self, document_id, **kwargs):
+        self._call('get_document')
+        if not document_id.startswith(PREFIX):
+            document_id = PREFIX + document_id
+        doc_type = document_id[len(PREFIX):].split('/', 1)[0]
+        return self._load(self.documents[doc_type][document_id])
+
+    def query_document(self, template, skip=0, count=None, **kwargs):
+        start = time.perf_counter()
+        self._call('query_document')
+        doc_type = template['@type']
+        conditions = {k: v for k, v in template.items() if k != '@type'}
+        stored = self.documents.get(doc_type, {})
+        if conditions:
+            matches = (d for d in map(self._load, stored.values())
+                       if all(d.get(k) == v for k, v in conditions.items()))
+            page = list(matches)[skip:None if count is None else skip + count]
+        else:
+            ids = self._type_ids(doc_type)[skip:None if count is None else skip + count]
+            page = [self._load(stored[i]) for i in ids]
+        self.seconds['query_document'] += time.perf_counter() - start
+        return page
+
+    def query(self, woql_query, commit_msg=None, **kwargs):
+        start = time.perf_counter()
+        self._call('query')
+        query = woql_query.to_dict()
+        if query['@type'] == 'Count':
+            result = {'bindings': [{'Count': {'@type': 'xsd:decimal', '@value':
+                                    len(self.documents.get(_schema_type(query['query']), {}))}}]}
+        elif query['@type'] == 'Limit':
+            doc_type = _schema_type(query['query']['query'])
+            result = {'bindings': [{'Doc': i} for i in self._type_ids(doc_type)[:query['limit']]]}
+        elif query['@type'] == 'And' and query['and'][-1]['@type'] == 'DeleteDocument':
+            for document_id, payload in self.documents.pop(_schema_type(query['and'][0]), {}).items():
+                self._changed(document_id, payload, None)
+            self._ids.clear()
+            self._commit()
+            result = {'bindings': [{}]}
+        else:
+            raise NotImplementedError(f"FakeWOQLClient doesn't understand {query['@type']} queries")
+        self.seconds['query'] += time.perf_counter() - start
+        return result
+
+    def log(self, team=None, db=None, count=None, **kwargs):
+        return [{'identifier': f"commit{self.commits}"}][:count]
+
+    def diff_version(self, before_version, after_version, **kwargs):
+        self._call('diff_version')
+        before, after = _commit_number(before_version), _commit_number(after_version)
+        # the first and the last state of every document changed in between
+        states = {}
+        for commit, document_id, old, new in self._changes:
+            if before < commit <= after:
+                first = states.get(document_id, (old,))[0]
+                states[document_id] = (first, new)
+        patches = []
+        for document_id, (old, new) in states.items():
+            if old == new:
+                continue
+            if old is None:
+                patches.append({'@op': 'Insert', '@insert': self._load(new)})
+            elif new is None:
+                patches.append({'@op': 'Delete', '@delete': self._load(old)})
+            else:
+                old, new = self._load(old), self._load(new)
+                patch = {'@id': new['@id']}
+                for field in sorted(set(old) | set(new)):
+                    if old.get(field) != new.get(field):
+                        patch[field] = {'@op': 'SwapValue', '@before': old.get(field),
+                                        '@after': new.get(field)}
+                patches.append(patch)
+        return patches
+
+    def stored(self):
+        return {doc_type: len(documents) for doc_type, documents in self.documents.items()}
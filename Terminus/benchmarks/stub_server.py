@@ -0,0 +1,124 @@
+"""
+A local stand-in for the Murmurations index and profile hosts.
+
+Serves /v2/nodes (the node list) and /profiles/<n> (person profiles) from
+memory, with an optional per-request delay to mimic network latency.
+Profiles carry an ETag and are answered with 304 when it still matches.
+`failures` queues error statuses for a path, returned before it succeeds
+again, and `requests`/`max_active` record what the clients did.
+"""
+import hashlib
+import json
+import threading
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import time
+
+
+def make_profiles(base_url, count, knows=3):
+    profiles = {}
+    for n in range(count):
+        profile_url = f"{base_url}/profiles/{n}"
+        profiles[profile_url] = {
+            'name': f"person {n}",
+            'description': f"description of person {n}",
+            'primary_url': f"https://person{n}.example.org",
+            'image': f"https://person{n}.example.org/avatar.png",
+            'locality': 'Somewhere',
+            'profile_url': profile_url,
+            'knows': [
+                {'name': f"person {(n + k) % count}",
+                 'url': f"{base_url}/profiles/{(n + k) % count}",
+                 'type': 'VOUCHES_FOR' if k % 2 else 'LI'}
+                for k in range(1, knows + 1)
+            ],
+        }
+    return profiles
+
+
+class StubServer:
+    """Run with `with StubServer(count=1000, delay=0.02) as server: ...`"""
+
+    def __init__(self, count=1000, delay=0.0, knows=3):
+        self.delay = delay
+        self.count = count
+        self.knows = knows
+        self.hits = 0
+        # path -> statuses to answer with, in order, before serving it again
+        self.failures = defaultdict(deque)
+        self.requests = Counter()
+        self.not_modified = 0
+        self.active = self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        self.profiles = make_profiles(self.base_url, count, knows)
+        self.nodes_url = f"{self.base_url}/v2/nodes?schema=person_schema-v0.1.0"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits += 1
+                    stub.requests[self.path] += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    failures = stub.failures.get(self.path)
+                    status = failures.popleft() if failures else None
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    self._respond(status)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def _empty(self, status, headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def _respond(self, status):
+                if status is not None:
+                    return self._empty(status, [('Retry-After', '0')] if status == 429 else [])
+                url = stub.base_url + self.path
+                if self.path.startswith('/v2/nodes'):
+                    body = {'data': [{'profile_url': u, 'last_updated': 0}
+                                     for u in stub.profiles]}
+                elif url in stub.profiles:
+                    body = stub.profiles[url]
+                else:
+                    return self._empty(404)
+                payload = json.dumps(body).encode('utf-8')
+                etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    with stub._lock:
+                        stub.not_modified += 1
+                    return self._empty(304, [('ETag', etag)])
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
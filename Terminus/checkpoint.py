@@ -0,0 +1,62 @@
+"""
+Checkpoints for resuming an interrupted CSV load.
+
+A Checkpoint remembers, in a small JSON file, how many data rows of the
+input are committed to TerminusDB and how many are confirmed indexed in
+Meilisearch. A load that dies halfway (network error, bad row) is rerun
+with the same arguments and continues from the smaller of the two
+instead of from row 0.
+
+Rows between the two offsets are written again on resume, which is only
+safe because the loader upserts documents under content-derived IDs
+(organizations.organization_id); rerunning rows never duplicates them.
+
+The checkpoint only applies to the same file (path, size, modification
+time) loaded into the same database; anything else starts from the top.
+"""
+import json
+import os
+
+
+def fingerprint(path, db):
+    stat = os.stat(path)
+    return {'csv': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime, 'db': db}
+
+
+class Checkpoint:
+
+    def __init__(self, path, source, db):
+        self.path = path
+        self.source = fingerprint(source, db)
+        self.committed = self.indexed = 0
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+        if state is not None and state.get('source') == self.source:
+            self.committed = state['committed']
+            self.indexed = state['indexed']
+
+    @property
+    def resume(self):
+        """Rows that are in both TerminusDB and Meilisearch, and can be skipped."""
+        return min(self.committed, self.indexed)
+
+    def save(self, committed=None, indexed=None):
+        if committed is not None:
+            self.committed = committed
+        if indexed is not None:
+            self.indexed = indexed
+        # written aside and renamed, so a crash never leaves half a checkpoint
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'source': self.source, 'committed': self.committed,
+                       'indexed': self.indexed}, f)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        """Forget the checkpoint, e.g. once the whole file is loaded."""
+        self.committed = self.indexed = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,266 @@
+"""
+Near-duplicate detection for the ingestion scripts.
+
+Organizations.csv has the same organization under names that only differ
+in case, punctuation or trailing whitespace ('ACRE DAOs\\n'), and the
+same person can come from two Murmurations profiles. Comparing every pair
+is quadratic, so records are only compared within blocks: the same URL,
+the same website host, or a shared word of the name. Blocks that grow past
+`max_block` are values half the data shares (a common word, a hosting
+site) and stop collecting candidates.
+
+Candidates are scored by the Jaccard similarity of the character trigrams
+of their normalized names. A pair is a duplicate when
+
+  - they share a URL, or
+  - their normalized names are equal and no URL field contradicts it, or
+  - their names are similar (>= threshold) and they share a website host.
+
+Similar names with nothing else in common are only reported as possible
+duplicates, since different people do share names.
+
+    duplicates = Deduplicator(url_fields=('assignee',))
+    for key, record in records:
+        match = duplicates.add(key, record)   # key it duplicates, or None
+    print(duplicates.report())
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+NAME_THRESHOLD = 0.8
+MAX_BLOCK = 50
+# hosts where a shared host says nothing about who a page belongs to
+SHARED_HOSTS = frozenset((
+    'linkedin.com', 'twitter.com', 'x.com', 'facebook.com', 'instagram.com',
+    'github.com', 'medium.com', 'substack.com', 'linktr.ee', 'google.com',
+    'docs.google.com', 'youtube.com', 'test-index.murmurations.network',
+))
+# words that don't tell organizations apart
+NAME_STOPWORDS = frozenset(('the', 'inc', 'ltd', 'llc', 'gmbh', 'foundation', 'network', 'project'))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACE = re.compile(r"\s+")
+# scheme, host, path and query, as urlsplit would split them
+_URL = re.compile(r"^(?:[A-Za-z][A-Za-z0-9+.-]*:)?//([^/?#]*)([^?#]*)(?:\?([^#]*))?")
+# characters urlsplit removes before splitting
+_URL_UNSAFE = re.compile(r"[\t\r\n]")
+
+
+def _split_url(url):
+    """(host, path, query) of a URL; the regex for the common case, urlsplit for the rest."""
+    match = None if _URL_UNSAFE.search(url) else _URL.match(url)
+    if match is not None:
+        host, path, query = match.groups()
+        return host, path, query or ''
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        # e.g. an unclosed '[' in the host; the whole value is its own key
+        return '', url, ''
+    return parts.netloc, parts.path, parts.query
+
+
+@lru_cache(maxsize=262144)
+def normalize_url(url):
+    """
+    Comparison key for a URL: no scheme, no "www.", lower-case host and no
+    trailing slash, so "https://Example.org/a/" and "example.org/a" match.
+    """
+    if not url:
+        return None
+    url = str(url).strip()
+    host, path, query = _split_url(url if '://' in url else '//' + url)
+    host = host.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    key = host + path.rstrip('/')
+    if query:
+        key += '?' + query
+    return key
+
+
+def url_host(key):
+    """Host of a normalized URL, without the port."""
+    return key.split('/', 1)[0].split(':', 1)[0]
+
+
+@lru_cache(maxsize=262144)
+def normalize_name(name):
+    """'  The ACRE DAOs!\\n' -> 'the acre daos'"""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKC', str(name)).casefold()
+    return _SPACE.sub(' ', _PUNCTUATION.sub(' ', name)).strip()
+
+
+@lru_cache(maxsize=65536)
+def trigrams(name):
+    padded = f"  {name} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _urls(value):
+    if not value:
+        return []
+    values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+    # a host needs a dot; "alice" in a URL field is not a site
+    return [u for u in map(normalize_url, values) if u and '.' in u.split('/', 1)[0]]
+
+
+class _Entry:
+    __slots__ = ('key', 'name', 'urls', 'hosts')
+
+    def __init__(self, key, name, urls):
+        self.key = key
+        self.name = name
+        # field -> set of normalized URLs
+        self.urls = urls
+        self.hosts = {url_host(u) for us in urls.values() for u in us} - SHARED_HOSTS
+
+
+class Deduplicator:
+    """
+    Incremental near-duplicate finder. Every record is compared with the
+    records added before it that share a block; duplicates point at the
+    first record of their cluster.
+    """
+
+    def __init__(self, name_field='name', url_fields=(), threshold=NAME_THRESHOLD,
+                 max_block=MAX_BLOCK):
+        self.name_field = name_field
+        self.url_fields = tuple(url_fields)
+        self.threshold = threshold
+        self.max_block = max_block
+        self.blocks = defaultdict(list)
+        self.entries = []
+        # key -> (key of the record kept, score, reason)
+        self.duplicates = {}
+        # (key, key of a similar kept record, score)
+        self.possible = []
+        self.names = {}
+        self.comparisons = 0
+
+    def _block_keys(self, entry):
+        keys = {'name:' + entry.name} if entry.name else set()
+        keys.update('word:' + w for w in entry.name.split() if len(w) > 2 and w not in NAME_STOPWORDS)
+        keys.update('url:' + u for us in entry.urls.values() for u in us)
+        keys.update('host:' + h for h in entry.hosts)
+        return keys
+
+    def _score(self, entry, other):
+        """(score, reason) of a candidate pair, or None if they differ."""
+        for field, urls in entry.urls.items():
+            if urls & other.urls.get(field, set()):
+                return 1.0, f"same {field}"
+        score = 1.0 if entry.name == other.name else \
+            similarity(trigrams(entry.name), trigrams(other.name))
+        if score == 1.0 and entry.name:
+            conflict = any(urls and other.urls.get(field) and not urls & other.urls[field]
+                           for field, urls in entry.urls.items())
+            if not conflict:
+                return 1.0, "same name"
+        if score >= self.threshold:
+            if entry.hosts & other.hosts:
+                return score, "similar name, same host"
+            return score, None
+        return None
+
+    def add(self, key, record):
+        """
+        Add a record. Returns the key of the earlier record it duplicates,
+        or None if it is new.
+        """
+        entry = _Entry(key, normalize_name(record.get(self.name_field)),
+                       {f: set(_urls(record.get(f))) for f in self.url_fields})
+        self.names[key] = record.get(self.name_field)
+        best = None
+        seen = set()
+        block_keys = self._block_keys(entry)
+        for block_key in block_keys:
+            block = self.blocks.get(block_key, ())
+            if len(block) >= self.max_block and not block_key.startswith(('name:', 'url:')):
+                continue
+            for index in block:
+                if index in seen:
+                    continue
+                seen.add(index)
+                self.comparisons += 1
+                scored = self._score(entry, self.entries[index])
+                # a duplicate beats a possible one, then the higher score
+                if scored is not None and (best is None or (scored[1] is not None, scored[0])
+                                           > (best[1] is not None, best[0])):
+                    best = scored + (index,)
+        match = None
+        if best is not None:
+            score, reason, index = best
+            kept = self.entries[index].key
+            kept = self.duplicates.get(kept, (kept,))[0]
+            if reason:
+                self.duplicates[key] = (kept, score, reason)
+                match = kept
+            else:
+                self.possible.append((key, kept, score))
+        # duplicates stay in the blocks, so later spellings match them too
+        self.entries.append(entry)
+        for block_key in block_keys:
+            block = self.blocks[block_key]
+            if len(block) < self.max_block or block_key.startswith(('name:', 'url:')):
+                block.append(len(self.entries) - 1)
+        return match
+
+    def clusters(self):
+        """{key kept: [keys of its duplicates]}"""
+        clusters = defaultdict(list)
+        for key, (kept, _, _) in self.duplicates.items():
+            clusters[kept].append(key)
+        return dict(clusters)
+
+    def report(self):
+        lines = [f"{len(self.entries)} records, {len(self.duplicates)} duplicates, "
+                 f"{len(self.possible)} possible, {self.comparisons} comparisons"]
+        for key, (kept, score, reason) in self.duplicates.items():
+            lines.append(f"  duplicate {key} {self.names[key]!r} of {kept} {self.names[kept]!r} "
+                         f"({reason}, {score:.2f})")
+        for key, other, score in self.possible:
+            lines.append(f"  possible {key} {self.names[key]!r} ~ {other} {self.names[other]!r} "
+                         f"({score:.2f})")
+        return '\n'.join(lines)
+
+
+def merge_into(kept, duplicate):
+    """Fill the missing fields of `kept` from `duplicate` and union list fields."""
+    for field, value in duplicate.items():
+        current = kept.get(field)
+        if current is None or current == '' or current == [] or current == set():
+            kept[field] = value
+        elif isinstance(current, set) and isinstance(value, (set, list, tuple)):
+            kept[field] = current | set(value)
+        elif isinstance(current, list) and isinstance(value, (list, tuple)):
+            kept[field] = current + [v for v in value if v not in current]
+    return kept
+
+
+def drop_duplicates(deduplicator, keyed_records):
+    """
+    Feed (key, record) pairs to `deduplicator` and return the records that
+    are not duplicates. A duplicate of a record in the same list is merged
+    into it; one of a record seen in an earlier call is dropped.
+    """
+    kept = {}
+    for key, record in keyed_records:
+        match = deduplicator.add(key, record)
+        if match is None:
+            kept[key] = record
+        elif match in kept:
+            merge_into(kept[match], record)
+    return list(kept.values())
@@ -0,0 +1,62 @@
+"""
+Paginated reading of TerminusDB documents.
+
+query_document returns a whole collection in one response, which then gets
+copied into a DataFrame. These readers page through a collection with
+skip/count instead, so only one page of raw documents is in memory at a
+time, and can drop unneeded fields as each page arrives.
+
+The document API has no server-side projection, so `fields` trims
+documents on the client. Pages are read in TerminusDB's document order.
+Concurrent writes to the collection can shift page boundaries, so read
+from a quiet branch.
+"""
+import pandas as pd
+from terminusdb_client import WOQLQuery
+
+PAGE_SIZE = 1000
+
+
+def project(document, fields):
+    return {k: document[k] for k in fields if k in document}
+
+
+def iter_pages(client, doc_type, page_size=PAGE_SIZE, fields=None, template=None):
+    """Yield lists of at most `page_size` documents of `doc_type`."""
+    query = {"@type": doc_type}
+    if template:
+        query.update(template)
+    if fields is not None:
+        fields = ['@id', '@type'] + [f for f in fields if f not in ('@id', '@type')]
+    skip = 0
+    while True:
+        page = client.query_document(query, skip=skip, count=page_size)
+        if fields is None:
+            page = list(page)
+        else:
+            page = [project(document, fields) for document in page]
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        skip += len(page)
+
+
+def iter_documents(client, doc_type, page_size=PAGE_SIZE, fields=None, template=None):
+    """Yield documents of `doc_type` one at a time, fetched page by page."""
+    for page in iter_pages(client, doc_type, page_size, fields, template):
+        yield from page
+
+
+def iter_frames(client, doc_type, page_size=PAGE_SIZE, fields=None, template=None):
+    """Yield one DataFrame per page, with an '@id' column per document."""
+    for page in iter_pages(client, doc_type, page_size, fields, template):
+        yield pd.DataFrame.from_records(page)
+
+
+def count_documents(client, doc_type):
+    """Number of `doc_type` documents, counted by TerminusDB itself."""
+    query = WOQLQuery().count("v:Count").triple("v:Doc", "rdf:type", f"@schema:{doc_type}")
+    count = client.query(query)['bindings'][0]['Count']
+    return int(count['@value'] if isinstance(count, dict) else count)
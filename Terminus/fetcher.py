@@ -0,0 +1,145 @@
+"""
+Pooled, concurrent HTTP fetching for profile URLs.
+
+ProfileFetcher keeps one requests.Session (keep-alive connection pool with
+retry and backoff on transient errors), limits concurrent requests per host,
+applies a timeout to every request, and caches responses for the run so
+each URL is downloaded at most once even when it is asked for again.
+
+With an http_cache.HTTPCache the responses also persist between runs: a
+URL whose Murmurations `last_updated` has not changed is served from disk
+without a request, and anything else is revalidated with If-None-Match /
+If-Modified-Since.
+"""
+from collections import Counter
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HEADERS = {'accept': 'application/json'}
+
+
+def make_session(pool_size=16, retries=3, backoff=0.5):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ProfileFetcher:
+    """
+    Fetch JSON documents concurrently, at most once per URL.
+
+    Failed URLs map to None in the results and the reason is kept in
+    `errors`. `stats` counts how each URL was served: 'fetched',
+    'not_modified' (304) or 'cached' (no request at all).
+    """
+
+    def __init__(self, max_workers=16, per_host=8, timeout=(5, 30),
+                 retries=3, backoff=0.5, session=None, cache=None):
+        self.timeout = timeout
+        self.per_host = per_host
+        self.session = session or make_session(max_workers, retries, backoff)
+        self.cache = cache
+        self.errors = {}
+        self.stats = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _get(self, url, last_updated=None):
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and last_updated is not None \
+                and entry.last_updated == last_updated:
+            self._count('cached')
+            return entry.body
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        with self._host_limit(url):
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code == 304 and entry is not None:
+                    self._count('not_modified')
+                    self.cache.touch(url, last_updated)
+                    return entry.body
+                response.raise_for_status()
+                body = response.json()
+            except (requests.RequestException, ValueError) as e:
+                self.errors[url] = str(e)
+                return None
+
+        self._count('fetched')
+        if self.cache is not None:
+            self.cache.put(url, body, response.headers.get('ETag'),
+                           response.headers.get('Last-Modified'), last_updated)
+        return body
+
+    def submit(self, url, last_updated=None):
+        """Start fetching `url` unless it was already requested this run."""
+        with self._lock:
+            future = self._futures.get(url)
+            if future is None:
+                future = self._executor.submit(self._get, url, last_updated)
+                self._futures[url] = future
+            return future
+
+    def get_json(self, url, last_updated=None):
+        return self.submit(url, last_updated).result()
+
+    def fetch_all(self, urls, last_updated=None, progress=None):
+        """
+        Return {url: json or None} for `urls`, fetched concurrently.
+
+        `last_updated` optionally maps URLs to their Murmurations timestamp,
+        letting unchanged profiles come straight from the persistent cache.
+        A metrics.Progress is advanced as the responses are collected.
+        """
+        last_updated = last_updated or {}
+        futures = {url: self.submit(url, last_updated.get(url)) for url in urls}
+        results = {}
+        for url, future in futures.items():
+            results[url] = future.result()
+            if progress is not None:
+                progress.update()
+        return results
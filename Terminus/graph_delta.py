@@ -0,0 +1,233 @@
+"""
+Incremental knowledge graph updates driven by TerminusDB commit diffs.
+
+Next to the graph file we keep `<name>.state.json` with the database,
+branch and commit the graph was exported at. On the next run we ask
+TerminusDB for the diff between that commit and the branch head, fetch
+only the documents that changed and patch the entity and relation sets
+in place, re-run the layout only around what changed and recompute the
+graph measures of analytics.py. The result is
+written both as the full graph and as a delta file (`<name>.delta.json`)
+listing what was added and removed.
+
+The delta's entities are the changed documents, the nodes the layout
+moved and the nodes whose degree changed or whose PageRank shifted by
+more than PAGERANK_TOLERANCE, so it stays the size of the neighbourhood
+of what changed. Component sizes and communities depend on the whole
+graph (one new link can relabel a whole component); their new values are
+listed apart, under 'measures', rather than as changed entities.
+
+Without a usable state file this falls back to a full export.
+"""
+import json
+import os
+from collections import Counter, defaultdict
+
+from analytics import METRICS, annotate_graph
+from documents import project
+from graph_format import load_graph, save_graph
+from layout import layout_graph
+from knowledge_graph import GRAPHS, build_graph, documents_to_frame, export_graph, graph_fields, to_json
+
+# entity fields set by the layout and the analytics rather than read from documents
+DERIVED = ('x', 'y') + METRICS
+# measures that change far from an edit, listed under the delta's 'measures'
+GLOBAL_METRICS = ('component_size', 'community')
+# relative PageRank change that makes an entity part of the delta
+PAGERANK_TOLERANCE = 0.05
+
+
+def head_commit(client):
+    descriptor = f"{client.db}/local/branch/{client.branch}"
+    return client.log(team=client.team, db=descriptor, count=1)[0]['identifier']
+
+
+def state_path(path):
+    return os.path.splitext(path)[0] + '.state.json'
+
+
+def delta_path(path):
+    return os.path.splitext(path)[0] + '.delta.json'
+
+
+def load_state(path):
+    try:
+        with open(state_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(path, client, commit):
+    with open(state_path(path), 'w') as f:
+        json.dump({'db': client.db, 'branch': client.branch, 'commit': commit}, f)
+
+
+def _local_change(entity, previous):
+    """Whether the degree or, past the tolerance, the PageRank of `entity` changed."""
+    if 'degree' in previous:
+        return True
+    if 'pagerank' not in previous:
+        return False
+    before = previous['pagerank']
+    return before is None or abs(entity['pagerank'] - before) > PAGERANK_TOLERANCE * before
+
+
+def changed_documents(client, doc_type, before, after):
+    """
+    IDs of `doc_type` documents inserted, modified or deleted between two
+    commits, as (upserted, deleted). Inserted documents come with their
+    body from the diff; modified ones map to None and still need a read.
+    """
+    upserted, deleted = {}, set()
+    for patch in client.diff_version(before, after):
+        if patch.get('@op') == 'Insert':
+            document = patch['@insert']
+            if document.get('@type') == doc_type:
+                upserted[document['@id']] = document
+        elif patch.get('@op') == 'Delete':
+            document = patch['@delete']
+            if document.get('@type') == doc_type:
+                deleted.add(document['@id'])
+        elif '@id' in patch and patch['@id'].startswith(doc_type + '/'):
+            upserted[patch['@id']] = None
+    return upserted, deleted
+
+
+class GraphIndex:
+    """
+    An exported graph indexed by document, so that one document's entity
+    and relations can be swapped out without touching the rest.
+    """
+
+    def __init__(self, graph, attributes):
+        self.attributes = attributes
+        self.entities = {entity['id']: entity for entity in graph['entities']}
+        self.relations = defaultdict(list)
+        self.references = Counter()
+        for relation in graph['relations']:
+            self._add_relation(relation)
+        self.added_entities, self.removed_entities = {}, {}
+        self.added_relations, self.removed_relations = [], []
+
+    def _add_relation(self, relation):
+        self.relations[relation['source']].append(relation)
+        self.references[relation['target']] += 1
+
+    def _remove_entity(self, entity_id):
+        entity = self.entities.pop(entity_id, None)
+        if entity is not None:
+            self.removed_entities.setdefault(entity_id, entity)
+            self.added_entities.pop(entity_id, None)
+
+    def remove_document(self, document_id):
+        self._remove_entity(document_id)
+        for relation in self.relations.pop(document_id, []):
+            self.removed_relations.append(relation)
+            target = relation['target']
+            self.references[target] -= 1
+            # attribute values nobody points at any more disappear with them
+            if self.attributes and self.references[target] <= 0:
+                del self.references[target]
+                self._remove_entity(target)
+
+    def add(self, entities, relations):
+        for entity in entities:
+            entity_id = entity['id']
+            if entity_id in self.entities:
+                continue
+            self.entities[entity_id] = entity
+            previous = self.removed_entities.pop(entity_id, None)
+            if previous is not None:
+                # keep its place in the layout and its measures until recomputed
+                for key in DERIVED:
+                    if key in previous:
+                        entity.setdefault(key, previous[key])
+            # an entity that was removed and comes back unchanged is no change
+            if previous != entity:
+                self.added_entities[entity_id] = entity
+        for relation in relations:
+            self._add_relation(relation)
+            self.added_relations.append(relation)
+
+    def graph(self):
+        relations = [r for rs in self.relations.values() for r in rs]
+        return {'entities': list(self.entities.values()), 'relations': relations}
+
+    def delta(self):
+        """
+        Net changes since the index was loaded. Entities whose properties
+        changed are listed under 'added' and replace the old ones by ID.
+        """
+        def key(relation):
+            return relation['source'], relation['target'], relation['type']
+
+        added = Counter(map(key, self.added_relations))
+        removed = Counter(map(key, self.removed_relations))
+        added, removed = added - removed, removed - added
+        return {
+            'entities': {'added': list(self.added_entities.values()),
+                         'removed': sorted(i for i in self.removed_entities
+                                           if i not in self.entities)},
+            'relations': {'added': [r for r in self.added_relations if key(r) in added],
+                          'removed': [r for r in self.removed_relations if key(r) in removed]},
+        }
+
+
+def update_graph(client, doc_type, path):
+    """
+    Bring the graph at `path` up to the head of the connected branch.
+    Returns the delta that was applied, or None after a full export.
+    """
+    commit = head_commit(client)
+    state = load_state(path)
+    if state is None or not os.path.exists(path) \
+            or (state['db'], state['branch']) != (client.db, client.branch):
+        export_graph(client, doc_type, path)
+        save_state(path, client, commit)
+        return None
+
+    delta = {'from': state['commit'], 'to': commit}
+    if state['commit'] != commit:
+        upserted, deleted = changed_documents(client, doc_type, state['commit'], commit)
+        fields = graph_fields(doc_type)
+        documents = [project(document if document is not None else client.get_document(document_id),
+                             ['@id', '@type', *fields])
+                     for document_id, document in upserted.items()]
+
+        index = GraphIndex(load_graph(path), GRAPHS[doc_type]['attributes'])
+        for document_id in list(upserted) + sorted(deleted):
+            index.remove_document(document_id)
+        if documents:
+            graph = to_json(*build_graph(documents_to_frame(documents), doc_type))
+            index.add(graph['entities'], graph['relations'])
+
+        graph = index.graph()
+        changes = index.delta()
+        changed = {entity['id'] for entity in changes['entities']['added']}
+        for relation in changes['relations']['added'] + changes['relations']['removed']:
+            changed.update((relation['source'], relation['target']))
+        moved = layout_graph(graph, changed) if changed else []
+        measured = annotate_graph(graph, doc_type)
+        # neighbours that were moved to make room, and entities whose own
+        # measures shifted, are changes too
+        touched = dict.fromkeys(moved + [i for i, previous in measured.items()
+                                         if _local_change(index.entities[i], previous)])
+        listed = {entity['id'] for entity in changes['entities']['added']}
+        changes['entities']['added'] += [index.entities[i] for i in touched
+                                         if i not in listed and i in index.entities]
+        listed.update(touched)
+        changes['measures'] = {
+            i: {k: index.entities[i][k] for k in GLOBAL_METRICS if k in previous}
+            for i, previous in measured.items()
+            if i not in listed and any(k in previous for k in GLOBAL_METRICS)}
+        save_graph(graph, path)
+        delta.update(changes)
+    else:
+        delta.update({'entities': {'added': [], 'removed': []},
+                      'relations': {'added': [], 'removed': []}, 'measures': {}})
+
+    with open(delta_path(path), 'w') as f:
+        json.dump(delta, f)
+    save_state(path, client, commit)
+    return delta
@@ -0,0 +1,253 @@
+"""
+Compact binary form of the knowledge graph.
+
+knowledge_graph.json spells out every ID in full in each relation, e.g.
+"Organization/" plus a 64 character hash. The binary form interns every
+string once in a string table, stores hash IDs as their 32 raw bytes and
+keeps relations as CSR arrays (per-node offsets into a target array) of
+integer node indices. The layout is flat little-endian typed arrays, so
+NumPy reads it with frombuffer and the browser with typed array views
+(src/lib/knowledge-graph.ts), without parsing.
+
+    MKG1 | header length (uint32) | JSON header | sections, 8-byte aligned
+
+Sections, in the order of HEADER_SECTIONS:
+
+    string_offsets  uint32[strings + 1]  byte offsets into string_bytes
+    string_bytes    uint8[...]           UTF-8 strings back to back
+    digests         uint8[hashed * 32]   IDs of the first `hashed` nodes
+    id_prefix       uint8[hashed]        index into header['prefixes']
+    id_string       uint32[nodes - hashed]  string index of the other IDs
+    labels          uint32[entities]     string index
+    entity_type     uint8[entities]      index into header['types']
+    offsets         uint32[nodes + 1]    CSR row offsets, by source node
+    targets         uint32[relations]    target node index
+    relation_type   uint8[relations]     index into header['relation_types']
+
+followed by one column per entry of header['properties']: int32 string
+indices (-1 when missing) for 'string' properties, float32 (NaN when
+missing) for 'number' ones. Nodes are the entities plus, after them, any
+relation endpoints that are not entities themselves.
+
+save_graph / load_graph pick the format from the file extension, so the
+JSON form is only produced when a .json path is asked for:
+
+    python graph_format.py knowledge_graph.bin knowledge_graph.json
+"""
+import json
+import re
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b'MKG1'
+HASH_ID = re.compile(r'^(.*/)([0-9a-f]{64})$')
+CORE = ('id', 'label', 'type')
+
+# name, dtype, length given the header
+HEADER_SECTIONS = (
+    ('string_offsets', '<u4', lambda h: h['strings'] + 1),
+    ('string_bytes', 'u1', lambda h: h['string_bytes']),
+    ('digests', 'u1', lambda h: h['hashed'] * 32),
+    ('id_prefix', 'u1', lambda h: h['hashed']),
+    ('id_string', '<u4', lambda h: h['nodes'] - h['hashed']),
+    ('labels', '<u4', lambda h: h['entities']),
+    ('entity_type', 'u1', lambda h: h['entities']),
+    ('offsets', '<u4', lambda h: h['nodes'] + 1),
+    ('targets', '<u4', lambda h: h['relations']),
+    ('relation_type', 'u1', lambda h: h['relations']),
+)
+PROPERTY_DTYPES = {'string': '<i4', 'number': '<f4'}
+
+GraphArrays = namedtuple('GraphArrays', 'ids labels types entity_type offsets targets '
+                                        'relation_types relation_type properties entities')
+
+
+class _Strings:
+
+    def __init__(self):
+        self.index = {}
+
+    def __call__(self, string):
+        return self.index.setdefault(string, len(self.index))
+
+    def arrays(self):
+        encoded = [s.encode('utf-8') for s in self.index]
+        offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        return offsets, np.frombuffer(b''.join(encoded), dtype='u1')
+
+
+def _table(values, what):
+    table = list(dict.fromkeys(values))
+    if len(table) > 255:
+        raise ValueError(f"more than 255 {what}")
+    lookup = {v: i for i, v in enumerate(table)}
+    return table, np.array([lookup[v] for v in values], dtype='u1')
+
+
+def _property_kind(values):
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return 'number'
+    return 'string'
+
+
+def encode_graph(graph):
+    """Encode a {'entities': [...], 'relations': [...]} graph to bytes."""
+    entities = graph['entities']
+    # entities with hash IDs go first, so their digests form one block
+    matches = [HASH_ID.match(e['id']) for e in entities]
+    order = sorted(range(len(entities)), key=lambda i: matches[i] is None)
+    entities = [entities[i] for i in order]
+    matches = [matches[i] for i in order]
+    hashed = sum(m is not None for m in matches)
+
+    node_index = {e['id']: i for i, e in enumerate(entities)}
+    node_ids = [e['id'] for e in entities]
+    relations = graph['relations']
+    for relation in relations:
+        for end in (relation['source'], relation['target']):
+            if end not in node_index:
+                node_index[end] = len(node_ids)
+                node_ids.append(end)
+
+    strings = _Strings()
+    prefixes, id_prefix = _table([m.group(1) for m in matches[:hashed]], 'ID prefixes')
+    digests = np.frombuffer(bytes.fromhex(''.join(m.group(2) for m in matches[:hashed])), dtype='u1')
+    id_string = np.array([strings(i) for i in node_ids[hashed:]], dtype='<u4')
+    labels = np.array([strings(str(e.get('label', ''))) for e in entities], dtype='<u4')
+    types, entity_type = _table([e.get('type', '') for e in entities], 'entity types')
+
+    sources = np.array([node_index[r['source']] for r in relations], dtype='<u4')
+    targets = np.array([node_index[r['target']] for r in relations], dtype='<u4')
+    relation_types, relation_type = _table([r['type'] for r in relations], 'relation types')
+    by_source = np.argsort(sources, kind='stable')
+    offsets = np.zeros(len(node_ids) + 1, dtype='<u4')
+    offsets[1:] = np.cumsum(np.bincount(sources, minlength=len(node_ids)))
+
+    names = list(dict.fromkeys(k for e in entities for k in e if k not in CORE))
+    properties, columns = [], []
+    for name in names:
+        values = [e.get(name) for e in entities]
+        kind = _property_kind(values)
+        if kind == 'number':
+            column = np.array([np.nan if v is None else v for v in values], dtype='<f4')
+        else:
+            column = np.array([-1 if v is None else strings(str(v)) for v in values], dtype='<i4')
+        properties.append([name, kind])
+        columns.append(column)
+
+    string_offsets, string_bytes = strings.arrays()
+    header = {
+        'entities': len(entities), 'nodes': len(node_ids), 'hashed': hashed,
+        'relations': len(relations), 'strings': len(strings.index),
+        'string_bytes': len(string_bytes), 'prefixes': prefixes, 'types': types,
+        'relation_types': relation_types, 'properties': properties,
+    }
+    sections = [string_offsets, string_bytes, digests, id_prefix, id_string, labels,
+                entity_type, offsets, targets[by_source], relation_type[by_source], *columns]
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    out = bytearray(MAGIC + np.array(len(header_bytes), dtype='<u4').tobytes() + header_bytes)
+    for section in sections:
+        out += b'\0' * (-len(out) % 8)
+        out += section.tobytes()
+    return bytes(out)
+
+
+def _sections(data):
+    if data[:4] != MAGIC:
+        raise ValueError("not a binary knowledge graph")
+    length = int(np.frombuffer(data, dtype='<u4', count=1, offset=4)[0])
+    header = json.loads(bytes(data[8:8 + length]))
+    layout = [(name, dtype, size(header)) for name, dtype, size in HEADER_SECTIONS]
+    layout += [('property:' + name, PROPERTY_DTYPES[kind], header['entities'])
+               for name, kind in header['properties']]
+    sections, position = {}, 8 + length
+    for name, dtype, count in layout:
+        position += -position % 8
+        sections[name] = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+        position += sections[name].nbytes
+    return header, sections
+
+
+def _strings(sections):
+    offsets, blob = sections['string_offsets'], sections['string_bytes'].tobytes()
+    return [blob[a:b].decode('utf-8') for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def decode_arrays(data):
+    """The graph as arrays, for code that works on the CSR structure directly."""
+    header, sections = _sections(data)
+    strings = _strings(sections)
+    digests = sections['digests'].reshape(-1, 32)
+    prefixes = header['prefixes']
+    ids = [prefixes[p] + d.tobytes().hex() for p, d in zip(sections['id_prefix'].tolist(), digests)]
+    ids += [strings[i] for i in sections['id_string'].tolist()]
+    properties = {}
+    for name, kind in header['properties']:
+        column = sections['property:' + name]
+        if kind == 'string':
+            column = [strings[i] if i >= 0 else None for i in column.tolist()]
+        properties[name] = column
+    return GraphArrays(ids, [strings[i] for i in sections['labels'].tolist()], header['types'],
+                       sections['entity_type'], sections['offsets'], sections['targets'],
+                       header['relation_types'], sections['relation_type'], properties,
+                       header['entities'])
+
+
+def arrays_to_graph(arrays):
+    entities = []
+    for i in range(arrays.entities):
+        entity = {'id': arrays.ids[i], 'label': arrays.labels[i],
+                  'type': arrays.types[arrays.entity_type[i]]}
+        for name, column in arrays.properties.items():
+            value = column[i]
+            if value is None or (isinstance(value, np.floating) and np.isnan(value)):
+                continue
+            if isinstance(value, np.floating):
+                # shortest float32 repr, so 17.3 doesn't come back as 17.299999
+                value = float(str(value))
+            entity[name] = value
+        entities.append(entity)
+
+    sources = np.repeat(np.arange(len(arrays.offsets) - 1), np.diff(arrays.offsets))
+    relations = [{'source': arrays.ids[s], 'target': arrays.ids[t], 'type': arrays.relation_types[k]}
+                 for s, t, k in zip(sources.tolist(), arrays.targets.tolist(),
+                                    arrays.relation_type.tolist())]
+    return {'entities': entities, 'relations': relations}
+
+
+def decode_graph(data):
+    return arrays_to_graph(decode_arrays(data))
+
+
+def save_graph(graph, path):
+    """Write `graph` to `path`, as JSON for a .json path and binary otherwise."""
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(graph, f)
+    else:
+        with open(path, 'wb') as f:
+            f.write(encode_graph(graph))
+
+
+def load_graph(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    with open(path, 'rb') as f:
+        return decode_graph(f.read())
+
+
+def load_arrays(path):
+    with open(path, 'rb') as f:
+        return decode_arrays(f.read())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("usage: graph_format.py SOURCE DESTINATION  (.json or .bin, either way)")
+    save_graph(load_graph(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,67 @@
+"""
+Persistent on-disk cache of JSON responses, keyed by URL.
+
+Entries keep the validators (ETag, Last-Modified) returned by the server
+plus the Murmurations `last_updated` timestamp of the node, so the next run
+can skip unchanged profiles entirely or revalidate them with a conditional
+request instead of downloading them again.
+"""
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+
+CacheEntry = namedtuple('CacheEntry', 'url body etag last_modified last_updated')
+
+
+class HTTPCache:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT,"
+            " last_modified TEXT, last_updated INTEGER)")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, body, etag, last_modified, last_updated"
+                " FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(row[0], json.loads(row[1]), *row[2:])
+
+    def put(self, url, body, etag=None, last_modified=None, last_updated=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (url, json.dumps(body), etag, last_modified, last_updated))
+            self._db.commit()
+
+    def touch(self, url, last_updated):
+        """Record that the cached body is still current as of `last_updated`."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET last_updated = ? WHERE url = ?",
+                (last_updated, url))
+            self._db.commit()
+
+    def delete(self, url):
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._db.commit()
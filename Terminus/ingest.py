@@ -0,0 +1,636 @@
+"""
+One entry point for loading data into TerminusDB and Meilisearch.
+
+    python ingest.py csv Organizations.csv
+    python ingest.py murmurations
+    python ingest.py json people.ndjson --type person --db murmurations --index people
+    python ingest.py reindex orgs
+
+A run feeds the batches of a Source through its transforms into the
+sinks: TerminusDB, a Meilisearch index (unless --no-index) and, with
+--graph, the knowledge graph export of graph_delta.py. The sources are
+
+  CSVSource           Organizations.csv through organizations.py, upserted
+                      under content-derived IDs and checkpointed
+  MurmurationsSource  the Murmurations index, synced incrementally (sync.py)
+  JSONSource          a JSON array or NDJSON file of documents
+
+A source says how its documents are written (upserted under their own
+IDs, or inserted for TerminusDB to name) and hears back what was written,
+so it can keep its own state; everything else (timing, progress, batched
+indexing, reports) is shared. Endpoints and credentials come from the
+command line or the environment (TERMINUSDB_URL, TERMINUSDB_TEAM,
+MEILISEARCH_URL, MEILISEARCH_KEY), and nothing connects until a command
+runs.
+
+insert_data.py and murmuration/insert_data.py are shortcuts for the csv
+and murmurations commands.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import deque
+
+import meilisearch
+from terminusdb_client import WOQLClient
+from terminusdb_client.woqlschema import DocumentTemplate
+
+from checkpoint import Checkpoint
+from dedup import Deduplicator
+from documents import count_documents, iter_documents
+from metrics import add_arguments, finish, log_report, progress, showing_progress, start
+from normalize import UnknownValues
+from organizations import organization_batches
+from pipeline import chunked, count_csv_rows
+from sanitize import remove_emojis
+from search import (INDEX_SETTINGS, configure_index, local_id, search_documents, short_id,
+                    template_to_document, to_search_document)
+from search_sink import SearchSink, rebuild_index
+
+log = logging.getLogger('ingest')
+
+TERMINUSDB_URL = os.environ.get('TERMINUSDB_URL', "https://cloud.terminusdb.com/Myseelia/")
+TERMINUSDB_TEAM = os.environ.get('TERMINUSDB_TEAM', "Myseelia")
+MEILISEARCH_URL = os.environ.get('MEILISEARCH_URL', "https://ms-9ea4a96f02a8-1969.sfo.meilisearch.io")
+MEILISEARCH_KEY = os.environ.get('MEILISEARCH_KEY')
+
+NODES_URL = "https://test-index.murmurations.network/v2/nodes?schema=person_schema-v0.1.0"
+
+# index name -> (document type, database) for `reindex`
+INDEXES = {
+    'orgs': ('Organization', 'play'),
+    'people': ('person', 'murmurations'),
+}
+
+
+def strip_emojis(batch):
+    """Transform: remove emojis from the string fields of plain documents."""
+    for document in batch:
+        for field, value in document.items():
+            if isinstance(value, str) and not field.startswith('@'):
+                document[field] = remove_emojis(value)
+            elif isinstance(value, list):
+                document[field] = [remove_emojis(v) if isinstance(v, str) else v for v in value]
+    return batch
+
+
+class TerminusDBSink:
+
+    def __init__(self, client, upsert):
+        self.client = client
+        self.upsert = upsert
+
+    def write(self, batch, doc_type):
+        if self.upsert:
+            return self.client.replace_document(batch, create=True, commit_msg=f"Adding {doc_type}")
+        return self.client.insert_document(batch, commit_msg=f"Adding {doc_type}")
+
+    def delete(self, ids, doc_type):
+        self.client.delete_document(ids, commit_msg=f"Removing changed {doc_type}")
+
+
+class SearchIndexSink:
+    """
+    Batched indexing into one Meilisearch index. With `rebuild`, the
+    documents are held until close and then indexed into a shadow index
+    that is swapped in (search_sink.rebuild_index), `expected()` giving
+    the number of documents it must end up with.
+    """
+
+    def __init__(self, client, name, rebuild=False, expected=None):
+        self.client = client
+        self.name = name
+        self.expected = expected
+        self.sent = 0
+        self.sink = None
+        self._held = [] if rebuild else None
+        if not rebuild:
+            index = client.index(name)
+            # filterable/sortable attributes, so filtering can happen in Meilisearch
+            self._configure(index)
+            self.sink = SearchSink(index)
+
+    def _configure(self, index):
+        if self.name in INDEX_SETTINGS:
+            return configure_index(index, self.name)
+
+    def write(self, documents):
+        self.sent += len(documents)
+        if self._held is not None:
+            self._held.extend(documents)
+            return
+        self.sink.add(documents)
+        # only tasks that finished meanwhile, the sink's backpressure does the waiting
+        self.sink.collect()
+
+    def delete(self, ids):
+        # a rebuilt index never had the old documents
+        if self._held is None:
+            self.sink.delete(ids)
+            self.sink.collect()
+
+    def close(self):
+        if self._held is None:
+            self.sink.close()
+        else:
+            self.sink = rebuild_index(self.client, self.name, self._held,
+                                      expected=self.expected, configure=self._configure)
+
+    @property
+    def confirmed(self):
+        return self.sink.confirmed if self.sink is not None else 0
+
+    @property
+    def failures(self):
+        return self.sink.failures if self.sink is not None else []
+
+
+class GraphSink:
+    """Bring the knowledge graph at `path` up to date once the load is committed."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    def close(self, doc_type):
+        from graph_delta import update_graph
+        delta = update_graph(self.client, doc_type, self.path)
+        if delta is None:
+            log.info(f"exported the {doc_type} graph to {self.path}")
+        else:
+            log.info(f"updated {self.path}: {len(delta['entities']['added'])} entities added, "
+                     f"{len(delta['entities']['removed'])} removed")
+
+
+class Source:
+    """
+    Where documents come from. `batches(run)` yields lists of documents
+    (dicts or DocumentTemplate objects) of type `doc_type`, which go to
+    the Meilisearch index `index`. The hooks let a source prepare the
+    sinks, follow what was written and clean up.
+    """
+    doc_type = None
+    index = None
+    # write under the documents' own IDs, replacing what is there
+    upsert = False
+    transforms = ()
+    # for the progress bar: how many units there are, and how many are done
+    unit = 'documents'
+    total = None
+    position = 0
+
+    def start(self, run):
+        pass
+
+    def batches(self, run):
+        raise NotImplementedError
+
+    def search_documents(self, batch, ids):
+        return [to_search_document(document_id, template_to_document(document)
+                                   if isinstance(document, DocumentTemplate) else document)
+                for document_id, document in zip(ids, batch)]
+
+    def written(self, run, batch, ids):
+        pass
+
+    def finish(self, run, ok):
+        pass
+
+
+class CSVSource(Source):
+    """Organizations.csv, transformed in `workers` processes and checkpointed."""
+    doc_type = 'Organization'
+    index = 'orgs'
+    upsert = True
+    unit = 'rows'
+
+    def __init__(self, path, batch_size=1000, workers=1, keep_duplicates=False,
+                 checkpoint=None, restart=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.workers = workers
+        self.restart = restart
+        self.checkpoint_path = checkpoint or path + '.checkpoint.json'
+        # values that don't map onto the schema enums, reported at the end
+        self.unknown = UnknownValues()
+        # organizations with the same website or name, reported at the end
+        self.duplicates = None if keep_duplicates else Deduplicator(url_fields=('assignee',))
+        # (search documents sent so far, rows read so far) per batch, until
+        # Meilisearch confirms the documents and the rows count as indexed
+        self.pending = deque()
+
+    def start(self, run):
+        self.checkpoint = Checkpoint(self.checkpoint_path, self.path, run.client.db)
+        if self.restart:
+            self.checkpoint.clear()
+        self.skip = self.position = self.checkpoint.resume
+        if self.skip:
+            log.info(f"resuming after row {self.skip}: {self.checkpoint.committed} rows were "
+                     f"committed and {self.checkpoint.indexed} indexed by the last run")
+        # counting is a second pass over the file, only made for the progress bar's ETA
+        if showing_progress(run.args):
+            self.total = count_csv_rows(self.path)
+
+    def batches(self, run):
+        # only one batch of organizations is alive at a time, so memory stays
+        # bounded by the batch size no matter how large the file is
+        for rows, batch in organization_batches(self.path, self.batch_size, self.unknown,
+                                                self.duplicates, self.workers, run.metrics,
+                                                self.skip):
+            self.position = rows
+            yield batch
+
+    def search_documents(self, batch, ids):
+        # the IDs come back in the order the batch was sent, so the search
+        # documents can be built from the objects we already have in memory
+        return search_documents(ids, batch)
+
+    def _confirmed(self, run):
+        if run.search is None:
+            return self.position
+        indexed = None
+        while self.pending and self.pending[0][0] <= run.search.confirmed:
+            indexed = self.pending.popleft()[1]
+        return indexed
+
+    def written(self, run, batch, ids):
+        if run.search is not None:
+            self.pending.append((run.search.sent, self.position))
+        self.checkpoint.save(committed=self.position, indexed=self._confirmed(run))
+
+    def finish(self, run, ok):
+        if self.unknown:
+            log.warning("Skipped values that are not in the schema enums:\n%s", self.unknown.report())
+        if self.duplicates is not None and self.duplicates.entries:
+            log_report(log, self.duplicates.report())
+        if ok:
+            self.checkpoint.clear()
+        else:
+            self.checkpoint.save(indexed=self._confirmed(run))
+            log.error(f"rerun to resume after row {self.checkpoint.resume}")
+
+
+class MurmurationsSource(Source):
+    """
+    Murmurations person profiles, synced incrementally: only new, changed
+    and removed profiles (and the people linked to them) are rewritten,
+    see murmuration/sync.py. With `full`, everyone is.
+    """
+    doc_type = 'person'
+    index = 'people'
+    unit = 'people'
+
+    def __init__(self, nodes_url=NODES_URL, cache='murmurations_cache.sqlite', full=False,
+                 concurrency=16, per_host=8):
+        self.nodes_url = nodes_url
+        self.cache_path = cache
+        self.full = full
+        self.concurrency = concurrency
+        self.per_host = per_host
+
+    def start(self, run):
+        from fetcher import ProfileFetcher
+        from http_cache import HTTPCache
+        from people import build_people, known_urls
+        from sync import SyncState, current_nodes, diff_nodes, linked_closure
+
+        self.cache = HTTPCache(self.cache_path)
+        self.state = SyncState(self.cache_path)
+        synced = self.state.all()
+        with ProfileFetcher(max_workers=self.concurrency, per_host=self.per_host,
+                            cache=self.cache) as fetcher:
+            with run.metrics.stage('fetch'):
+                # The node list is always revalidated, profiles whose
+                # last_updated hasn't moved are read from the cache without a request
+                input_data = fetcher.get_json(self.nodes_url)
+                if input_data is None:
+                    sys.exit(f"Error fetching {self.nodes_url}: {fetcher.errors.get(self.nodes_url)}")
+                current = current_nodes(input_data['data'])
+                with run.progress(len(current), 'profiles') as bar:
+                    profiles = fetcher.fetch_all(current, last_updated=current, progress=bar)
+            failed = set(fetcher.errors)
+            for profile_url in sorted(failed):
+                log.warning(f"Error fetching {profile_url}: {fetcher.errors[profile_url]}")
+            log.info(f"profiles: {dict(fetcher.stats)}")
+            for outcome, n in fetcher.stats.items():
+                run.metrics.count(f"profiles_{outcome}", n)
+
+        # A profile that couldn't be fetched keeps its last known version and
+        # is retried on the next run
+        for profile_url in failed:
+            entry = self.cache.get(profile_url)
+            if entry is not None:
+                profiles[profile_url] = entry.body
+        self.last_updated = {u: synced[u][0] if u in failed and u in synced else current[u]
+                             for u in current}
+
+        with run.metrics.stage('build'):
+            self.people, self.edges, dangling, self.merged = build_people(profiles)
+        run.metrics.count('people', len(self.people))
+        if dangling:
+            log.info(f"{len(dangling)} knows entries point at people we don't have")
+            for source, relationship, target in dangling:
+                log.debug(f"  {source} {relationship} {target}")
+        if self.merged:
+            log.info(f"merged {len(self.merged)} duplicate profiles")
+        for url, kept in sorted(self.merged.items()):
+            log.debug(f"merged duplicate profile {url} into {kept}")
+
+        if self.full:
+            affected = set(current) | set(synced)
+        else:
+            changed, removed = diff_nodes(current, synced)
+            changed -= failed & set(synced)
+            knows = known_urls(profiles, removed)
+            # a duplicate and the profile it was merged into are written as
+            # one person, so a change to either rewrites both
+            for url, kept in self.merged.items():
+                knows.setdefault(url, set()).add(kept)
+                knows.setdefault(kept, set()).add(url)
+            affected = linked_closure(changed | removed, knows)
+        self.affected = affected
+        if not affected:
+            log.info("Nothing changed since the last sync")
+            return
+
+        # Drop the old version of everyone affected, in TerminusDB and in the
+        # index (merged duplicates share the document of the profile they were
+        # merged into)
+        stale_ids = list(dict.fromkeys(synced[u][1] for u in affected if u in synced))
+        if stale_ids:
+            with run.metrics.stage('delete'):
+                run.terminusdb.delete(stale_ids, self.doc_type)
+                if run.search is not None:
+                    run.search.delete([short_id(i) for i in stale_ids])
+            self.state.forget([u for u in affected if u in synced])
+        run.metrics.count('removed', len(stale_ids))
+        log.info(f"removed {len(stale_ids)} people")
+
+        # People that aren't affected keep their IDs, so the new documents
+        # link to them directly
+        self.document_ids = {u: synced[u][1] for u in self.people
+                             if u in synced and u not in affected}
+        self.to_insert = sorted(u for u in affected if u in self.people)
+        self.total = len(self.to_insert)
+
+    def batches(self, run):
+        from people import person_document
+        if not self.affected or not self.to_insert:
+            return
+        # links among the new documents use @ref captures and therefore all
+        # have to go in the same insert
+        yield [person_document(u, self.people[u], self.edges[u], self.document_ids)
+               for u in self.to_insert]
+        self.position = len(self.to_insert)
+
+    def search_documents(self, batch, ids):
+        from people import person_document
+        # built locally, with links resolved to the new IDs
+        new_ids = {u: local_id(i) for u, i in zip(self.to_insert, ids)}
+        self.document_ids.update(new_ids)
+        documents = []
+        for u in self.to_insert:
+            document = person_document(u, self.people[u], self.edges[u], self.document_ids)
+            del document['@capture']
+            documents.append(to_search_document(new_ids[u], document))
+        return documents
+
+    def written(self, run, batch, ids):
+        new_ids = {u: local_id(i) for u, i in zip(self.to_insert, ids)}
+        self.state.record([(u, self.last_updated[u], new_ids[u]) for u in self.to_insert]
+                          + [(u, self.last_updated[u], new_ids[kept])
+                             for u, kept in self.merged.items()
+                             if u in self.affected and kept in new_ids])
+        log.info(f"inserted {len(new_ids)} people")
+
+    def finish(self, run, ok):
+        self.state.close()
+        self.cache.close()
+
+
+class JSONSource(Source):
+    """A JSON array, or one JSON document per line, of `doc_type` documents."""
+    unit = 'documents'
+    transforms = (strip_emojis,)
+
+    def __init__(self, path, doc_type, index=None, batch_size=1000, upsert=False):
+        self.path = path
+        self.doc_type = doc_type
+        self.index = index
+        self.batch_size = batch_size
+        self.upsert = upsert
+
+    def _documents(self):
+        with open(self.path) as f:
+            if f.read(1) == '[':
+                f.seek(0)
+                yield from json.load(f)
+                return
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def batches(self, run):
+        for batch in chunked(self._documents(), self.batch_size):
+            for document in batch:
+                document.setdefault('@type', self.doc_type)
+            self.position += len(batch)
+            yield batch
+
+
+class Run:
+    """The connections and sinks of one run of a source."""
+
+    def __init__(self, args, source, client, search, graph, metrics):
+        self.args = args
+        self.source = source
+        self.client = client
+        self.terminusdb = TerminusDBSink(client, source.upsert)
+        self.search = search
+        self.graph = graph
+        self.metrics = metrics
+
+    def progress(self, total=None, unit='rows'):
+        return progress(self.args, total, unit)
+
+    def execute(self):
+        source, metrics = self.source, self.metrics
+        source.start(self)
+        # a resumed source starts part way, the rate and ETA are for what is left
+        done = source.position
+        bar = self.progress(source.total - done if source.total else None, source.unit)
+        ok = False
+        try:
+            for batch in source.batches(self):
+                if source.transforms:
+                    with metrics.stage('transform'):
+                        for transform in source.transforms:
+                            batch = transform(batch)
+                if not batch:
+                    continue
+                with metrics.stage('insert'):
+                    ids = self.terminusdb.write(batch, source.doc_type)
+                metrics.count('inserted', len(ids))
+                if self.search is not None:
+                    with metrics.stage('index'):
+                        self.search.write(source.search_documents(batch, ids))
+                source.written(self, batch, ids)
+                bar.update(source.position - done)
+                done = source.position
+            bar.close()
+            if self.search is not None:
+                with metrics.stage('index'):
+                    self.search.close()
+                metrics.count('indexed', self.search.sink.documents)
+                log_report(log, self.search.sink.report())
+                if self.search.failures:
+                    log.error(f"{len(self.search.failures)} indexing batches failed")
+            if self.graph is not None:
+                with metrics.stage('graph'):
+                    self.graph.close(source.doc_type)
+            ok = self.search is None or not self.search.failures
+        finally:
+            source.finish(self, ok)
+        return ok
+
+
+def connect_terminusdb(args, db):
+    client = WOQLClient(args.terminusdb)
+    client.connect(db=db, team=args.team, use_token=True)
+    return client
+
+
+def connect_meilisearch(args):
+    if not args.meilisearch_key:
+        sys.exit("No Meilisearch key: pass --meilisearch-key or set MEILISEARCH_KEY "
+                 "(or skip the search index with --no-index)")
+    return meilisearch.Client(args.meilisearch, args.meilisearch_key)
+
+
+def reindex(args, metrics):
+    """Rebuild an index from TerminusDB in a shadow index and swap it in."""
+    doc_type, db = INDEXES[args.name]
+    client = connect_terminusdb(args, args.db or db)
+    # readers keep using the old index until the new one is complete
+    documents = (to_search_document(d['@id'], d)
+                 for d in metrics.timed('read-back', iter_documents(client, doc_type)))
+    with metrics.stage('index'):
+        sink = rebuild_index(connect_meilisearch(args), args.name, documents,
+                             expected=lambda: count_documents(client, doc_type),
+                             configure=lambda shadow: configure_index(shadow, args.name))
+    metrics.count('indexed', sink.documents)
+    log_report(log, sink.report())
+    return True
+
+
+def build_source(args):
+    if args.command == 'csv':
+        return CSVSource(args.csv, args.batch_size, args.workers, args.keep_duplicates,
+                         args.checkpoint, args.restart)
+    if args.command == 'murmurations':
+        # people.py and sync.py live with the Murmurations scripts
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'murmuration'))
+        return MurmurationsSource(args.nodes_url, args.cache, args.full, args.concurrency,
+                                  args.per_host)
+    return JSONSource(args.path, args.type, args.index, args.batch_size, args.upsert)
+
+
+def parser():
+    parser = argparse.ArgumentParser(description="Load data into TerminusDB and Meilisearch")
+    parser.add_argument("--terminusdb", default=TERMINUSDB_URL, help="TerminusDB server URL")
+    parser.add_argument("--team", default=TERMINUSDB_TEAM, help="TerminusDB team")
+    parser.add_argument("--meilisearch", default=MEILISEARCH_URL, help="Meilisearch URL")
+    parser.add_argument("--meilisearch-key", default=MEILISEARCH_KEY,
+                        help="Meilisearch API key (default: $MEILISEARCH_KEY)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def command(name, help, db=None):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument("--db", default=db, required=name == 'json', help="TerminusDB database")
+        add_arguments(sub)
+        return sub
+
+    def sinks(sub):
+        sub.add_argument("--no-index", action="store_true", help="don't update the search index")
+        sub.add_argument("--graph", metavar="PATH",
+                         help="also bring the knowledge graph at PATH up to date")
+
+    csv = command('csv', "Organizations.csv", 'play')
+    csv.add_argument("csv", nargs="?", default="Organizations.csv")
+    csv.add_argument("--batch-size", type=int, default=1000,
+                     help="rows held in memory and sent per insert (default: 1000)")
+    csv.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                     help="processes transforming CSV rows (default: one per core)")
+    csv.add_argument("--keep-duplicates", action="store_true",
+                     help="load rows that look like duplicates of earlier ones instead of "
+                          "dropping them")
+    csv.add_argument("--checkpoint",
+                     help="file recording how far the load got, so a failed run resumes there "
+                          "(default: <csv>.checkpoint.json)")
+    csv.add_argument("--restart", action="store_true",
+                     help="ignore the checkpoint and load the whole file again")
+    csv.add_argument("--reindex", action="store_true",
+                     help="rebuild the orgs index from TerminusDB in a shadow index and "
+                          "swap it in, without loading the CSV")
+    sinks(csv)
+
+    murmurations = command('murmurations', "people from the Murmurations index", 'murmurations')
+    murmurations.add_argument("--full", action="store_true",
+                              help="rewrite every person instead of only the changed ones; the "
+                                   "people index is rebuilt in a shadow index and swapped in")
+    murmurations.add_argument("--cache", default="murmurations_cache.sqlite",
+                              help="file holding cached profiles and the sync state")
+    murmurations.add_argument("--nodes-url", default=NODES_URL,
+                              help="Murmurations index query listing the person profiles")
+    murmurations.add_argument("--concurrency", type=int, default=16,
+                              help="profiles fetched at once (default: 16)")
+    murmurations.add_argument("--per-host", type=int, default=8,
+                              help="profiles fetched at once from one host (default: 8)")
+    sinks(murmurations)
+
+    documents = command('json', "a JSON array or NDJSON file of documents")
+    documents.add_argument("path")
+    documents.add_argument("--type", required=True, help="document type, for documents without @type")
+    documents.add_argument("--index", help="Meilisearch index for the documents")
+    documents.add_argument("--batch-size", type=int, default=1000,
+                           help="documents sent per insert (default: 1000)")
+    documents.add_argument("--upsert", action="store_true",
+                           help="the documents carry their @id: replace them if they exist")
+    sinks(documents)
+
+    rebuild = command('reindex', "rebuild a search index from TerminusDB")
+    rebuild.add_argument("name", choices=sorted(INDEXES))
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.command == 'reindex' or getattr(args, 'reindex', False):
+        if args.command == 'csv':
+            args.name = 'orgs'
+        metrics = start(args, f"reindex {args.name}")
+        ok = reindex(args, metrics)
+        finish(metrics, args)
+        return 0 if ok else 1
+
+    source = build_source(args)
+    metrics = start(args, args.command)
+    # a missing key fails here, before anything is written to TerminusDB
+    indexing = connect_meilisearch(args) if source.index and not args.no_index else None
+    client = connect_terminusdb(args, args.db)
+    search = None
+    if indexing is not None:
+        rebuild = getattr(args, 'full', False)
+        search = SearchIndexSink(indexing, source.index, rebuild,
+                                 expected=lambda: count_documents(client, source.doc_type))
+    graph = GraphSink(client, args.graph) if args.graph else None
+    ok = Run(args, source, client, search, graph, metrics).execute()
+    finish(metrics, args)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Knowledge graph export for the explore, geomap and CTA views.
+
+Turns TerminusDB documents into the {'entities': [...], 'relations': [...]}
+graph the Svelte components load, written in the binary form of
+graph_format.py (or as JSON for a .json path), with every entity placed by
+layout.py so the views can skip the in-browser layout and carrying the
+degree, community and PageRank measures of analytics.py. List-valued fields are exploded into a
+relation table in one vectorized pass, and attribute entities (e.g.
+'Ethereum') are emitted once no matter how many documents mention them.
+
+    export_graph(client, 'Organization', 'knowledge_graph.bin')
+"""
+import pandas as pd
+
+from analytics import annotate_graph
+from documents import PAGE_SIZE, iter_frames
+from graph_format import save_graph
+from layout import layout_graph
+
+# What each document type contributes to the graph:
+#   node_type   entity type of the documents themselves
+#   edges       document field -> relation type
+#   attributes  whether edge targets are attribute values that need their
+#               own entity, rather than links to other documents
+#   properties  extra document fields copied onto the entity
+GRAPHS = {
+    'Organization': {
+        'node_type': 'organization',
+        'edges': {
+            'assignee': 'assignee',
+            'blockchainecosystem': 'blockchain ecosystem',
+            'topic': 'topic',
+            'web3': 'web3',
+        },
+        'attributes': True,
+        'properties': (),
+    },
+    'person': {
+        'node_type': 'person',
+        'edges': {
+            'LI': 'LI',
+            'vouches_for': 'vouches_for',
+        },
+        'attributes': False,
+        'properties': ('description', 'image', 'locality', 'primary_url'),
+    },
+}
+
+
+def documents_to_frame(documents):
+    df = pd.DataFrame.from_records(list(documents))
+    if df.empty:
+        return pd.DataFrame(columns=['@id', 'name'])
+    return df
+
+
+def relation_table(df, field, relation_type):
+    """One row per (document, value) of `field`, blanks dropped."""
+    if field not in df.columns:
+        return pd.DataFrame(columns=['source', 'target', 'type'])
+    pairs = df[['@id', field]].explode(field).dropna()
+    pairs = pairs[pairs[field] != '']
+    return pd.DataFrame({'source': pairs['@id'].to_numpy(),
+                         'target': pairs[field].to_numpy(),
+                         'type': relation_type})
+
+
+def graph_fields(doc_type):
+    """The document fields the graph of `doc_type` is built from."""
+    spec = GRAPHS[doc_type]
+    return ['name', *spec['edges'], *spec['properties']]
+
+
+def _chunk_tables(df, spec):
+    columns = {'id': df['@id'], 'label': df['name'], 'type': spec['node_type']}
+    for prop in spec['properties']:
+        if prop in df.columns:
+            columns[prop] = df[prop]
+    relations = [relation_table(df, field, relation_type)
+                 for field, relation_type in spec['edges'].items()]
+    return pd.DataFrame(columns), relations
+
+
+def build_graph(frames, doc_type):
+    """
+    Return (entities, relations) DataFrames for `doc_type` documents, given
+    as one DataFrame or an iterable of DataFrame chunks.
+    """
+    spec = GRAPHS[doc_type]
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    nodes, relations = [], []
+    for df in frames:
+        if df.empty:
+            continue
+        chunk_nodes, chunk_relations = _chunk_tables(df, spec)
+        nodes.append(chunk_nodes)
+        relations.extend(chunk_relations)
+
+    entities = pd.concat(nodes, ignore_index=True) if nodes \
+        else pd.DataFrame(columns=['id', 'label', 'type'])
+    relations = pd.concat(relations, ignore_index=True).drop_duplicates(ignore_index=True) \
+        if relations else pd.DataFrame(columns=['source', 'target', 'type'])
+
+    if spec['attributes']:
+        values = relations['target'].drop_duplicates()
+        attributes = pd.DataFrame({'id': values, 'label': values, 'type': 'attribute'})
+        entities = pd.concat([entities, attributes], ignore_index=True)
+    entities = entities.drop_duplicates('id', ignore_index=True)
+    return entities, relations
+
+
+def _records(df):
+    records = df.to_dict('records')
+    if len(df.columns) > 3:
+        # optional properties are left out rather than written as NaN
+        records = [{k: v for k, v in r.items() if not (isinstance(v, float) and pd.isna(v))}
+                   for r in records]
+    return records
+
+
+def to_json(entities, relations):
+    return {'entities': _records(entities), 'relations': _records(relations)}
+
+
+def write_graph(entities, relations, path, doc_type, layout=True):
+    graph = to_json(entities, relations)
+    if layout:
+        layout_graph(graph)
+    annotate_graph(graph, doc_type)
+    save_graph(graph, path)
+
+
+def export_graph(client, doc_type, path, page_size=PAGE_SIZE):
+    """
+    Export every `doc_type` document of the connected database to `path`,
+    reading them page by page and only the fields the graph needs.
+    """
+    frames = iter_frames(client, doc_type, page_size, fields=graph_fields(doc_type))
+    entities, relations = build_graph(frames, doc_type)
+    write_graph(entities, relations, path, doc_type)
+    return entities, relations
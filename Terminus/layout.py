@@ -0,0 +1,309 @@
+"""
+Force-directed layout of the knowledge graph, computed at export time.
+
+The views used to run Cytoscape's 'cose' layout in the browser on every
+search. Instead the exporter stores x/y on each entity and the views use a
+'preset' layout. The layout is Fruchterman-Reingold with a Barnes-Hut style
+approximation of the repulsion, vectorized with NumPy:
+
+  - the bounding box is split into grids of 4, 16, 64, ... cells and the
+    mass and centre of mass of every occupied cell are computed with
+    bincount;
+  - at each level a node is pushed by the cells that are children of its
+    parent's neighbours but not neighbours of its own cell (the cells that
+    are far enough away to be treated as one body at that size);
+  - once few enough nodes share a node's 3x3 neighbourhood of cells, those
+    are handled exactly, pair by pair, and the node goes no finer.
+
+Links pull with d^2/k, a weak gravity keeps disconnected components
+together, and a cooling temperature caps how far a node moves per step. A
+node whose force turns around has its own step halved, so nodes that
+overshoot settle instead of swinging, and the layout stops as soon as no
+node moves by more than a pixel.
+
+For incremental exports only the nodes around what changed are movable;
+everything else stays where it was, so the picture doesn't reshuffle. The
+fixed nodes are sorted into a tree once, and each step only computes the
+forces on the movable nodes, so its cost grows with the number of moved
+nodes rather than with the size of the graph.
+"""
+import numpy as np
+
+# ideal distance between linked nodes, in Cytoscape pixels
+EDGE_LENGTH = 60.0
+ITERATIONS = 300
+INCREMENTAL_ITERATIONS = 60
+# a layout stops early once no node moves further than this times EDGE_LENGTH
+SETTLED = 0.01
+# a node whose force turns around overshot: its step is cut by this factor,
+# and grows back by SWING_GROWTH per step while it keeps its direction
+SWING_DAMPING = 0.5
+SWING_GROWTH = 1.2
+# pull towards the centre, keeps disconnected components together
+GRAVITY = 1.0
+# a node's neighbours are handled pair by pair once at most this many
+# nodes share its 3x3 neighbourhood of cells
+NEAR_LIMIT = 48
+MAX_LEVEL = 16
+DENSE_SIZE = 1024
+
+# Cells that are children of the parent cell's 3x3 neighbourhood but not
+# in the node's own 3x3 neighbourhood, relative to the node's cell. They
+# depend on which of its parent's four children the node's cell is.
+_FAR = np.array([[(dx, dy) for dx in range(-2 - px, 4 - px) for dy in range(-2 - py, 4 - py)
+                  if max(abs(dx), abs(dy)) > 1]
+                 for px in (0, 1) for py in (0, 1)])
+_NEIGHBOURS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+
+
+def _cells(unit, size):
+    # points outside the box (movable nodes around a fixed tree) take the border cells
+    return np.clip((unit * size).astype(np.int64), 0, size - 1)
+
+
+class _Grid:
+    """Occupied cells of one level, with their mass and centre of mass."""
+
+    def __init__(self, positions, unit, level):
+        self.size = 2 ** level
+        cells = _cells(unit, self.size)
+        flat = cells[:, 0] * self.size + cells[:, 1]
+        self.keys, inverse, counts = np.unique(flat, return_inverse=True, return_counts=True)
+        self.mass = counts.astype(float)
+        self.cx = np.bincount(inverse, positions[0]) / self.mass
+        self.cy = np.bincount(inverse, positions[1]) / self.mass
+        self.order = np.argsort(flat, kind='stable')
+        self.sorted = flat[self.order]
+        # a dense cell -> slot table while it's small, binary search beyond
+        self.dense = None
+        if self.size <= DENSE_SIZE:
+            self.dense = np.full(self.size * self.size + 1, -1, dtype=np.int64)
+            self.dense[self.keys] = np.arange(len(self.keys))
+
+    def lookup(self, cells):
+        """Slot of each cell in `keys`, or -1 where it is empty or outside."""
+        inside = ((cells >= 0) & (cells < self.size)).all(axis=-1)
+        flat = np.where(inside, cells[..., 0] * self.size + cells[..., 1], -1)
+        if self.dense is not None:
+            return self.dense[flat]
+        slot = np.minimum(np.searchsorted(self.keys, flat), len(self.keys) - 1)
+        return np.where(inside & (self.keys[slot] == flat), slot, -1)
+
+
+class _Tree:
+    """
+    The grids of every level over a set of bodies (2 x n positions), built
+    as they are needed and kept, so bodies that don't move are only
+    sorted into cells once however often they are queried.
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+        low = positions.min(axis=1)
+        span = max(float(np.ptp(positions, axis=1).max()), 1e-9) * (1 + 1e-9)
+        self.low, self.span = low[:, None], span
+        self.unit = ((positions - self.low) / span).T
+        self.grids = {}
+
+    def grid(self, level):
+        if level not in self.grids:
+            self.grids[level] = _Grid(self.positions, self.unit, level)
+        return self.grids[level]
+
+    def repulsion(self, points, k, same=False):
+        """
+        k^2/d repulsion (2 x m) on `points` (2 x m) from the bodies. With
+        `same`, the points are the bodies themselves and skip their own pair.
+        """
+        force = np.zeros(points.shape)
+        unit = ((points - self.low) / self.span).T
+        nodes = np.arange(points.shape[1])
+        k2 = k * k
+        # Every point is resolved at the coarsest level where its 3x3
+        # neighbourhood is small enough to handle pair by pair; until then it
+        # takes the far cells of each level as single bodies and goes finer.
+        for level in range(2, MAX_LEVEL + 1):
+            grid = self.grid(level)
+            cells = _cells(unit[nodes], grid.size)
+            self._far_field(points, grid, nodes, cells, k2, force)
+            slots = grid.lookup(cells[:, None, :] + _NEIGHBOURS[None, :, :])
+            crowd = np.where(slots >= 0, grid.mass[slots], 0).sum(axis=1)
+            done = crowd <= NEAR_LIMIT if level < MAX_LEVEL else np.ones(len(nodes), dtype=bool)
+            self._near_field(points, grid, nodes[done], slots[done], k2, force, same)
+            nodes = nodes[~done]
+            if not len(nodes):
+                break
+        return force
+
+    def _far_field(self, points, grid, nodes, cells, k2, force):
+        parity = (cells[:, 0] % 2) * 2 + cells[:, 1] % 2
+        slots = grid.lookup(cells[:, None, :] + _FAR[parity])
+        node, which = np.nonzero(slots >= 0)
+        slot = slots[node, which]
+        node = nodes[node]
+        _push(force, node, points[0][node] - grid.cx[slot], points[1][node] - grid.cy[slot],
+              k2 * grid.mass[slot])
+
+    def _near_field(self, points, grid, nodes, slots, k2, force, same):
+        # every (point, body in its 3x3 neighbourhood) pair
+        counts = np.where(slots >= 0, grid.mass[slots], 0).astype(np.int64)
+        starts = np.searchsorted(grid.sorted, grid.keys[np.maximum(slots, 0)])
+        counts, starts = counts.ravel(), starts.ravel()
+        total = counts.sum()
+        if not total:
+            return
+        i = np.repeat(np.repeat(nodes, 9), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        j = grid.order[np.repeat(starts, counts) + np.arange(total) - first]
+        if same:
+            pair = i != j
+            i, j = i[pair], j[pair]
+        bodies = self.positions
+        _push(force, i, points[0][i] - bodies[0][j], points[1][i] - bodies[1][j], k2)
+
+
+def _push(force, nodes, dx, dy, weight):
+    # positions and forces are kept as separate x and y arrays, which
+    # gather much faster than rows of an (n, 2) array
+    scale = weight / np.maximum(dx * dx + dy * dy, 1e-9)
+    force[0] += np.bincount(nodes, dx * scale, len(force[0]))
+    force[1] += np.bincount(nodes, dy * scale, len(force[1]))
+
+
+def repulsion(positions, k, fixed=None):
+    """
+    Approximate k^2/d repulsion on every node (n x 2 positions) from all
+    the others, plus from the bodies of `fixed`, a _Tree, if given.
+    """
+    points = np.ascontiguousarray(positions.T)
+    force = _Tree(points).repulsion(points, k, same=True) if len(positions) > 1 \
+        else np.zeros(points.shape)
+    if fixed is not None:
+        force += fixed.repulsion(points, k)
+    return force.T
+
+
+def attraction(positions, sources, targets, k):
+    delta = positions[sources] - positions[targets]
+    pull = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+    force = np.zeros_like(positions)
+    for axis in (0, 1):
+        force[:, axis] = (np.bincount(targets, pull[:, axis], len(positions))
+                          - np.bincount(sources, pull[:, axis], len(positions)))
+    return force
+
+
+def force_layout(count, sources, targets, positions=None, movable=None, iterations=None,
+                 edge_length=EDGE_LENGTH, seed=0):
+    """
+    Positions (count x 2) for a graph with edges sources[i] -> targets[i].
+    With `positions` and a boolean `movable` mask, only the movable nodes
+    are moved and the rest is kept fixed: their repulsion comes from a tree
+    built once, and only the links of movable nodes are followed, so a
+    step costs O(movable log n) rather than O(n log n).
+    """
+    rng = np.random.default_rng(seed)
+    k = float(edge_length)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if positions is None:
+        radius = k * np.sqrt(max(count, 1))
+        positions = rng.uniform(-radius, radius, (count, 2))
+        movable = np.ones(count, dtype=bool)
+    else:
+        positions = np.array(positions, dtype=float)
+        movable = np.ones(count, dtype=bool) if movable is None else np.asarray(movable)
+    if count < 2 or not movable.any():
+        return positions
+
+    incremental = not movable.all()
+    if iterations is None:
+        iterations = INCREMENTAL_ITERATIONS if incremental else ITERATIONS
+    # nodes only shuffle locally when most of the graph is fixed
+    start = k * 2 if incremental else float(np.ptp(positions, axis=0).max()) / 10
+    centre = positions.mean(axis=0)
+    nodes = np.nonzero(movable)[0]
+    fixed = None
+    if incremental:
+        fixed = _Tree(np.ascontiguousarray(positions[~movable].T))
+        # only links with a movable end pull on anything that moves
+        linked = movable[sources] | movable[targets]
+        sources, targets = sources[linked], targets[linked]
+    heat = np.full(len(nodes), start)
+    previous = np.zeros((len(nodes), 2))
+    for step in range(iterations):
+        temperature = start * (1 - step / iterations) + k / 100
+        force = repulsion(positions[nodes], k, fixed)
+        force += attraction(positions, sources, targets, k)[nodes]
+        force -= GRAVITY * (positions[nodes] - centre)
+        length = np.maximum(np.sqrt((force ** 2).sum(axis=1)), 1e-9)
+        # nodes with many links otherwise swing across their place by the
+        # full temperature every step and the layout never settles
+        swung = (force * previous).sum(axis=1) < 0
+        heat = np.minimum(heat * np.where(swung, SWING_DAMPING, SWING_GROWTH), temperature)
+        step_length = np.minimum(length, heat)
+        positions[nodes] += force * (step_length / length)[:, None]
+        previous = force
+        # settled: nothing moves by more than a pixel
+        if step_length.max() < k * SETTLED:
+            break
+    return positions
+
+
+def _initial_positions(ids, entities, sources, targets, k, rng):
+    """Known positions, and new nodes placed next to their positioned neighbours."""
+    positions = np.full((len(ids), 2), np.nan)
+    for i, entity in enumerate(entities):
+        if 'x' in entity and 'y' in entity:
+            positions[i] = entity['x'], entity['y']
+    known = ~np.isnan(positions[:, 0])
+    if not known.any():
+        return None, known
+    centre = positions[known].mean(axis=0)
+    spread = np.sqrt(known.sum()) * k
+    for i in np.nonzero(~known)[0]:
+        neighbours = np.concatenate([targets[sources == i], sources[targets == i]])
+        neighbours = neighbours[known[neighbours]]
+        anchor = positions[neighbours].mean(axis=0) if len(neighbours) else \
+            centre + rng.uniform(-spread, spread, 2)
+        positions[i] = anchor + rng.uniform(-k / 2, k / 2, 2)
+    return positions, known
+
+
+def layout_graph(graph, changed=None, edge_length=EDGE_LENGTH, seed=0):
+    """
+    Add 'x' and 'y' to every entity of `graph` (in place) and return the
+    IDs of the entities that moved. Without `changed`, the whole graph is
+    laid out from scratch. With a set of changed entity IDs, entities that
+    already have coordinates keep them, except those changed entities and
+    their neighbours, which are laid out around the fixed rest.
+    """
+    entities = graph['entities']
+    ids = [entity['id'] for entity in entities]
+    index = {entity_id: i for i, entity_id in enumerate(ids)}
+    links = [(index[r['source']], index[r['target']]) for r in graph['relations']
+             if r['source'] in index and r['target'] in index]
+    sources = np.array([s for s, _ in links], dtype=np.int64)
+    targets = np.array([t for _, t in links], dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    positions, movable = None, None
+    if changed is not None:
+        positions, known = _initial_positions(ids, entities, sources, targets, edge_length, rng)
+    if positions is not None:
+        movable = ~known
+        seeds = np.array([index[i] for i in changed if i in index], dtype=np.int64)
+        movable[seeds] = True
+        # and the direct neighbours of whatever changed
+        touched = np.zeros(len(ids), dtype=bool)
+        touched[seeds] = True
+        movable[targets[touched[sources]]] = True
+        movable[sources[touched[targets]]] = True
+
+    positions = force_layout(len(ids), sources, targets, positions, movable,
+                             edge_length=edge_length, seed=seed)
+    moved = range(len(ids)) if movable is None else np.nonzero(movable)[0]
+    for i in moved:
+        entities[i]['x'] = round(float(positions[i, 0]), 1)
+        entities[i]['y'] = round(float(positions[i, 1]), 1)
+    return [ids[i] for i in moved]
@@ -0,0 +1,245 @@
+"""
+Timers, counters and progress reporting for ingestion runs.
+
+A Metrics object collects wall-clock time per stage and named counters:
+
+    metrics = Metrics('organizations')
+    with metrics.stage('insert'):
+        client.insert_document(batch)
+    metrics.count('inserted', len(batch))
+
+Timing is per batch, not per row, so it costs nothing measurable. Stage
+times from worker processes are merged in with `update`, which makes
+them CPU seconds summed over the workers rather than wall-clock time.
+At the end of a run the numbers can be written as a JSON report and as a
+Prometheus textfile (for node_exporter's textfile collector).
+
+Progress draws a progress bar with ETA on a terminal and falls back to
+an occasional log line otherwise, e.g. under cron.
+
+Scripts share their command line options and logging setup through
+add_arguments / start / finish, and log the multi-line reports of
+SearchSink and Deduplicator with log_report.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+log = logging.getLogger(__name__)
+
+_END = object()
+
+
+class Metrics:
+
+    def __init__(self, run=None):
+        self.run = run
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.counters = Counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def timed(self, name, iterable):
+        """Yield from `iterable`, timing the work of producing each item as stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def update(self, other):
+        """Add the stage times and counters of another Metrics, e.g. from a worker process."""
+        self.seconds.update(other.seconds)
+        self.calls.update(other.calls)
+        self.counters.update(other.counters)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def report(self):
+        """The run as a JSON-serializable dict."""
+        return {
+            'run': self.run,
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'seconds': round(self.elapsed, 3),
+            'stages': {name: {'seconds': round(self.seconds[name], 3), 'calls': self.calls[name]}
+                       for name in self.seconds},
+            'counters': dict(self.counters),
+        }
+
+    def summary(self):
+        elapsed = self.elapsed
+        lines = [f"{self.run or 'run'} took {elapsed:.1f}s"]
+        for name, seconds in self.seconds.most_common():
+            lines.append(f"  {name:<12} {seconds:8.2f}s {seconds / elapsed if elapsed else 0:6.1%} "
+                         f"({self.calls[name]} calls)")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<12} {value:>9} ({value / elapsed if elapsed else 0:.0f}/s)")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_prometheus(self, path, prefix='myseelia_ingest'):
+        """Write the run in the Prometheus text format, replacing `path` atomically."""
+        run = self.run or ''
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall-clock seconds spent in each stage of the last run.",
+            f"# TYPE {prefix}_stage_seconds gauge",
+            *(f'{prefix}_stage_seconds{{run="{run}",stage="{name}"}} {seconds:.6f}'
+              for name, seconds in sorted(self.seconds.items())),
+            f"# HELP {prefix}_stage_calls Times each stage ran in the last run.",
+            f"# TYPE {prefix}_stage_calls gauge",
+            *(f'{prefix}_stage_calls{{run="{run}",stage="{name}"}} {calls}'
+              for name, calls in sorted(self.calls.items())),
+            f"# HELP {prefix}_items Items counted in the last run.",
+            f"# TYPE {prefix}_items gauge",
+            *(f'{prefix}_items{{run="{run}",counter="{name}"}} {value}'
+              for name, value in sorted(self.counters.items())),
+            f"# HELP {prefix}_duration_seconds Duration of the last run.",
+            f"# TYPE {prefix}_duration_seconds gauge",
+            f'{prefix}_duration_seconds{{run="{run}"}} {self.elapsed:.6f}',
+            f"# HELP {prefix}_last_run_timestamp_seconds When the last run started.",
+            f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+            f'{prefix}_last_run_timestamp_seconds{{run="{run}"}} {self.started:.3f}',
+        ]
+        # the collector may read the file at any moment, never show it half written
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary, path)
+
+
+def _duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class Progress:
+    """
+    Progress towards `total` items (or an open-ended count without one).
+    Redrawn at most every `interval` seconds on a terminal; elsewhere
+    logged every `log_interval` seconds.
+    """
+
+    def __init__(self, total=None, unit='rows', stream=None, enabled=True,
+                 interval=0.2, log_interval=30.0):
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.stream = stream or sys.stderr
+        self.enabled = enabled
+        self.terminal = enabled and self.stream.isatty()
+        self.interval = interval if self.terminal else log_interval
+        self._start = self._last = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, n=1):
+        self.done += n
+        now = time.monotonic()
+        if self.enabled and now - self._last >= self.interval:
+            self._last = now
+            self._show(now)
+
+    def line(self, now=None):
+        elapsed = (now or time.monotonic()) - self._start
+        rate = self.done / elapsed if elapsed else 0
+        if not self.total:
+            return f"{self.done} {self.unit} {rate:.0f}/s {_duration(elapsed)}"
+        fraction = min(self.done / self.total, 1)
+        filled = int(fraction * 30)
+        eta = (self.total - self.done) / rate if rate else 0
+        return (f"[{'#' * filled}{' ' * (30 - filled)}] {self.done}/{self.total} {self.unit} "
+                f"{fraction:4.0%} {rate:.0f}/s ETA {_duration(eta)}")
+
+    def _show(self, now):
+        if self.terminal:
+            self.stream.write("\r" + self.line(now) + "\033[K")
+            self.stream.flush()
+        else:
+            log.info(self.line(now))
+
+    def close(self):
+        if self.terminal:
+            self._show(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def add_arguments(parser):
+    """The logging, progress and report options every ingestion script takes."""
+    group = parser.add_argument_group("logging and metrics")
+    group.add_argument("-v", "--verbose", action="count", default=0,
+                       help="more detail (-vv for debug output)")
+    group.add_argument("-q", "--quiet", action="store_true", help="only warnings and errors")
+    group.add_argument("--no-progress", action="store_true", help="don't draw a progress bar")
+    group.add_argument("--metrics-json", metavar="PATH", help="write a JSON run report to PATH")
+    group.add_argument("--metrics-prom", metavar="PATH",
+                       help="write the run's metrics as a Prometheus textfile to PATH")
+
+
+def start(args, run):
+    """Set up logging from the options of add_arguments and return the run's Metrics."""
+    if args.quiet:
+        level = logging.WARNING
+    else:
+        level = logging.DEBUG if args.verbose > 1 else logging.INFO
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+                        if args.verbose else "%(message)s")
+    # every request of the HTTP clients would drown out our own debug output
+    logging.getLogger('urllib3').setLevel(max(level, logging.INFO))
+    return Metrics(run)
+
+
+def log_report(logger, report):
+    """Log the first line of a multi-line report at INFO and the details at DEBUG."""
+    summary, _, details = report.partition("\n")
+    logger.info(summary)
+    if details:
+        logger.debug(details)
+
+
+def showing_progress(args):
+    """Whether progress is shown at all, so a total that costs a pass over the input is worth it."""
+    return not (args.no_progress or args.quiet)
+
+
+def progress(args, total=None, unit='rows'):
+    return Progress(total, unit, enabled=showing_progress(args))
+
+
+def finish(metrics, args):
+    """Log the summary and write the reports asked for."""
+    log.info(metrics.summary())
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
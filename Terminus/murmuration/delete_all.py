@@ -1,12 +1,44 @@
-from terminusdb_client import WOQLClient
-
-client = WOQLClient("https://cloud.terminusdb.com/Myseelia/")
-client.connect(db="murmurations", team="Myseelia", use_token=True)
-
-# Query for all documents with type "person"
-query = client.query_document({"@type": "person"})
-ids = []
-# Delete each document by its ID
-for doc in list(query):
-    ids.append(doc['@id'])
-client.delete_document(ids)
\ No newline at end of file
+"""
+Delete every person, in TerminusDB and in the people index, and forget
+the sync state so the next insert_data.py run inserts everyone again.
+
+    python delete_all.py [--dry-run] [--batch-size N] [--no-index]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from documents import count_documents
+from ingest import (MEILISEARCH_KEY, MEILISEARCH_URL, TERMINUSDB_TEAM, TERMINUSDB_URL,
+                    connect_meilisearch, connect_terminusdb)
+from purge import purge
+from sync import SyncState
+
+parser = argparse.ArgumentParser(description="Delete every Murmurations person")
+parser.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+parser.add_argument("--batch-size", type=int,
+                    help="delete in batches of this many IDs instead of one server-side query")
+parser.add_argument("--cache", default="murmurations_cache.sqlite",
+                    help="file holding cached profiles and the sync state")
+parser.add_argument("--no-index", action="store_true",
+                    help="leave the people index alone (no Meilisearch key needed)")
+parser.add_argument("--terminusdb", default=TERMINUSDB_URL, help="TerminusDB server URL")
+parser.add_argument("--team", default=TERMINUSDB_TEAM, help="TerminusDB team")
+parser.add_argument("--meilisearch", default=MEILISEARCH_URL, help="Meilisearch URL")
+parser.add_argument("--meilisearch-key", default=MEILISEARCH_KEY,
+                    help="Meilisearch API key (default: $MEILISEARCH_KEY)")
+args = parser.parse_args()
+
+# refuses to run without a key unless --no-index, so people aren't left searchable
+index = None if args.no_index else connect_meilisearch(args).index('people')
+client = connect_terminusdb(args, 'murmurations')
+
+searchable = f", {index.get_stats().number_of_documents} in the people index" if index else ""
+print(f"{count_documents(client, 'person')} people in murmurations{searchable}")
+if args.dry_run:
+    sys.exit(0)
+
+print(f"deleted {purge(client, 'person', index, args.batch_size)} people")
+with SyncState(args.cache) as state:
+    state.clear()
@@ -1,7 +1,12 @@
-import requests
 import json
+import os
+import sys
 import pandas as pd
 
+# shared ingestion helpers live one directory up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fetcher import ProfileFetcher
+
 # Define the endpoint and headers for the API request
 endpoint = 'https://test-index.murmurations.network/v2/nodes'
 headers = {'Content-Type': 'application/json'}
@@ -13,18 +18,10 @@ with open('murmuration_people.json', 'r') as f:
 # Extract the data field from the input data
 response_data = input_data['data']
 
-# Loop through the response data and retrieve each profile's details with a curl request
-profiles = []
-for profile in response_data:
-    # Define the data to be sent in the GET request
-    endpoint = profile['profile_url']
-    headers = {'accept': 'application/json'}
-
-    # Send the GET request to retrieve the profile details
-    response = requests.get(endpoint, headers=headers)
-    response_data = response.json()
-    print(response_data)
-    profiles.append(response)
+# Retrieve every profile's details concurrently, each URL only once
+with ProfileFetcher() as fetcher:
+    fetched = fetcher.fetch_all(profile['profile_url'] for profile in response_data)
+profiles = [profile for profile in fetched.values() if profile is not None]
 
 # Convert the profiles list to a Pandas dataframe
 df = pd.DataFrame(profiles)
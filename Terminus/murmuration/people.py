@@ -0,0 +1,172 @@
+"""
+Turning Murmurations person profiles into `person` documents.
+
+People are identified by the profile URL they were fetched from. Profiles
+that are near-duplicates of an earlier one (dedup.py: the same
+primary_url, or the same name and no URL telling them apart) are merged
+into it, and links to them resolve to it.
+
+The documents are plain dicts in TerminusDB's JSON format, so that links
+to people that already exist in the database can be written as their
+stored IDs, and links inside the same insert as @ref captures.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dedup import Deduplicator, merge_into, normalize_url
+from sanitize import remove_emojis
+
+# `knows` relationship type -> person field
+RELATIONSHIPS = {
+    'VOUCHES_FOR': 'vouches_for',
+    'LI': 'LI',
+}
+
+
+def person_fields(profile):
+    """The scalar person fields of a profile, or None if it has no name."""
+    name = profile.get('name')
+    if not name:
+        return None
+    return {
+        'name': remove_emojis(str(name)),
+        'description': profile.get('description'),
+        'primary_url': profile.get('primary_url'),
+        'image': profile.get('image'),
+        'locality': profile.get('locality'),
+    }
+
+
+class PeopleIndex:
+    """
+    URL-keyed identity index over the people of one run.
+
+    Every person is identified by the profile URL it was fetched from.
+    `resolve` maps any URL a `knows` entry may use for them (the profile URL
+    spelled differently, or their primary_url) back to that profile URL
+    with a single dict lookup. `keys` is the reverse index.
+    """
+
+    def __init__(self, people=()):
+        self.profile_urls = {}
+        self.keys = {}
+        for profile_url in people:
+            self.add(profile_url, people[profile_url])
+
+    def add(self, profile_url, fields):
+        key = normalize_url(profile_url)
+        self.profile_urls[key] = profile_url
+        self.keys[profile_url] = key
+        primary = normalize_url(fields.get('primary_url'))
+        # a profile URL always wins over someone else's primary_url
+        if primary is not None:
+            self.profile_urls.setdefault(primary, profile_url)
+
+    def alias(self, profile_url, fields, kept):
+        """Resolve the URLs of a merged duplicate profile to the one kept."""
+        self.profile_urls[normalize_url(profile_url)] = kept
+        primary = normalize_url(fields.get('primary_url'))
+        if primary is not None:
+            self.profile_urls.setdefault(primary, kept)
+
+    def resolve(self, url):
+        return self.profile_urls.get(normalize_url(url))
+
+    def __contains__(self, profile_url):
+        return profile_url in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def build_edges(people, profiles, index, merged=None):
+    """
+    Resolve every `knows` entry of `people` in one pass. `merged` maps a
+    person to the duplicate profiles merged into them, whose `knows`
+    entries count as theirs.
+
+    Returns {profile_url: {field: set(profile_url)}} and a list of
+    (source, type, url) for entries that point at nobody we have.
+    """
+    edges = {}
+    dangling = []
+    merged = merged or {}
+    for url in people:
+        links = {field: set() for field in RELATIONSHIPS.values()}
+        for source in (url, *merged.get(url, ())):
+            for known in profiles[source].get('knows', []):
+                field = RELATIONSHIPS.get(known.get('type'))
+                if field is None:
+                    continue
+                target = index.resolve(known.get('url'))
+                if target is None:
+                    dangling.append((source, known.get('type'), known.get('url')))
+                elif target != url:
+                    links[field].add(target)
+        edges[url] = links
+    return edges, dangling
+
+
+def build_people(profiles):
+    """
+    Build the people of {profile_url: profile json}.
+
+    Returns {profile_url: fields}, the resolved edges, the dangling
+    `knows` entries (see build_edges) and {duplicate profile_url: profile_url
+    it was merged into}.
+    """
+    people = {}
+    duplicates = Deduplicator(url_fields=('primary_url',))
+    merged = {}
+    for url, profile in profiles.items():
+        if profile is None:
+            continue
+        fields = person_fields(profile)
+        if fields is None:
+            continue
+        kept = duplicates.add(url, fields)
+        if kept is None:
+            people[url] = fields
+        else:
+            merge_into(people[kept], fields)
+            merged[url] = kept
+    index = PeopleIndex(people)
+    for url, kept in merged.items():
+        index.alias(url, profiles[url], kept)
+    members = {}
+    for url, kept in merged.items():
+        members.setdefault(kept, []).append(url)
+    edges, dangling = build_edges(people, profiles, index, members)
+    return people, edges, dangling, merged
+
+
+def known_urls(profiles, other_urls=()):
+    """
+    {profile_url: set of URLs listed in its `knows`}, resolved to profile
+    URLs. `other_urls` are profile URLs of people who are no longer in
+    `profiles` (e.g. removed since the last sync) so links to them resolve
+    too; anything else is kept as its normalized URL.
+    """
+    index = PeopleIndex({url: {} for url in other_urls})
+    for url, profile in profiles.items():
+        if profile is not None:
+            index.add(url, profile)
+    return {url: {index.resolve(known.get('url')) or normalize_url(known.get('url'))
+                  for known in profile.get('knows', [])}
+            for url, profile in profiles.items() if profile is not None}
+
+
+def person_document(url, fields, links, document_ids):
+    """
+    The JSON document for the person at `url`.
+
+    Links to people in `document_ids` (profile_url -> stored ID) use that ID,
+    anything else is referenced by its capture in the same insert.
+    """
+    document = {'@type': 'person', '@capture': url}
+    document.update({k: v for k, v in fields.items() if v is not None})
+    for field, targets in links.items():
+        document[field] = [document_ids[t] if t in document_ids else {'@ref': t}
+                           for t in sorted(targets)]
+    return document
@@ -0,0 +1,86 @@
+"""
+Incremental Murmurations sync.
+
+SyncState remembers, per profile URL, the node's `last_updated` and the
+TerminusDB ID of the person written for it. Comparing that with the
+current node list tells which people are new, changed or gone. Because
+`person` uses a ValueHashKey, a person's ID changes whenever a person they
+link to changes, so everyone who (transitively) links to a changed person
+has to be rewritten as well.
+"""
+import sqlite3
+from collections import defaultdict
+
+
+class SyncState:
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS synced ("
+            " url TEXT PRIMARY KEY, last_updated INTEGER, document_id TEXT)")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def all(self):
+        """{profile_url: (last_updated, document_id)}"""
+        rows = self._db.execute("SELECT url, last_updated, document_id FROM synced")
+        return {url: (last_updated, document_id) for url, last_updated, document_id in rows}
+
+    def record(self, entries):
+        """Store (url, last_updated, document_id) tuples."""
+        self._db.executemany("INSERT OR REPLACE INTO synced VALUES (?, ?, ?)", entries)
+        self._db.commit()
+
+    def clear(self):
+        self._db.execute("DELETE FROM synced")
+        self._db.commit()
+
+    def forget(self, urls):
+        self._db.executemany("DELETE FROM synced WHERE url = ?", [(u,) for u in urls])
+        self._db.commit()
+
+
+def current_nodes(nodes):
+    """{profile_url: last_updated} for the nodes that are not deleted."""
+    return {node['profile_url']: node.get('last_updated')
+            for node in nodes if node.get('status') != 'deleted'}
+
+
+def diff_nodes(current, synced):
+    """Profile URLs that are new or changed, and those that are gone."""
+    changed = {url for url, last_updated in current.items()
+               if url not in synced or synced[url][0] != last_updated}
+    removed = set(synced) - set(current)
+    return changed, removed
+
+
+def linked_closure(seeds, knows):
+    """
+    `seeds` plus everyone who links to them, directly or transitively.
+
+    `knows` maps each profile URL to the URLs listed in its `knows`, whether
+    or not those people still exist, so that links to removed people count.
+    """
+    linked_from = defaultdict(set)
+    for source, targets in knows.items():
+        for target in targets:
+            linked_from[target].add(source)
+
+    affected = set(seeds)
+    stack = list(seeds)
+    while stack:
+        for source in linked_from.get(stack.pop(), ()):
+            if source not in affected:
+                affected.add(source)
+                stack.append(source)
+    return affected
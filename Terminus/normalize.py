@@ -0,0 +1,155 @@
+"""
+Table-driven mapping of the Organizations.csv multi-value columns onto the
+EnumTemplates in schema.py.
+
+The alias tables are built once from the enum members plus the spellings
+used in the Airtable export. A whole chunk's column is normalized at once:
+values are exploded, factorized so each distinct string is looked up a
+single time, and regrouped per row. Values that match nothing are counted
+in an UnknownValues report instead of raising.
+"""
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from schema import Blockchain, ImpactArea, Topic, Web3
+
+# Spellings from the export that differ from the enum member names.
+# None means the value carries no information and is dropped.
+SYNONYMS = {
+    'impactarea': {
+        "Social justice": ImpactArea.SocialJustice,
+        "Food & Agriculture": ImpactArea.FoodAg,
+        "Food & Ag.": ImpactArea.FoodAg,
+        "Invest": ImpactArea.Investing,
+        "Politics & activism": ImpactArea.Politicsactivism,
+        "Innovate": ImpactArea.Innovation,
+    },
+    'blockchainecosystem': {
+        "Binance Smart Chain": Blockchain.BinanceSmartChain,
+        "Regen Network": Blockchain.RegenNetwork,
+        "Energy Web Chain": Blockchain.EnergyWebChain,
+        "Hyperledger Fabric": Blockchain.HyperledgerFabric,
+        "Zero Carbon": Blockchain.ZeroCarbon,
+        "IXO": Blockchain.ixo,
+        "Not found": Blockchain.Other,
+        "Not sure / still deciding": Blockchain.Other,
+        "Not applicable": None,
+    },
+    'web3': {
+        "Blockchain (L1, L2)": Web3.Blockchain,
+        "Blockchain (L1,L2)": Web3.Blockchain,
+        # someone put "Blockchain (L1,DAO" which splits into "Blockchain (L1" and "DAO"
+        "Blockchain (L1": Web3.Blockchain,
+    },
+    'topic': {
+        "inclusion and equality": Topic.inclusionequality,
+        "Circular Economy": Topic.CircularEconomy,
+        "Financial Inclusion": Topic.Financial_Inclusion,
+        "origin & trace": Topic.Traceability,
+        "Supply Chain": Topic.SupplyChain,
+        "Move-to-earn": Topic.Movetoearn,
+        "Work & Business": Topic.Work,
+        "Food Forests": Topic.FoodForests,
+        "Eco-Living": Topic.EcoLiving,
+    },
+}
+
+# field name -> (CSV column, enum, separator regex)
+COLUMNS = {
+    'blockchainecosystem': (1, Blockchain, ','),
+    'impactarea': (4, ImpactArea, ','),
+    'topic': (13, Topic, ','),
+    # web3 values have commas inside parentheses, e.g. "Blockchain (L1, L2)"
+    'web3': (15, Web3, r',(?![^(]*\))'),
+}
+
+_UNKNOWN = object()
+
+
+def _key(value):
+    return value.strip().strip('"').casefold()
+
+
+def build_aliases(enum, synonyms):
+    aliases = {}
+    for member in enum:
+        aliases[_key(member.name)] = member
+    for value, member in synonyms.items():
+        key = _key(value)
+        if key in aliases and aliases[key] is not member:
+            raise ValueError(f"alias {value!r} is ambiguous for {enum.__name__}")
+        aliases[key] = member
+    return aliases
+
+
+ALIASES = {field: build_aliases(enum, SYNONYMS.get(field, {}))
+           for field, (_, enum, _) in COLUMNS.items()}
+
+
+class UnknownValues:
+    """Counts values that could not be mapped, per field."""
+
+    def __init__(self):
+        self.counts = defaultdict(Counter)
+
+    def add(self, field, values):
+        self.counts[field].update(values)
+
+    def update(self, other):
+        """Add the counts of another UnknownValues, e.g. from a worker process."""
+        for field, counter in other.counts.items():
+            self.counts[field].update(counter)
+
+    def __bool__(self):
+        return any(self.counts.values())
+
+    def report(self):
+        lines = []
+        for field, counter in sorted(self.counts.items()):
+            for value, count in counter.most_common():
+                lines.append(f"{field}: {value!r} x{count}")
+        return "\n".join(lines)
+
+
+def normalize_column(values, field, unknown=None):
+    """
+    Map a sequence of raw cells for `field` to a list with one entry per
+    cell: a set of enum members, or None when the cell has no known values.
+    """
+    _, _, separator = COLUMNS[field]
+    aliases = ALIASES[field]
+    result = [None] * len(values)
+
+    cells = pd.Series(list(values), dtype=object).str.strip("{}")
+    parts = cells.str.split(separator, regex=True).explode()
+    parts = parts.str.strip().str.strip('"')
+    parts = parts[parts.notna() & (parts != '')]
+    if parts.empty:
+        return result
+
+    # look every distinct value up once, then broadcast back to the rows
+    codes, uniques = pd.factorize(parts.str.casefold())
+    lookup = np.empty(len(uniques), dtype=object)
+    lookup[:] = [aliases.get(u, _UNKNOWN) for u in uniques]
+    missing = np.array([m is _UNKNOWN for m in lookup], dtype=bool)[codes]
+    dropped = np.array([m is None for m in lookup], dtype=bool)[codes]
+    mapped = lookup[codes]
+
+    if unknown is not None and missing.any():
+        unknown.add(field, parts[missing])
+
+    keep = ~(missing | dropped)
+    rows = parts.index[keep]
+    for row, member in zip(rows, mapped[keep]):
+        if result[row] is None:
+            result[row] = set()
+        result[row].add(member)
+    return result
+
+
+def normalize_chunk(rows, unknown=None):
+    """Normalize every enum column of a chunk of CSV rows."""
+    return {field: normalize_column([row[column] for row in rows], field, unknown)
+            for field, (column, _, _) in COLUMNS.items()}
@@ -0,0 +1,199 @@
+"""
+Row -> Organization transformation for Organizations.csv.
+
+The stages are chained as generators:
+
+    read_csv_rows -> chunked -> transform_chunk -> build_organization
+
+transform_chunk sanitizes and normalizes a chunk and returns plain dict
+records; Organization objects are only built right before the sink.
+With `workers` > 1 the chunks are transformed in that many processes
+(pipeline.parallel_map) and come back in file order; only raw rows and
+plain records cross the process boundary. Given a dedup.Deduplicator,
+near-duplicate rows are dropped on the way. Given a metrics.Metrics, the
+time spent parsing, sanitizing, normalizing, deduplicating and building
+objects is recorded per stage.
+
+Organizations get content-derived IDs (organization_id) instead of the
+schema's random ones, so loading the same row twice writes the same
+document; a resumed load (checkpoint.py) skips the rows it already did.
+
+A database loaded before then holds Organization documents under
+RandomKey IDs, which no row maps to, so reloading would add every
+organization a second time. Purge them once and reload:
+
+    python purge.py Organization --db play --index orgs
+    python ingest.py csv Organizations.csv --restart
+"""
+import hashlib
+from datetime import datetime
+from itertools import chain, islice
+
+import pytz
+
+from dedup import drop_duplicates, normalize_name, normalize_url
+from metrics import Metrics
+from normalize import UnknownValues, normalize_chunk
+from pipeline import chunked, parallel_map, read_csv_rows
+from sanitize import sanitize_row
+from schema import Organization
+
+DATE_FORMAT = "%m/%d/%Y %I:%M %p"
+
+# CSV column for each plain text field
+TEXT_COLUMNS = {
+    'assignee': 0,
+    'description': 3,
+    'logo': 5,
+    'reviewed': 8,
+    'submittedbyemail': 9,
+    'submittedbyname': 10,
+    'submittedbyowner': 11,
+    'subscribed': 12,
+}
+
+
+def parse_date(value):
+    if not value:
+        return None
+    parsed_date = datetime.strptime(value, DATE_FORMAT)
+    # Convert the datetime object to UTC time
+    return pytz.utc.normalize(pytz.utc.localize(parsed_date))
+
+
+def parse_count(value):
+    # blank and zero counts are stored as missing
+    if value.isdigit() and int(value) != 0:
+        return int(value)
+    return None
+
+
+def row_to_record(row, enums):
+    """Turn a sanitized CSV row plus its normalized enum sets into a dict."""
+    record = {field: row[column] or None
+              for field, column in TEXT_COLUMNS.items()}
+    record.update(enums)
+    # name is the only mandatory field, so default it to "" if blank;
+    # several names end in stray newlines or spaces
+    record['name'] = row[6].strip()
+    record['datecreated'] = parse_date(row[2])
+    record['preJan20thUpvotes'] = parse_count(row[7])
+    record['upvotes'] = parse_count(row[14])
+    return record
+
+
+def transform_chunk(rows, unknown=None, metrics=None):
+    """Sanitize and normalize a chunk of raw CSV rows into records."""
+    metrics = metrics or Metrics()
+    with metrics.stage('sanitize'):
+        rows = [sanitize_row(row) for row in rows]
+    with metrics.stage('normalize'):
+        enums = normalize_chunk(rows, unknown)
+        return [row_to_record(row, {field: values[i] for field, values in enums.items()})
+                for i, row in enumerate(rows)]
+
+
+def _transform_in_worker(rows):
+    # unknown values and stage times are collected per chunk and merged
+    # back in the parent
+    unknown = UnknownValues()
+    metrics = Metrics()
+    return transform_chunk(rows, unknown, metrics), unknown, metrics
+
+
+def organization_id(record, row=None):
+    """
+    The document ID of an organization, from its normalized name and
+    website: the same organization always gets the same ID. Without a
+    website the name alone is ambiguous, so the submitter, logo and
+    submission date of the row tell organizations of the same name apart.
+    With a `row` key (its CSV line, when duplicates are kept) every row is
+    a document of its own.
+    """
+    website = normalize_url(record.get('assignee'))
+    parts = [normalize_name(record['name']), website or '']
+    if not website:
+        created = record.get('datecreated')
+        parts += [(record.get('submittedbyemail') or '').strip().lower(),
+                  normalize_url(record.get('logo')) or '',
+                  created.isoformat() if created else '']
+    if row is not None:
+        parts.append(str(row))
+    return "Organization/" + hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def build_organization(record, row=None):
+    return Organization(**record, _id=organization_id(record, row))
+
+
+def numbered_records(path, batch_size, unknown=None, duplicates=None, workers=1, metrics=None,
+                     skip=0):
+    """
+    Yield (rows read, records) for lists of at most `batch_size` records
+    from an Organizations CSV, where `rows read` counts the data rows
+    consumed so far. With a Deduplicator, rows that duplicate an earlier
+    one are dropped (or merged into it, within a batch); they are keyed by
+    CSV line number.
+
+    The first `skip` rows are not yielded. They still go through the
+    Deduplicator, if there is one, so that the rows after them are
+    deduplicated exactly as in a run from the top.
+    """
+    metrics = metrics or Metrics()
+    rows = read_csv_rows(path)
+    if duplicates is None:
+        skipped = sum(1 for _ in islice(rows, skip))
+        chunks = chunked(rows, batch_size)
+    else:
+        # islice and the second chunked share `rows`, so the batches after
+        # the skipped rows start right where they end
+        skipped = 0
+        chunks = chain(chunked(islice(rows, skip), batch_size), chunked(rows, batch_size))
+    metrics.count('skipped', skipped)
+    line = 2 + skipped
+    chunks = metrics.timed('parse', chunks)
+    for records, chunk_unknown, chunk_metrics in parallel_map(_transform_in_worker, chunks, workers):
+        if unknown is not None:
+            unknown.update(chunk_unknown)
+        metrics.update(chunk_metrics)
+        count = len(records)
+        replayed = line - 2 < skip
+        if duplicates is not None:
+            with metrics.stage('dedup'):
+                records = drop_duplicates(duplicates, zip(range(line, line + count), records))
+        line += count
+        if replayed:
+            metrics.count('skipped', count)
+            continue
+        metrics.count('rows', count)
+        metrics.count('duplicates', count - len(records))
+        yield line - 2, records
+
+
+def read_records(path, batch_size, unknown=None, duplicates=None, workers=1, metrics=None):
+    """Yield lists of at most `batch_size` records from an Organizations CSV (see numbered_records)."""
+    for _, records in numbered_records(path, batch_size, unknown, duplicates, workers, metrics):
+        yield records
+
+
+def organization_batches(path, batch_size, unknown=None, duplicates=None, workers=1, metrics=None,
+                         skip=0):
+    """
+    Yield (rows read, list of at most `batch_size` Organization objects),
+    see numbered_records. With a Deduplicator, rows that end up with the
+    same ID are one document and the last of them wins; without one, every
+    row is its own document, keyed by its CSV line.
+    """
+    metrics = metrics or Metrics()
+    for rows, records in numbered_records(path, batch_size, unknown, duplicates, workers, metrics,
+                                          skip):
+        # without a Deduplicator nothing is dropped, so the batch is the
+        # lines right before `rows`
+        lines = [None] * len(records) if duplicates is not None else \
+            range(rows - len(records) + 2, rows + 2)
+        with metrics.stage('build'):
+            organizations = {}
+            for record, line in zip(records, lines):
+                organization = build_organization(record, line)
+                organizations[organization._id] = organization
+        yield rows, list(organizations.values())
@@ -0,0 +1,65 @@
+"""
+Small generator helpers for streaming ingestion.
+
+Each stage consumes and yields lazily so that only one batch is held in
+memory at a time, however large the input is. parallel_map runs a stage
+in worker processes while keeping that bound and the input order.
+"""
+import csv
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+
+def read_csv_rows(path, skip_header=True):
+    """Yield the rows of a CSV file one at a time."""
+    with open(path, newline='') as file:
+        csv_file = csv.reader(file)
+        if skip_header:
+            next(csv_file, None)
+        yield from csv_file
+
+
+def count_csv_rows(path, skip_header=True):
+    """Number of rows in a CSV file, e.g. as the total for a progress bar."""
+    with open(path, newline='') as file:
+        return max(sum(1 for _ in csv.reader(file)) - bool(skip_header), 0)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from `iterable`."""
+    if size < 1:
+        raise ValueError("chunk size must be at least 1")
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parallel_map(fn, iterable, workers, prefetch=2):
+    """
+    Yield fn(item) for every item of `iterable`, in order, computed in
+    `workers` processes. At most `prefetch` items per worker are submitted
+    ahead of the one being yielded, so the input is still consumed lazily
+    (Executor.map would read all of it up front). `fn` and the items must
+    be picklable; with one worker everything runs in this process.
+    """
+    if workers <= 1:
+        yield from map(fn, iterable)
+        return
+    # the loaders are flat scripts without a __main__ guard, which spawned
+    # workers would re-run on import; forked ones don't import them at all
+    context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= workers * prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,108 @@
+"""
+Deleting every document of one type, without reading the documents.
+
+The old delete_all.py downloaded the whole collection with query_document
+just to collect the @ids, then sent them back in one delete_document call.
+Here the documents never leave the server:
+
+  - by default, one WOQL query matches every document of the type and
+    deletes it, in a single commit;
+  - with `batch_size`, a WOQL query returns at most that many IDs at a
+    time, which are deleted before the next ones are asked for, so memory
+    and request sizes stay bounded however large the collection is (one
+    commit per batch).
+
+The documents' search index is emptied in the same run: per batch by ID,
+or all at once after the single query.
+
+    python purge.py person --db murmurations --index people --dry-run
+"""
+import argparse
+import os
+import sys
+
+from terminusdb_client import WOQLQuery
+
+from documents import count_documents
+from search import short_id
+from search_sink import IndexingError, wait_for
+
+BATCH_SIZE = 1000
+
+
+def _of_type(doc_type):
+    return WOQLQuery().triple("v:Doc", "rdf:type", f"@schema:{doc_type}")
+
+
+def _value(binding):
+    return binding['@value'] if isinstance(binding, dict) else binding
+
+
+def first_ids(client, doc_type, count):
+    """IDs of at most `count` documents of `doc_type`, and nothing else."""
+    result = client.query(WOQLQuery().limit(count, _of_type(doc_type).select("v:Doc")))
+    return [_value(binding['Doc']) for binding in result['bindings']]
+
+
+def _wait(index, info, timeout_in_ms):
+    status, error = wait_for(index, info, timeout_in_ms)
+    if status != 'succeeded':
+        raise IndexingError(f"deleting from {index.uid}: {status}: {error}")
+
+
+def purge(client, doc_type, index=None, batch_size=None, timeout_in_ms=600000):
+    """
+    Delete every `doc_type` document, and their search documents from the
+    Meilisearch `index` if given. Returns the number of documents deleted.
+    """
+    if batch_size is None:
+        deleted = count_documents(client, doc_type)
+        if deleted:
+            query = WOQLQuery().woql_and(_of_type(doc_type), WOQLQuery().delete_document("v:Doc"))
+            client.query(query, commit_msg=f"Deleting all {doc_type} documents")
+        if index is not None:
+            _wait(index, index.delete_all_documents(), timeout_in_ms)
+        return deleted
+
+    deleted = 0
+    while True:
+        # what was deleted is gone, so the next batch is always the first one
+        ids = first_ids(client, doc_type, batch_size)
+        if not ids:
+            return deleted
+        client.delete_document(ids, commit_msg=f"Deleting {len(ids)} {doc_type} documents")
+        if index is not None:
+            _wait(index, index.delete_documents([short_id(i) for i in ids]), timeout_in_ms)
+        deleted += len(ids)
+
+
+if __name__ == '__main__':
+    from terminusdb_client import WOQLClient
+
+    parser = argparse.ArgumentParser(description="Delete every document of a type, and its search documents")
+    parser.add_argument("type", help="document type, e.g. person or Organization")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--index", help="Meilisearch index holding the type's search documents")
+    parser.add_argument("--batch-size", type=int,
+                        help=f"delete in batches of this many IDs (e.g. {BATCH_SIZE}) instead of "
+                             "one server-side query")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+    parser.add_argument("--meilisearch", default="https://ms-9ea4a96f02a8-1969.sfo.meilisearch.io")
+    parser.add_argument("--meilisearch-key", default=os.environ.get("MEILISEARCH_KEY"),
+                        help="admin key, needed with --index (default: $MEILISEARCH_KEY)")
+    args = parser.parse_args()
+    if args.index and not args.meilisearch_key:
+        sys.exit("--index needs a Meilisearch key: pass --meilisearch-key or set MEILISEARCH_KEY")
+
+    client = WOQLClient("https://cloud.terminusdb.com/Myseelia/")
+    client.connect(db=args.db, team="Myseelia", use_token=True)
+    index = None
+    if args.index:
+        import meilisearch
+        index = meilisearch.Client(args.meilisearch, args.meilisearch_key).index(args.index)
+
+    count = count_documents(client, args.type)
+    searchable = f", {index.get_stats().number_of_documents} in {args.index}" if index else ""
+    print(f"{count} {args.type} documents in {args.db}{searchable}")
+    if not args.dry_run:
+        print(f"deleted {purge(client, args.type, index, args.batch_size)}")
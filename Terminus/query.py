@@ -1,6 +1,5 @@
 from terminusdb_client import WOQLClient
-from terminusdb_client.woqlschema import WOQLSchema
-from terminusdb_client.woqldataframe import result_to_df
+from documents import iter_frames
 
 # For Terminus X, use the following
 # client = WOQLClient("https://cloud.terminusdb.com/<Your Team>/")
@@ -9,13 +8,8 @@ from terminusdb_client.woqldataframe import result_to_df
 client = WOQLClient("https://cloud.terminusdb.com/Myseelia/")
 client.connect(db="playground", team="Myseelia", use_token=True)
 
-team_it_raw = client.query_document({"@type": "Organization"})
-
-team_it = result_to_df(team_it_raw)
-
-
-print(team_it)
+# Read the organizations a page at a time instead of all at once
+for team_it in iter_frames(client, "Organization"):
+    print(team_it)
 
 # write a graphQL query to get all the organizations that have a web3 field value of "Token"
-
-
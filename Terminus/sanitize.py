@@ -0,0 +1,65 @@
+"""
+Text sanitization shared by the ingestion scripts.
+
+The emoji matcher is built once at import time from the code points in
+emoji.EMOJI_DATA, collapsed into character-class ranges, instead of an
+alternation over every emoji sequence. Cleaned values are memoized since
+CSV columns repeat the same strings over and over.
+"""
+import re
+from functools import lru_cache
+
+import emoji
+
+# Code points that only ever appear inside an emoji sequence (variation
+# selector, zero width joiner, keycap, tag characters). They are stripped
+# when they follow an emoji but left alone elsewhere in the text.
+EMOJI_COMPONENTS = u'\ufe0f\u20e3\u200d\U000E0020-\U000E007F'
+
+# Regional indicators only show up in pairs (flags) in EMOJI_DATA
+REGIONAL_INDICATORS = range(0x1F1E6, 0x1F200)
+
+
+def _ranges(code_points):
+    # Collapse sorted code points into (start, end) runs
+    runs = []
+    for cp in sorted(code_points):
+        if runs and cp == runs[-1][1] + 1:
+            runs[-1][1] = cp
+        else:
+            runs.append([cp, cp])
+    return runs
+
+
+def _char_class(code_points):
+    parts = []
+    for start, end in _ranges(code_points):
+        if start == end:
+            parts.append(re.escape(chr(start)))
+        else:
+            parts.append(re.escape(chr(start)) + '-' + re.escape(chr(end)))
+    return '[' + ''.join(parts) + ']'
+
+
+def build_emoji_regexp():
+    bases = {ord(e) for e in emoji.EMOJI_DATA if len(e) == 1}
+    bases.update(REGIONAL_INDICATORS)
+    # Keycaps (#️⃣, 1️⃣, ...) are the only sequences starting with ASCII
+    keycap = u'[0-9#*]\ufe0f?\u20e3'
+    sequence = u'(?:%s[%s]*)+' % (_char_class(bases), EMOJI_COMPONENTS)
+    return re.compile(keycap + '|' + sequence)
+
+
+EMOJI_REGEXP = build_emoji_regexp()
+
+
+@lru_cache(maxsize=65536)
+def remove_emojis(string):
+    # Plain ASCII can never contain an emoji, skip the regex entirely
+    if string.isascii():
+        return string
+    return EMOJI_REGEXP.sub(u'', string)
+
+
+def sanitize_row(row):
+    return [remove_emojis(cell) for cell in row]
@@ -0,0 +1,98 @@
+"""
+Building Meilisearch documents from the objects we insert into TerminusDB.
+
+The documents are built locally from the DocumentTemplate objects that were
+just inserted, using the IDs returned by insert_document, so no per-document
+read-back from TerminusDB is needed.
+
+Field values keep their native types (lists, integers, dates as Unix
+timestamps) so that Meilisearch can filter, facet and sort on them, and
+INDEX_SETTINGS declares which attributes it should do that for.
+"""
+from datetime import datetime
+from enum import Enum
+
+from terminusdb_client.woqlschema import DocumentTemplate
+
+
+# Meilisearch settings per index, pushed by configure_index
+INDEX_SETTINGS = {
+    'orgs': {
+        'searchableAttributes': ['name', 'description', 'assignee', 'topic',
+                                 'impactarea', 'web3', 'blockchainecosystem'],
+        'filterableAttributes': ['topic', 'impactarea', 'web3', 'blockchainecosystem', 'community'],
+        'sortableAttributes': ['upvotes', 'preJan20thUpvotes', 'datecreated', 'degree',
+                               'component_size'],
+    },
+    'people': {
+        'searchableAttributes': ['name', 'description', 'locality'],
+        'filterableAttributes': ['locality', 'LI', 'vouches_for', 'community'],
+        'sortableAttributes': ['name', 'degree', 'component_size', 'pagerank'],
+    },
+}
+
+# fields indexed as Unix timestamps and as integers
+DATE_FIELDS = {'datecreated'}
+INTEGER_FIELDS = {'upvotes', 'preJan20thUpvotes'}
+
+
+def short_id(document_id):
+    # "terminusdb:///data/Organization/85405b..." -> "85405b..."
+    return document_id.split("/")[-1]
+
+
+def local_id(document_id):
+    # "terminusdb:///data/person/85405b..." -> "person/85405b..."
+    return document_id.split("/data/", 1)[-1]
+
+
+def to_plain(value):
+    """Convert a DocumentTemplate field value to what get_document returns."""
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, datetime):
+        if value.utcoffset() is not None and not value.utcoffset():
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, DocumentTemplate):
+        return getattr(value, '_backend_id', None) or getattr(value, '_id', None)
+    if isinstance(value, (set, list, tuple)):
+        return sorted(to_plain(v) for v in value)
+    return value
+
+
+def template_to_document(obj):
+    """The JSON document TerminusDB stores for `obj`, without the @id."""
+    document = {'@type': type(obj).__name__}
+    for field in obj._annotations:
+        value = getattr(obj, field, None)
+        if value is None or value == set():
+            continue
+        document[field] = to_plain(value)
+    return document
+
+
+def search_value(field, value):
+    """The value Meilisearch should index for a stored document field."""
+    if field in DATE_FIELDS and isinstance(value, str):
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    if field in INTEGER_FIELDS and isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def to_search_document(document_id, document):
+    search_document = {k: search_value(k, v) for k, v in document.items() if k != '@id'}
+    search_document['id'] = short_id(document_id)
+    return search_document
+
+
+def configure_index(index, name):
+    """Push the filterable/sortable/searchable attributes for `name`."""
+    return index.update_settings(INDEX_SETTINGS[name])
+
+
+def search_documents(inserted_ids, objects):
+    """Search documents for `objects`, in the order insert_document returned."""
+    return [to_search_document(document_id, template_to_document(obj))
+            for document_id, obj in zip(inserted_ids, objects)]
@@ -0,0 +1,240 @@
+"""
+Bulk indexing into Meilisearch with bounded batches and in-flight tasks.
+
+SearchSink buffers documents and sends them as NDJSON batches capped both
+in bytes and in document count, so a payload never exceeds the engine's
+request size limit. At most `max_in_flight` indexing tasks are left
+enqueued at a time: before sending more, the sink waits for the oldest one,
+polling with exponential backoff. Every batch ends up in `results` with its
+size, duration and final status, so failures are reported instead of
+being silently dropped.
+
+    sink = SearchSink(index)
+    for documents in batches:
+        sink.add(documents)
+    sink.close()
+    print(sink.report())
+
+With `partial=True` the batches update existing documents field by field
+instead of replacing them, for adding computed fields such as the graph
+measures of analytics.py. Deletions by ID go through the same queue
+(delete), after the documents added before them, and are reported the
+same way.
+
+rebuild_index fills a shadow index and swaps it in for the live one, so a
+full reindex never leaves readers looking at an empty or partial index.
+"""
+import json
+import time
+from collections import deque, namedtuple
+
+# `documents` counts documents added, `deleted` IDs deleted
+BatchResult = namedtuple('BatchResult', 'task_uid documents bytes seconds status error deleted',
+                         defaults=(0,))
+
+# Meilisearch's default payload limit is 100MB, stay well below it
+MAX_BYTES = 10 * 1024 * 1024
+MAX_DOCUMENTS = 10000
+
+FINISHED = ('succeeded', 'failed', 'canceled')
+
+
+class IndexingError(Exception):
+    pass
+
+
+def _get(obj, attribute, key):
+    # meilisearch-python returns models in recent versions and dicts in older ones
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, attribute, None)
+
+
+class SearchSink:
+
+    def __init__(self, index, max_bytes=MAX_BYTES, max_documents=MAX_DOCUMENTS,
+                 max_in_flight=4, poll_interval=0.05, max_poll_interval=2.0,
+                 timeout=600, primary_key='id', partial=False):
+        self.index = index
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self.primary_key = primary_key
+        self.partial = partial
+        self.results = []
+        self._lines = []
+        self._size = 0
+        self._in_flight = deque()
+        self._started = time.perf_counter()
+
+    def add(self, documents):
+        for document in documents:
+            line = json.dumps(document, ensure_ascii=False).encode('utf-8') + b'\n'
+            if len(line) > self.max_bytes:
+                raise IndexingError(
+                    f"document {document.get(self.primary_key)!r} is larger than {self.max_bytes} bytes")
+            if self._lines and (self._size + len(line) > self.max_bytes
+                                or len(self._lines) >= self.max_documents):
+                self.flush()
+            self._lines.append(line)
+            self._size += len(line)
+
+    def flush(self):
+        """Send the buffered documents as one batch."""
+        if not self._lines:
+            return
+        self._make_room()
+        payload = b''.join(self._lines)
+        send = self.index.update_documents_ndjson if self.partial else self.index.add_documents_ndjson
+        info = send(payload, primary_key=self.primary_key)
+        uid = _get(info, 'task_uid', 'taskUid')
+        self._in_flight.append((uid, len(self._lines), len(payload), time.perf_counter(), 0))
+        self._lines = []
+        self._size = 0
+
+    def delete(self, ids):
+        """Delete documents by ID, after everything added so far."""
+        ids = list(ids)
+        if not ids:
+            return
+        self.flush()
+        self._make_room()
+        info = self.index.delete_documents(ids)
+        uid = _get(info, 'task_uid', 'taskUid')
+        self._in_flight.append((uid, 0, 0, time.perf_counter(), len(ids)))
+
+    def _make_room(self):
+        # backpressure: don't pile up more enqueued tasks than allowed
+        while len(self._in_flight) >= self.max_in_flight:
+            self._wait(*self._in_flight.popleft())
+
+    def close(self):
+        """Flush what is left and wait for every task to finish."""
+        self.flush()
+        while self._in_flight:
+            self._wait(*self._in_flight.popleft())
+
+    def collect(self):
+        """Record the oldest in-flight tasks that have already finished, without waiting."""
+        while self._in_flight:
+            uid, documents, size, sent, deleted = self._in_flight[0]
+            task = self.index.get_task(uid)
+            status = _get(task, 'status', 'status')
+            if status not in FINISHED:
+                return
+            self._in_flight.popleft()
+            self._record(uid, documents, size, sent, deleted, status, _get(task, 'error', 'error'))
+
+    def _wait(self, uid, documents, size, sent, deleted):
+        interval = self.poll_interval
+        deadline = sent + self.timeout
+        while True:
+            task = self.index.get_task(uid)
+            status = _get(task, 'status', 'status')
+            if status in FINISHED:
+                break
+            if time.perf_counter() > deadline:
+                status = 'timeout'
+                break
+            time.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+        self._record(uid, documents, size, sent, deleted, status, _get(task, 'error', 'error'))
+
+    def _record(self, uid, documents, size, sent, deleted, status, error):
+        self.results.append(BatchResult(uid, documents, size, time.perf_counter() - sent,
+                                        status, error, deleted))
+
+    @property
+    def failures(self):
+        return [r for r in self.results if r.status != 'succeeded']
+
+    @property
+    def confirmed(self):
+        """Documents indexed, in the order they were added, up to the first failed batch."""
+        count = 0
+        for r in self.results:
+            if r.status != 'succeeded':
+                break
+            count += r.documents
+        return count
+
+    @property
+    def documents(self):
+        return sum(r.documents for r in self.results if r.status == 'succeeded')
+
+    @property
+    def deleted(self):
+        return sum(r.deleted for r in self.results if r.status == 'succeeded')
+
+    def report(self):
+        elapsed = time.perf_counter() - self._started
+        lines = [f"indexed {self.documents} documents in {len(self.results)} batches, "
+                 f"{self.documents / elapsed if elapsed else 0:.0f} docs/s"
+                 + (f", deleted {self.deleted}" if self.deleted else "")]
+        for r in self.results:
+            if r.deleted:
+                lines.append(f"  task {r.task_uid}: {r.status}, {r.deleted} deleted, {r.seconds:.2f}s"
+                             + (f", {r.error}" if r.error else ""))
+                continue
+            rate = r.documents / r.seconds if r.seconds else 0
+            lines.append(f"  task {r.task_uid}: {r.status}, {r.documents} docs, "
+                         f"{r.bytes / 1024:.0f} KiB, {r.seconds:.2f}s, {rate:.0f} docs/s"
+                         + (f", {r.error}" if r.error else ""))
+        return "\n".join(lines)
+
+
+def wait_for(client, info, timeout_in_ms=600000):
+    """Wait for the task behind `info` and return its final status and error."""
+    task = client.wait_for_task(_get(info, 'task_uid', 'taskUid'), timeout_in_ms=timeout_in_ms)
+    return _get(task, 'status', 'status'), _get(task, 'error', 'error')
+
+
+def _check(client, info, allowed=()):
+    status, error = wait_for(client, info)
+    if status != 'succeeded' and (error or {}).get('code') not in allowed:
+        raise IndexingError(f"task {_get(info, 'task_uid', 'taskUid')} {status}: {error}")
+
+
+def rebuild_index(client, name, documents, expected, configure=None,
+                  primary_key='id', **sink_options):
+    """
+    Build `name` from scratch without taking it offline.
+
+    `documents` go into the shadow index `<name>_tmp`. Once every task has
+    finished and the shadow holds `expected` documents (a number, or a
+    callable returning it once indexing is done), the two indexes are
+    swapped atomically and the old one is deleted. On any failure the live
+    index is left untouched and the shadow is kept for inspection.
+    `configure(index)` pushes the index settings before documents arrive.
+    """
+    shadow_name = f"{name}_tmp"
+    # a shadow left over from an aborted run
+    _check(client, client.delete_index(shadow_name), allowed=('index_not_found',))
+    _check(client, client.create_index(shadow_name, {'primaryKey': primary_key}))
+    shadow = client.index(shadow_name)
+    if configure is not None:
+        _check(client, configure(shadow))
+
+    sink = SearchSink(shadow, primary_key=primary_key, **sink_options)
+    sink.add(documents)
+    sink.close()
+    if sink.failures:
+        raise IndexingError(f"{len(sink.failures)} batches failed, {name} left unchanged\n"
+                            + sink.report())
+
+    if callable(expected):
+        expected = expected()
+    indexed = _get(shadow.get_stats(), 'number_of_documents', 'numberOfDocuments')
+    if indexed != expected:
+        raise IndexingError(f"{shadow_name} has {indexed} documents, expected {expected}; "
+                            f"{name} left unchanged")
+
+    # swapping needs both indexes to exist, which the first run may not
+    _check(client, client.create_index(name, {'primaryKey': primary_key}),
+           allowed=('index_already_exists',))
+    _check(client, client.swap_indexes([{'indexes': [name, shadow_name]}]))
+    _check(client, client.delete_index(shadow_name))
+    return sink
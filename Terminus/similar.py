@@ -0,0 +1,276 @@
+"""
+"Organizations like this one", precomputed.
+
+Every organization becomes a sparse vector: one column per attribute value
+(topic, impact area, web3, blockchain ecosystem), weighted by inverse
+document frequency so that sharing a rare value counts for more than
+sharing "Other", optionally next to a TF-IDF vector of the words of its
+description. Rows are L2-normalized, so dot products are cosine
+similarities.
+
+The k most similar organizations of each one are computed offline:
+
+  - exactly, with a sparse matrix product per batch of rows and a
+    vectorized partial sort of each row's scores;
+  - for large collections, from MinHash-LSH candidates (documents whose
+    signatures agree on a whole band), scored exactly.
+
+The result is a SimilarIndex of two (organizations x k) arrays saved as
+.npz, so a lookup by ID is a dict access and a slice.
+
+    python similar.py build similar_orgs.npz --description
+    python similar.py query similar_orgs.npz 85405b...
+"""
+import argparse
+import re
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from search import short_id
+
+# document field -> prefix of its values' columns
+FIELDS = {'topic': 'topic', 'impactarea': 'impact', 'web3': 'web3',
+          'blockchainecosystem': 'chain'}
+K = 10
+# weight of the description words next to the attribute values
+DESCRIPTION_WEIGHT = 0.5
+# exact products up to this many documents, LSH beyond
+EXACT_LIMIT = 20000
+# entries of the (batch x documents) similarity block computed at once
+BATCH_CELLS = 1 << 22
+PERMUTATIONS = 64
+BANDS = 32
+# buckets larger than this are values nearly everyone has, not candidates
+MAX_BUCKET = 64
+
+WORD = re.compile(r"[a-z0-9][a-z0-9'-]{2,}")
+STOPWORDS = frozenset("""
+    and are but for from has have into its not our that the their them they this
+    through was were which while who will with you your all can more such also
+""".split())
+
+
+def _values(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [getattr(v, 'name', v) for v in value]
+    return [getattr(value, 'name', value)]
+
+
+def _tf_idf(rows, columns, counts, documents):
+    """CSR matrix of sublinear TF-IDF weights, rows L2-normalized."""
+    rows, columns = np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)
+    counts = np.asarray(counts, dtype=float)
+    width = int(columns.max()) + 1 if len(columns) else 0
+    frequency = np.bincount(columns, minlength=width)
+    idf = np.log((1 + documents) / (1 + frequency)) + 1
+    matrix = sparse.csr_matrix(((1 + np.log(counts)) * idf[columns], (rows, columns)),
+                               shape=(documents, width))
+    return _normalize(matrix)
+
+
+def _normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ matrix
+
+
+def vectorize(records, fields=FIELDS, description=False):
+    """Normalized sparse vectors (records x terms) of organization records."""
+    vocabulary = {}
+    rows, columns = [], []
+    for i, record in enumerate(records):
+        for field, prefix in fields.items():
+            for value in dict.fromkeys(_values(record.get(field))):
+                rows.append(i)
+                columns.append(vocabulary.setdefault(f"{prefix}:{value}", len(vocabulary)))
+    blocks = [_tf_idf(rows, columns, np.ones(len(rows)), len(records))]
+    if description:
+        words = {}
+        rows, columns, counts = [], [], []
+        for i, record in enumerate(records):
+            text = (record.get('description') or '').lower()
+            for word, count in Counter(w for w in WORD.findall(text) if w not in STOPWORDS).items():
+                rows.append(i)
+                columns.append(words.setdefault(word, len(words)))
+                counts.append(count)
+        blocks.append(DESCRIPTION_WEIGHT * _tf_idf(rows, columns, counts, len(records)))
+    return _normalize(sparse.hstack(blocks, format='csr'))
+
+
+def _top_k(rows, columns, scores, count, k):
+    """Per row, the k best (column, score) pairs, padded with -1 / 0."""
+    keep = (scores > 0) & (rows != columns)
+    rows, columns, scores = rows[keep], columns[keep], scores[keep]
+    # by row, then by falling score: one int64 sort instead of a lexsort
+    quantized = np.round((1 - np.minimum(scores, 1)) * 0xFFFFFFFF).astype(np.int64)
+    order = np.argsort(rows * (1 << 32) + quantized)
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    starts = np.searchsorted(rows, rows, side='left')
+    rank = np.arange(len(rows)) - starts
+    keep = rank < k
+    neighbours = np.full((count, k), -1, dtype=np.int32)
+    similarity = np.zeros((count, k), dtype=np.float32)
+    neighbours[rows[keep], rank[keep]] = columns[keep]
+    similarity[rows[keep], rank[keep]] = scores[keep]
+    return neighbours, similarity
+
+
+def exact_neighbours(vectors, k=K):
+    """Top-k cosine neighbours from batched sparse products."""
+    count = vectors.shape[0]
+    neighbours = np.full((count, k), -1, dtype=np.int32)
+    similarity = np.zeros((count, k), dtype=np.float32)
+    take = min(k, count - 1)
+    if take < 1:
+        return neighbours, similarity
+    transposed = vectors.T.tocsr()
+    batch = max(1, BATCH_CELLS // count)
+    for start in range(0, count, batch):
+        stop = min(start + batch, count)
+        block = (vectors[start:stop] @ transposed).toarray()
+        rows = np.arange(stop - start)[:, None]
+        block[rows[:, 0], rows[:, 0] + start] = 0
+        best = np.argpartition(-block, take - 1, axis=1)[:, :take]
+        scores = block[rows, best]
+        order = np.argsort(-scores, axis=1, kind='stable')
+        best, scores = best[rows, order], scores[rows, order]
+        neighbours[start:stop, :take] = np.where(scores > 0, best, -1)
+        similarity[start:stop, :take] = np.maximum(scores, 0)
+    return neighbours, similarity
+
+
+def minhash(vectors, permutations=PERMUTATIONS, seed=0):
+    """MinHash signatures (records x permutations) of the rows' term sets."""
+    rng = np.random.default_rng(seed)
+    prime = (1 << 31) - 1
+    a = rng.integers(1, prime, permutations)
+    b = rng.integers(0, prime, permutations)
+    indptr, terms = vectors.indptr, vectors.indices.astype(np.int64)
+    filled = np.diff(indptr) > 0
+    signatures = np.full((vectors.shape[0], permutations), prime, dtype=np.int64)
+    for p in range(permutations):
+        hashed = (a[p] * terms + b[p]) % prime
+        if filled.any():
+            signatures[filled, p] = np.minimum.reduceat(hashed, indptr[:-1][filled])
+    return signatures
+
+
+def lsh_neighbours(vectors, k=K, bands=BANDS, permutations=PERMUTATIONS, seed=0):
+    """Top-k neighbours among the MinHash-LSH candidates, scored exactly."""
+    count = vectors.shape[0]
+    signatures = minhash(vectors, permutations, seed)
+    width = permutations // bands
+    filled = np.nonzero(np.diff(vectors.indptr) > 0)[0]
+    pairs = []
+    for band in range(bands):
+        # one key per band; wrapping int64 arithmetic is fine for hashing
+        key = np.zeros(len(filled), dtype=np.int64)
+        for column in range(band * width, (band + 1) * width):
+            key = key * np.int64(1000003) + signatures[filled, column]
+        _, bucket = np.unique(key, return_inverse=True)
+        bucket = bucket.ravel()
+        sizes = np.bincount(bucket)
+        usable = (sizes[bucket] > 1) & (sizes[bucket] <= MAX_BUCKET)
+        members, bucket = filled[usable], bucket[usable]
+        order = np.argsort(bucket, kind='stable')
+        members, bucket = members[order], bucket[order]
+        # every pair within a bucket is (j, j + d) in bucket order
+        for d in range(1, min(int(sizes.max()), MAX_BUCKET)):
+            same = bucket[d:] == bucket[:-d]
+            if not same.any():
+                break
+            pairs.append(np.stack([members[:-d][same], members[d:][same]]))
+    if not pairs:
+        return _top_k(*(np.zeros(0, dtype=np.int64),) * 3, count, k)
+    pairs = np.sort(np.hstack(pairs).T @ np.array([count, 1]))
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]
+    first, second = pairs // count, pairs % count
+    scores = np.asarray(vectors[first].multiply(vectors[second]).sum(axis=1)).ravel()
+    return _top_k(np.concatenate([first, second]), np.concatenate([second, first]),
+                  np.concatenate([scores, scores]), count, k)
+
+
+class SimilarIndex:
+    """The precomputed neighbours of every organization, by ID."""
+
+    def __init__(self, ids, names, neighbours, similarity):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.neighbours = neighbours
+        self.similarity = similarity
+        self.rows = {document_id: i for i, document_id in enumerate(self.ids)}
+        # search hits carry the short ID ("85405b..."), TerminusDB the full one
+        self.rows.update({short_id(document_id): i for i, document_id in enumerate(self.ids)})
+
+    def similar(self, document_id, k=None):
+        """[(id, name, similarity)] of the organizations most like `document_id`."""
+        row = self.rows.get(document_id)
+        if row is None:
+            raise KeyError(document_id)
+        neighbours = self.neighbours[row, :k].tolist()
+        scores = self.similarity[row, :k].tolist()
+        return [(self.ids[j], self.names[j], score)
+                for j, score in zip(neighbours, scores) if j >= 0]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, ids=np.array(self.ids, dtype=str), names=np.array(self.names, dtype=str),
+                     neighbours=self.neighbours, similarity=self.similarity)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['ids'].tolist(), data['names'].tolist(),
+                       data['neighbours'], data['similarity'])
+
+
+def build_index(records, k=K, description=False, method=None):
+    """
+    SimilarIndex of organization records (dicts with '@id', 'name' and the
+    FIELDS). `method` is 'exact' or 'lsh', by default chosen by size.
+    """
+    records = list(records)
+    vectors = vectorize(records, description=description)
+    if method is None:
+        method = 'exact' if len(records) <= EXACT_LIMIT else 'lsh'
+    find = exact_neighbours if method == 'exact' else lsh_neighbours
+    neighbours, similarity = find(vectors, k)
+    return SimilarIndex([r['@id'] for r in records], [r.get('name') or '' for r in records],
+                        neighbours, similarity)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or query the similar-organization index")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="build the index from the Organizations in TerminusDB")
+    build.add_argument("output", help="index file, e.g. similar_orgs.npz")
+    build.add_argument("--db", default="play")
+    build.add_argument("-k", type=int, default=K, help="neighbours kept per organization")
+    build.add_argument("--description", action="store_true",
+                       help="also compare the words of the descriptions")
+    build.add_argument("--method", choices=["exact", "lsh"])
+    query = commands.add_parser('query', help="look up the organizations most like one")
+    query.add_argument("index")
+    query.add_argument("id", help="organization ID, full or short")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        import time
+        from terminusdb_client import WOQLClient
+        from documents import iter_documents
+
+        client = WOQLClient("https://cloud.terminusdb.com/Myseelia/")
+        client.connect(db=args.db, team="Myseelia", use_token=True)
+        records = iter_documents(client, "Organization",
+                                 fields=['name', 'description', *FIELDS])
+        start = time.perf_counter()
+        index = build_index(records, args.k, args.description, args.method)
+        index.save(args.output)
+        print(f"{len(index.ids)} organizations, top {args.k} in {time.perf_counter() - start:.1f}s")
+    else:
+        index = SimilarIndex.load(args.index)
+        for document_id, name, score in index.similar(args.id):
+            print(f"{score:.3f}  {name}  {document_id}")
@@ -0,0 +1,244 @@
+"""
+Search-result subgraphs served from a precomputed adjacency index.
+
+The views used to build the graph for a search in the browser, scanning
+everything built so far for every node and edge. Here the exported graph
+is loaded once into dicts keyed by entity ID, and the subgraph for a set of
+search hits (the hits, their relations and the entities those point at) is
+put together with hash lookups. Responses are serialized once and kept in
+an LRU cache keyed by the hit IDs or the query. A graph file rewritten by
+json_graph.py is picked up on the next request.
+
+    python subgraph.py --graph orgs=../src/components/explore/knowledge_graph.bin \\
+                       --graph people=../src/components/CTA/knowledge_graph.bin
+
+    GET  /subgraph/orgs?q=regen            search the 'orgs' index, then build
+    GET  /subgraph/orgs?ids=85405b,9f1c2e  hits the client already has
+    POST /subgraph/orgs  {"ids": [...]}
+
+With `--similar orgs=similar_orgs.npz` (built by similar.py) it also
+answers "organizations like this one":
+
+    GET  /similar/orgs?id=85405b&k=5
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from urllib.parse import parse_qs, urlsplit
+
+from graph_format import load_graph
+from search import short_id
+from similar import SimilarIndex
+
+SEARCH_LIMIT = 1000
+
+
+class SubgraphIndex:
+    """Entities by ID and outgoing relations by source, deduplicated."""
+
+    def __init__(self, graph):
+        self.entities = {entity['id']: entity for entity in graph['entities']}
+        self.adjacency = defaultdict(list)
+        seen = set()
+        for relation in graph['relations']:
+            key = (relation['source'], relation['target'], relation['type'])
+            if key not in seen:
+                seen.add(key)
+                self.adjacency[relation['source']].append(relation)
+        # search hits carry the short ID ("85405b..."), the graph the full one
+        self.short_ids = {short_id(entity_id): entity_id
+                          for entity_id, entity in self.entities.items()
+                          if entity['type'] != 'attribute'}
+
+    @classmethod
+    def load(cls, path):
+        return cls(load_graph(path))
+
+    def resolve(self, document_id):
+        if document_id in self.entities:
+            return document_id
+        return self.short_ids.get(document_id)
+
+    def subgraph(self, ids):
+        """The graph around the documents `ids`, in the order given."""
+        sources = dict.fromkeys(filter(None, map(self.resolve, ids)))
+        entities, relations = {}, []
+        for source in sources:
+            entities[source] = self.entities[source]
+            for relation in self.adjacency.get(source, ()):
+                relations.append(relation)
+                target = relation['target']
+                if target not in entities:
+                    entities[target] = self.entities.get(
+                        target, {'id': target, 'label': target, 'type': 'attribute'})
+        return {'entities': list(entities.values()), 'relations': relations}
+
+
+def meilisearch_search(client, limit=SEARCH_LIMIT):
+    """A search function returning the hit IDs of `query` in index `name`."""
+    def search(name, query):
+        result = client.index(name).search(query, {'limit': limit, 'attributesToRetrieve': ['id']})
+        return [hit['id'] for hit in result['hits']]
+    return search
+
+
+class SubgraphService:
+    """
+    Named graphs, reloaded when their file changes, with rendered
+    responses cached per (graph version, ids or query).
+    """
+
+    def __init__(self, paths, search=None, cache_size=1024, similar_paths=None):
+        self.paths = paths
+        self.search = search
+        self.similar_paths = similar_paths or {}
+        self._indexes = {}
+        self._lock = Lock()
+        self.render = lru_cache(maxsize=cache_size)(self._render)
+
+    def _load(self, key, path, load):
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            loaded = self._indexes.get(key)
+            if loaded is None or loaded[0] != mtime:
+                loaded = self._indexes[key] = (mtime, load(path))
+        return loaded
+
+    def index(self, name):
+        return self._load(name, self.paths[name], SubgraphIndex.load)
+
+    def similar(self, name, document_id, k=None):
+        """Serialized organizations most like `document_id` in `name`."""
+        _, index = self._load(('similar', name), self.similar_paths[name], SimilarIndex.load)
+        try:
+            found = index.similar(document_id, k)
+        except KeyError:
+            raise ValueError(f"unknown document {document_id!r}")
+        return json.dumps([{'id': i, 'name': n, 'score': round(s, 4)}
+                           for i, n, s in found]).encode('utf-8')
+
+    def _render(self, name, version, ids=None, query=None):
+        _, index = self._indexes[name]
+        if query is not None:
+            ids = self.search(name, query)
+        return json.dumps(index.subgraph(ids)).encode('utf-8')
+
+    def subgraph(self, name, ids=None, query=None):
+        """Serialized subgraph of `name` for hit `ids` or a search `query`."""
+        if query is not None and self.search is None:
+            raise ValueError("no search backend configured, pass ids")
+        version, _ = self.index(name)
+        if query is not None:
+            return self.render(name, version, query=query)
+        return self.render(name, version, ids=tuple(str(i) for i in ids))
+
+
+def make_handler(service):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _error(self, status, message):
+            self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+        def _respond(self, name, ids=None, query=None):
+            if name not in service.paths:
+                return self._error(404, f"unknown graph {name!r}")
+            if ids is None and query is None:
+                return self._error(400, "pass ids or q")
+            try:
+                self._send(200, service.subgraph(name, ids=ids, query=query))
+            except (OSError, ValueError) as e:
+                self._error(400 if isinstance(e, ValueError) else 503, str(e))
+
+        def _graph_name(self, path, route='subgraph'):
+            parts = [p for p in path.split('/') if p]
+            return parts[1] if len(parts) == 2 and parts[0] == route else None
+
+        def _similar(self, name, params):
+            if name not in service.similar_paths:
+                return self._error(404, f"no similarity index for {name!r}")
+            if 'id' not in params:
+                return self._error(400, "pass id")
+            try:
+                k = int(params['k'][0]) if 'k' in params else None
+                self._send(200, service.similar(name, params['id'][0], k))
+            except (OSError, ValueError) as e:
+                self._error(400 if isinstance(e, ValueError) else 503, str(e))
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.end_headers()
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            similar = self._graph_name(url.path, 'similar')
+            if similar is not None:
+                return self._similar(similar, params)
+            ids = params['ids'][0].split(',') if 'ids' in params else None
+            query = params['q'][0] if 'q' in params else None
+            self._respond(self._graph_name(url.path), ids=ids, query=query)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                ids = json.loads(self.rfile.read(length))['ids']
+            except (ValueError, KeyError, TypeError):
+                return self._error(400, 'expected {"ids": [...]}')
+            self._respond(self._graph_name(urlsplit(self.path).path), ids=ids)
+
+    return Handler
+
+
+def serve(service, host='127.0.0.1', port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve search-result subgraphs of the knowledge graphs")
+    parser.add_argument("--graph", action="append", required=True, metavar="NAME=PATH",
+                        help="a knowledge graph (.bin or .json) served as /subgraph/NAME; NAME is also "
+                             "the Meilisearch index searched for ?q=")
+    parser.add_argument("--similar", action="append", default=[], metavar="NAME=PATH",
+                        help="a similar.py index served as /similar/NAME")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--meilisearch", default="https://ms-9ea4a96f02a8-1969.sfo.meilisearch.io")
+    parser.add_argument("--meilisearch-key", default=os.environ.get("MEILISEARCH_KEY"),
+                        help="search key; without one only ids lookups are served")
+    args = parser.parse_args()
+
+    paths = dict(graph.split('=', 1) for graph in args.graph)
+    search = None
+    if args.meilisearch_key:
+        import meilisearch
+        search = meilisearch_search(meilisearch.Client(args.meilisearch, args.meilisearch_key))
+    similar_paths = dict(similar.split('=', 1) for similar in args.similar)
+    service = SubgraphService(paths, search, args.cache_size, similar_paths)
+    for name in paths:
+        service.index(name)
+
+    server = serve(service, args.host, args.port)
+    print(f"serving {', '.join(sorted(paths))} on http://{args.host}:{args.port}")
+    server.serve_forever()
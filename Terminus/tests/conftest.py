@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the modules are flat scripts, imported the way the scripts import them
+here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [here, os.path.join(here, 'murmuration'), os.path.join(here, 'benchmarks')]
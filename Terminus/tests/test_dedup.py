@@ -0,0 +1,82 @@
+from urllib.parse import urlsplit
+
+import pytest
+
+from dedup import normalize_url
+from organizations import organization_id
+from people import build_people
+
+
+def urlsplit_key(url):
+    # normalize_url as it was written with urlsplit, before the regex fast path
+    url = url.strip()
+    parts = urlsplit(url if '://' in url else '//' + url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    key = host + parts.path.rstrip('/')
+    if parts.query:
+        key += '?' + parts.query
+    return key
+
+
+@pytest.mark.parametrize('url', [
+    'https://Example.org/a/',
+    'example.org/a',
+    'http://www.example.org/a?b=c#d',
+    'HTTP://example.org:8080',
+    '//example.org/a',
+    # text before the scheme, which the regex doesn't accept
+    'Website: https://x.org',
+    'a b://c',
+    'mailto:alice@example.org',
+    # urlsplit drops tabs and newlines anywhere
+    'http://a.org\t/x',
+    'http://a.\norg/x\r',
+    'a.org/x\t',
+])
+def test_normalize_url_matches_urlsplit(url):
+    assert normalize_url(url) == urlsplit_key(url)
+
+
+def test_normalize_url_examples():
+    assert normalize_url('https://Example.org/a/') == normalize_url('example.org/a') == 'example.org/a'
+    assert normalize_url('http://a.org\t/x') == 'a.org/x'
+    assert normalize_url('') is None
+
+
+def test_normalize_url_never_raises():
+    # urlsplit raises on an unclosed IPv6 bracket
+    assert normalize_url('http://[abc/x') == '[abc/x'
+
+
+def test_malformed_urls_dont_stop_a_sync():
+    profiles = {
+        'https://p/alice': {'name': 'Alice', 'primary_url': 'Website: https://alice.org',
+                            'knows': [{'type': 'VOUCHES_FOR', 'url': 'a b://c'}]},
+        'https://p/bob': {'name': 'Bob', 'primary_url': 'http://[bob',
+                          'knows': [{'type': 'VOUCHES_FOR', 'url': 'https://p/alice'}]},
+    }
+    people, edges, dangling, merged = build_people(profiles)
+    assert set(people) == set(profiles)
+    assert edges['https://p/bob']['vouches_for'] == {'https://p/alice'}
+    assert dangling == [('https://p/alice', 'VOUCHES_FOR', 'a b://c')]
+    assert merged == {}
+
+
+def test_organization_id_with_malformed_website():
+    record = {'name': 'Acre', 'assignee': 'Website: https://acre.org'}
+    variant = {'name': 'ACRE\n', 'assignee': 'Website: https://acre.org/'}
+    assert organization_id(record) == organization_id(variant)
+
+
+def test_organization_id_tells_apart_same_names_without_a_website():
+    first = {'name': 'Regen Network', 'assignee': None, 'submittedbyemail': 'a@x.org'}
+    second = dict(first, submittedbyemail='b@y.org')
+    assert organization_id(first) != organization_id(second)
+    assert organization_id(first) == organization_id(dict(first, submittedbyemail=' A@X.org'))
+    # a website is identity enough
+    website = {'assignee': 'https://regen.network'}
+    assert organization_id(dict(first, **website)) == organization_id(dict(second, **website))
+    # kept duplicates are one document per row
+    assert organization_id(first, row=2) != organization_id(first, row=3)
@@ -0,0 +1,97 @@
+import pytest
+
+from fetcher import ProfileFetcher
+from http_cache import HTTPCache
+from stub_server import StubServer
+
+
+@pytest.fixture
+def stub():
+    with StubServer(count=20) as server:
+        yield server
+
+
+def profile_urls(stub):
+    return list(stub.profiles)
+
+
+def path(stub, url):
+    return url[len(stub.base_url):]
+
+
+def test_each_profile_is_fetched_once(stub):
+    urls = profile_urls(stub)
+    with ProfileFetcher(max_workers=4) as fetcher:
+        results = fetcher.fetch_all(urls + urls[::-1])
+        assert fetcher.get_json(urls[0]) == stub.profiles[urls[0]]
+    assert results == stub.profiles
+    assert fetcher.stats == {'fetched': len(urls)}
+    assert set(stub.requests.values()) == {1}
+
+
+@pytest.mark.parametrize('statuses', [[503], [429], [500, 502, 429]])
+def test_transient_errors_are_retried(stub, statuses):
+    url = profile_urls(stub)[0]
+    stub.failures[path(stub, url)].extend(statuses)
+    with ProfileFetcher(retries=3, backoff=0.01) as fetcher:
+        assert fetcher.get_json(url) == stub.profiles[url]
+    assert stub.requests[path(stub, url)] == len(statuses) + 1
+    assert not fetcher.errors
+
+
+def test_giving_up_after_the_retries(stub):
+    url = profile_urls(stub)[0]
+    stub.failures[path(stub, url)].extend([503] * 5)
+    with ProfileFetcher(retries=2, backoff=0.01) as fetcher:
+        assert fetcher.get_json(url) is None
+    assert stub.requests[path(stub, url)] == 3
+    assert url in fetcher.errors
+
+
+def test_not_found_is_not_retried(stub):
+    url = stub.base_url + '/profiles/missing'
+    with ProfileFetcher(backoff=0.01) as fetcher:
+        assert fetcher.fetch_all([url]) == {url: None}
+    assert stub.requests['/profiles/missing'] == 1
+
+
+@pytest.mark.parametrize('per_host', [1, 3])
+def test_requests_per_host_are_limited(per_host):
+    with StubServer(count=12, delay=0.03) as stub, \
+            ProfileFetcher(max_workers=6, per_host=per_host) as fetcher:
+        fetcher.fetch_all(profile_urls(stub))
+    assert stub.max_active == per_host
+
+
+def test_cached_profiles_are_revalidated_with_their_etag(stub, tmp_path):
+    urls = profile_urls(stub)
+    with HTTPCache(str(tmp_path / 'cache.sqlite')) as cache:
+        with ProfileFetcher(cache=cache) as fetcher:
+            fetcher.fetch_all(urls)
+        assert fetcher.stats == {'fetched': len(urls)}
+        assert cache.get(urls[0]).etag
+
+        # the next run: one profile changed, the others answer 304
+        stub.profiles[urls[0]] = dict(stub.profiles[urls[0]], name='renamed')
+        with ProfileFetcher(cache=cache) as fetcher:
+            results = fetcher.fetch_all(urls)
+        assert results == stub.profiles
+        assert fetcher.stats == {'fetched': 1, 'not_modified': len(urls) - 1}
+        assert stub.not_modified == len(urls) - 1
+        assert cache.get(urls[0]).body['name'] == 'renamed'
+
+
+def test_unchanged_last_updated_skips_the_request(stub, tmp_path):
+    urls = profile_urls(stub)
+    with HTTPCache(str(tmp_path / 'cache.sqlite')) as cache:
+        with ProfileFetcher(cache=cache) as fetcher:
+            fetcher.fetch_all(urls, dict.fromkeys(urls, 100))
+        requests = stub.hits
+        with ProfileFetcher(cache=cache) as fetcher:
+            changed = {url: 100 for url in urls}
+            changed[urls[0]] = 200
+            results = fetcher.fetch_all(urls, changed)
+        assert results == stub.profiles
+        assert fetcher.stats == {'cached': len(urls) - 1, 'not_modified': 1}
+        assert stub.hits == requests + 1
+        assert cache.get(urls[0]).last_updated == 200
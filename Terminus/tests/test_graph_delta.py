@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from fake_terminusdb import FakeWOQLClient
+from graph_delta import delta_path, update_graph
+from graph_format import load_graph
+
+
+def person(n, name=None, vouches_for=(), li=()):
+    return {'@type': 'person', '@id': f"person/p{n}", 'name': name or f"person {n}",
+            'description': f"about {n}", 'vouches_for': [f"person/p{k}" for k in vouches_for],
+            'LI': [f"person/p{k}" for k in li]}
+
+
+def triples(graph):
+    return {(r['source'], r['target'], r['type']) for r in graph['relations']}
+
+
+@pytest.fixture
+def client():
+    client = FakeWOQLClient()
+    client.connect(db='murmurations', team='Myseelia')
+    client.insert_document([person(n, vouches_for=[(n + 1) % 20], li=[(n + 2) % 20])
+                            for n in range(20)])
+    return client
+
+
+def test_diff_version_lists_inserted_modified_and_deleted_documents(client):
+    before = client.log(count=1)[0]['identifier']
+    client.insert_document(person(20))
+    client.replace_document(person(1, name='renamed', vouches_for=[2], li=[3]))
+    client.delete_document('person/p2')
+    # written and deleted in between: no change at all
+    client.insert_document(person(21))
+    client.delete_document('person/p21')
+    after = client.log(count=1)[0]['identifier']
+
+    patches = client.diff_version(before, after)
+    assert [p['@insert']['@id'] for p in patches if p.get('@op') == 'Insert'] == ['person/p20']
+    assert [p['@delete']['@id'] for p in patches if p.get('@op') == 'Delete'] == ['person/p2']
+    modified = [p for p in patches if '@op' not in p]
+    assert modified == [{'@id': 'person/p1', 'name': {'@op': 'SwapValue', '@before': 'person 1',
+                                                      '@after': 'renamed'}}]
+    assert client.diff_version(after, after) == []
+
+
+def test_update_graph_applies_inserts_modifications_and_deletions(client, tmp_path):
+    path = str(tmp_path / 'people.bin')
+    assert update_graph(client, 'person', path) is None
+    before = load_graph(path)
+    assert ('person/p2', 'person/p3', 'vouches_for') in triples(before)
+
+    client.insert_document(person(20, vouches_for=[0]))
+    client.replace_document(person(1, name='renamed', vouches_for=[5], li=[3]))
+    client.replace_document(person(0, vouches_for=[1], li=[20]))
+    client.replace_document(person(19, vouches_for=[0], li=[5]))
+    client.delete_document('person/p2')
+
+    delta = update_graph(client, 'person', path)
+    assert delta is not None and delta['from'] != delta['to']
+    with open(delta_path(path)) as f:
+        assert json.load(f) == delta
+
+    added = {e['id']: e for e in delta['entities']['added']}
+    assert added['person/p20']['label'] == 'person 20'
+    assert added['person/p1']['label'] == 'renamed'
+    assert delta['entities']['removed'] == ['person/p2']
+    relation = lambda r: (r['source'], r['target'], r['type'])
+    assert {relation(r) for r in delta['relations']['added']} == {
+        ('person/p20', 'person/p0', 'vouches_for'), ('person/p1', 'person/p5', 'vouches_for'),
+        ('person/p0', 'person/p20', 'LI'), ('person/p19', 'person/p5', 'LI')}
+    # the deleted document's relations go with it, and so do links to it
+    assert {relation(r) for r in delta['relations']['removed']} == {
+        ('person/p2', 'person/p3', 'vouches_for'), ('person/p2', 'person/p4', 'LI'),
+        ('person/p1', 'person/p2', 'vouches_for'), ('person/p0', 'person/p2', 'LI'),
+        ('person/p19', 'person/p1', 'LI')}
+
+    # the patched graph is the graph a full export makes
+    graph = load_graph(path)
+    full = str(tmp_path / 'full.bin')
+    update_graph(client, 'person', full)
+    expected = load_graph(full)
+    assert triples(graph) == triples(expected)
+    labels = lambda g: {e['id']: e['label'] for e in g['entities']}
+    assert labels(graph) == labels(expected)
+    assert 'person/p2' not in labels(graph)
+
+
+def test_one_document_changes_only_its_neighbourhood(tmp_path):
+    client = FakeWOQLClient()
+    client.connect(db='murmurations', team='Myseelia')
+    client.insert_document([person(n, vouches_for=[(n + 1) % 300], li=[(n + 7) % 300])
+                            for n in range(300)])
+    path = str(tmp_path / 'people.bin')
+    update_graph(client, 'person', path)
+
+    client.insert_document(person(300, vouches_for=[0]))
+    delta = update_graph(client, 'person', path)
+
+    added = {e['id'] for e in delta['entities']['added']}
+    assert {'person/p300', 'person/p0'} <= added
+    # the new person's vouch lifts PageRank down the chain for a few hops, no further
+    assert len(added) < 15
+    # every size in the component went up by one, listed apart from the entities
+    assert len(delta['measures']) == 301 - len(added)
+    assert {m['component_size'] for m in delta['measures'].values()} == {301}
+    graph = {e['id']: e for e in load_graph(path)['entities']}
+    assert all(graph[i]['component_size'] == 301 for i in delta['measures'])
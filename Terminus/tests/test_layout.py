@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import layout
+from bench_subgraph import synthetic
+from layout import INCREMENTAL_ITERATIONS, ITERATIONS, layout_graph
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """The bodies of every tree built and the nodes of every repulsion step."""
+    trees, steps = [], []
+    tree_init, repulsion = layout._Tree.__init__, layout.repulsion
+
+    def init(self, positions):
+        trees.append(positions.shape[1])
+        tree_init(self, positions)
+
+    def counting_repulsion(positions, k, fixed=None):
+        steps.append(len(positions))
+        return repulsion(positions, k, fixed)
+
+    monkeypatch.setattr(layout._Tree, '__init__', init)
+    monkeypatch.setattr(layout, 'repulsion', counting_repulsion)
+    return trees, steps
+
+
+def add_organizations(graph, count):
+    new = [f'Organization/new{i}' for i in range(count)]
+    for i, entity_id in enumerate(new):
+        graph['entities'].append({'id': entity_id, 'label': entity_id, 'type': 'organization'})
+        graph['relations'].append({'source': entity_id, 'target': f'topic{i % 3 + 1}', 'type': 'topic'})
+    return set(new)
+
+
+@pytest.mark.parametrize('organizations', [200, 1000])
+@pytest.mark.parametrize('new', [1, 10])
+def test_incremental_work_grows_with_moved_nodes(counted, organizations, new):
+    trees, steps = counted
+    _, graph = synthetic(organizations)
+    layout_graph(graph)
+    before = {e['id']: (e['x'], e['y']) for e in graph['entities']}
+    del trees[:], steps[:]
+
+    moved = layout_graph(graph, add_organizations(graph, new))
+
+    fixed = len(graph['entities']) - len(moved)
+    # the fixed nodes are sorted into a tree once, every step only sees the moved ones
+    assert trees.count(fixed) == 1
+    assert set(trees) - {fixed} == {len(moved)}
+    assert steps and set(steps) == {len(moved)}
+    assert len(steps) <= INCREMENTAL_ITERATIONS
+    assert len(moved) == new + min(new, 3)
+    for entity in graph['entities']:
+        if entity['id'] not in moved:
+            assert (entity['x'], entity['y']) == before[entity['id']]
+
+
+def test_full_layout_stops_once_settled(counted):
+    _, steps = counted
+    graph = {'entities': [{'id': str(i)} for i in range(20)],
+             'relations': [{'source': str(i), 'target': str(i + 1)} for i in range(19)]}
+    layout_graph(graph)
+    assert len(steps) < ITERATIONS
+    positions = np.array([(e['x'], e['y']) for e in graph['entities']])
+    links = np.linalg.norm(positions[1:] - positions[:-1], axis=1)
+    assert np.all(links < 3 * layout.EDGE_LENGTH)
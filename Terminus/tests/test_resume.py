@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+from functools import partial
+
+import pytest
+
+import ingest
+from bench_ingest import synthetic_csv
+from checkpoint import Checkpoint
+from fake_meilisearch import FakeMeilisearch
+from fake_terminusdb import FakeWOQLClient
+from search_sink import SearchSink
+
+ROWS = 2000
+
+
+@pytest.fixture
+def organizations(tmp_path):
+    """A synthetic Organizations.csv in which every 10th row from 500 on is a
+    near-duplicate of the row 400 before it."""
+    path = str(tmp_path / 'Organizations.csv')
+    synthetic_csv(ROWS, path)
+    with open(path, newline='') as f:
+        header, *rows = list(csv.reader(f))
+    for n in range(500, ROWS, 10):
+        original = rows[n - 400]
+        rows[n][0] = original[0].replace('https://', 'http://www.')
+        rows[n][6] = original[6].upper() + '!'
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows([header, *rows])
+    return path
+
+
+def load(monkeypatch, client, search, path, batch_size, *options):
+    monkeypatch.setattr(ingest, 'WOQLClient', lambda *a, **k: client)
+    # small index batches, so a crash finds some of them confirmed and some not
+    monkeypatch.setattr(ingest, 'SearchSink', partial(SearchSink, max_documents=300))
+    return ingest.main(['--meilisearch', search.url, '--meilisearch-key', 'key', 'csv', path,
+                        '--batch-size', str(batch_size), '--workers', '1', '-q', *options])
+
+
+def test_resumed_load_matches_a_clean_one(monkeypatch, organizations, tmp_path):
+    with FakeMeilisearch() as search:
+        clean = FakeWOQLClient()
+        assert load(monkeypatch, clean, search, organizations, 250) == 0
+        expected = clean.documents['Organization'], search.indexes['orgs']
+
+    with FakeMeilisearch() as search:
+        client = FakeWOQLClient()
+        replace_document = client.replace_document
+        calls = []
+
+        def crash_on_tenth(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 10:
+                raise ConnectionError("lost the connection")
+            return replace_document(*args, **kwargs)
+
+        client.replace_document = crash_on_tenth
+        with pytest.raises(ConnectionError):
+            load(monkeypatch, client, search, organizations, 111)
+        client.replace_document = replace_document
+
+        checkpoint = Checkpoint(organizations + '.checkpoint.json', organizations, 'play')
+        assert checkpoint.committed == 9 * 111
+        skip = checkpoint.resume
+        # the rerun's batches of 250 rows don't line up with the 111 rows ones
+        assert 0 < skip and skip % 250
+        assert len(client.documents['Organization']) < len(expected[0])
+
+        report = str(tmp_path / 'metrics.json')
+        assert load(monkeypatch, client, search, organizations, 250, '--metrics-json', report) == 0
+        with open(report) as f:
+            counters = json.load(f)['counters']
+        assert counters['skipped'] == skip
+        assert counters['rows'] == ROWS - skip
+        assert client.documents['Organization'] == expected[0]
+        assert search.indexes['orgs'] == expected[1]
+        # a finished load forgets its checkpoint
+        assert not os.path.exists(checkpoint.path)
+
+
+def test_kept_duplicates_are_documents_of_their_own(monkeypatch, organizations):
+    with FakeMeilisearch() as search:
+        client = FakeWOQLClient()
+        assert load(monkeypatch, client, search, organizations, 250, '--keep-duplicates') == 0
+        assert len(client.documents['Organization']) == ROWS
+        assert len(search.indexes['orgs']) == ROWS
+
+
+def test_checkpoint_resumes_at_the_slower_sink(tmp_path, organizations):
+    path = str(tmp_path / 'checkpoint.json')
+    checkpoint = Checkpoint(path, organizations, 'play')
+    checkpoint.save(committed=700, indexed=450)
+    assert Checkpoint(path, organizations, 'play').resume == 450
+    # another database, or a changed file, starts from the top
+    assert Checkpoint(path, organizations, 'other').resume == 0
+    with open(organizations, 'a') as f:
+        f.write('\n')
+    assert Checkpoint(path, organizations, 'play').resume == 0
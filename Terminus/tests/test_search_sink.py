@@ -0,0 +1,130 @@
+import json
+
+import meilisearch
+import pytest
+
+import ingest
+from fake_meilisearch import FakeMeilisearch
+from fake_terminusdb import FakeWOQLClient
+from search_sink import IndexingError, SearchSink
+
+
+def documents(count, start=0, text=''):
+    return [{'id': str(n), 'name': f"organization {n}{text}"} for n in range(start, start + count)]
+
+
+def open_index(fake, name='orgs'):
+    return meilisearch.Client(fake.url, 'key').index(name)
+
+
+def test_batches_are_capped_in_documents_and_bytes():
+    with FakeMeilisearch() as fake:
+        index = open_index(fake)
+        sink = SearchSink(index, max_documents=100)
+        sink.add(documents(120))
+        sink.add(documents(130, start=120))
+        sink.close()
+        assert [r.documents for r in sink.results] == [100, 100, 50]
+
+        batch = documents(25, start=1000, text='x' * 200)
+        line = len(json.dumps(batch[0]).encode('utf-8')) + 1
+        sink = SearchSink(index, max_bytes=10 * line + 5)
+        sink.add(batch)
+        sink.close()
+        assert [r.documents for r in sink.results] == [10, 10, 5]
+        assert all(r.bytes <= 10 * line + 5 for r in sink.results)
+        assert len(fake.indexes['orgs']) == 275
+
+
+def test_a_document_larger_than_a_batch_is_refused():
+    with FakeMeilisearch() as fake:
+        sink = SearchSink(open_index(fake), max_bytes=100)
+        with pytest.raises(IndexingError):
+            sink.add(documents(1, text='x' * 200))
+
+
+def unfinished_tasks(fake):
+    fake._process()
+    return sum(task['status'] == 'enqueued' for task in fake.tasks.values())
+
+
+@pytest.mark.parametrize('max_in_flight', [1, 2, 10])
+def test_add_waits_once_max_in_flight_tasks_are_enqueued(max_in_flight):
+    with FakeMeilisearch(task_delay=0.05) as fake:
+        index = open_index(fake)
+        send = index.add_documents_ndjson
+        waiting = []
+
+        def tracked(*args, **kwargs):
+            waiting.append(unfinished_tasks(fake))
+            return send(*args, **kwargs)
+
+        index.add_documents_ndjson = tracked
+        sink = SearchSink(index, max_documents=10, max_in_flight=max_in_flight,
+                          poll_interval=0.01)
+        sink.add(documents(60))
+        # five batches were sent (the sixth waits for close), and every one
+        # past the cap had to wait for the oldest task first
+        assert len(sink.results) == max(0, 5 - max_in_flight)
+        sink.close()
+    assert len(waiting) == 6
+    # never more tasks left enqueued than allowed
+    assert max(waiting) <= max_in_flight - 1
+    assert all(r.status == 'succeeded' for r in sink.results)
+
+
+def test_failed_tasks_are_reported():
+    with FakeMeilisearch(fail_every=2) as fake:
+        sink = SearchSink(open_index(fake), max_documents=10)
+        sink.add(documents(40))
+        sink.close()
+    statuses = [r.status for r in sink.results]
+    assert 'failed' in statuses and 'succeeded' in statuses
+    assert len(sink.failures) == statuses.count('failed')
+    assert sink.documents == 10 * statuses.count('succeeded')
+    # only what precedes the first failure counts as confirmed, for checkpoints
+    assert sink.confirmed == 10 * statuses.index('failed')
+    report = sink.report()
+    assert f"indexed {sink.documents} documents in 4 batches" in report
+    assert report.count('failed') == len(sink.failures)
+    assert 'injected failure' in report
+
+
+def test_deletes_are_queued_after_the_adds_before_them():
+    with FakeMeilisearch(task_delay=0.01) as fake:
+        sink = SearchSink(open_index(fake), max_documents=10, max_in_flight=1)
+        sink.add(documents(15))
+        sink.delete(['3', '12'])
+        sink.add(documents(2, start=3))
+        sink.delete([])
+        sink.close()
+        # the buffered five went out before the delete, which had to wait its turn
+        assert [(r.documents, r.deleted) for r in sink.results] == [(10, 0), (5, 0), (0, 2), (2, 0)]
+        assert all(r.status == 'succeeded' for r in sink.results)
+        assert sorted(fake.indexes['orgs'], key=int) == [str(n) for n in range(15) if n != 12]
+        assert sink.deleted == 2 and sink.confirmed == 17
+        assert "deleted 2" in sink.report()
+
+
+def test_failed_deletes_are_reported():
+    with FakeMeilisearch(fail_every=2) as fake:
+        sink = SearchSink(open_index(fake))
+        sink.add(documents(5))
+        sink.delete(['1'])
+        sink.close()
+        assert len(fake.indexes['orgs']) == 5
+    assert [r.status for r in sink.results] == ['succeeded', 'failed']
+    assert sink.failures == sink.results[1:] and sink.deleted == 0
+    assert "1 deleted" in sink.report() and 'injected failure' in sink.report()
+
+
+def test_failed_indexing_fails_the_run(monkeypatch, tmp_path):
+    path = tmp_path / 'things.ndjson'
+    path.write_text(''.join(json.dumps({'name': f"thing {n}"}) + '\n' for n in range(30)))
+    client = FakeWOQLClient()
+    monkeypatch.setattr(ingest, 'WOQLClient', lambda *a, **k: client)
+    for fail_every, status in ((0, 0), (1, 1)):
+        with FakeMeilisearch(fail_every=fail_every) as fake:
+            assert ingest.main(['--meilisearch', fake.url, '--meilisearch-key', 'key', 'json',
+                                str(path), '--type', 'Thing', '--db', 'things',
+                                '--index', 'things', '-q']) == status
@@ -5,102 +5,91 @@ import * as fs from 'fs'
 
 const WOQL = TerminusClient.WOQL
 
-function findNameById(ids: object[], id: string): string {
-  console.log('finding id  ' + id);
-  const document = ids.find(doc => 'person/' + doc['id'] === id);
-  console.log('found name   ' + JSON.parse(document['name']));
-  return document ? JSON.parse(document['name']) : '';
+function unquote(value: unknown): unknown {
+  // older indexes stored every field as a JSON string
+  return typeof value === 'string' && value.startsWith('"') && value.endsWith('"') ? JSON.parse(value) : value
+}
+
+type Entity = { id: string; label: string; type: string }
+type Relation = { source: string; target: string; type: string }
+
+// Entities and relations are keyed in Maps, so every lookup is O(1)
+// instead of a scan of everything added so far
+class GraphBuilder {
+  entities = new Map<string, Entity>()
+  relations = new Map<string, Relation>()
+
+  addEntity(id: string, label: string, type: string): void {
+    if (!this.entities.has(id)) this.entities.set(id, { id, label, type })
+  }
+
+  addRelation(source: string, target: string, type: string): void {
+    const key = source + '\u0000' + target
+    if (!this.relations.has(key)) this.relations.set(key, { source, target, type })
+  }
+
+  toJSON(): { entities: Entity[]; relations: Relation[] } {
+    return {
+      entities: [...this.entities.values()],
+      relations: [...this.relations.values()]
+    }
+  }
 }
 
 export async function generateKnowledgeGraph(ids: object[]): Promise<object> {
-  const entities: { id: string; label: string; type: string }[] = []
-  const relations: { source: string; target: string; type: string }[] = []
+  const graph = new GraphBuilder()
+  const names = new Map<string, string>()
+  for (const document of ids) {
+    const personid = 'person/' + document['id']
+    if (!names.has(personid)) names.set(personid, unquote(document['name']) as string)
+  }
 
   for (const document of ids) {
     const personid = 'person/' + document['id']
-    let personEntity = entities.find(entity => entity.id === personid)
-    if (!personEntity) {
-      entities.push({
-        id: personid,
-        label: typeof document['name'] === 'string' && document['name'].startsWith('"') && document['name'].endsWith('"') ? JSON.parse(document['name']) : document['name'],
-        type: 'person'
-      })
-      personEntity = entities[entities.length - 1]
-    }
+    graph.addEntity(personid, names.get(personid) ?? '', 'person')
 
     const linktypes = ['vouches_for', 'LI']
     for (const link of linktypes) {
-      let linkValues = document[link];
+      let linkValues = document[link]
       if (typeof linkValues === 'string') {
         try {
-          linkValues = JSON.parse(linkValues);
+          linkValues = JSON.parse(linkValues)
         } catch (error) {
-          console.error(`Error parsing JSON for link "${link}":`, error);
+          console.error(`Error parsing JSON for link "${link}":`, error)
         }
       }
-      if (Array.isArray(linkValues)) {
-        for (const linkValue of linkValues) {
-          if (linkValue === undefined) continue
-          const linkId = linkValue.replace(/^"|"$/g, '')
-          if (linkId !== undefined && linkId !== '' && linkId.startsWith('person/')) {
-            let linkEntity = entities.find(
-              entity => entity.id === linkId
-            )
-            if (!linkEntity) {
-              entities.push({
-                id: linkId,
-                label: findNameById(ids, linkId),
-                type: 'person'
-              })
-              linkEntity = entities[entities.length - 1]
-            }
-            let linkRelation = relations.find(
-              relation =>
-                relation.source === personid && relation.target === linkId
-            )
-            if (!linkRelation) {
-              relations.push({
-                source: personid,
-                target: linkId,
-                type: link
-              })
-            }
-          }
-        }
-      } else {
-        let linkId = linkValues
-        if (linkId !== undefined && linkId !== '' && linkId.startsWith('person/')) {
-          linkId = linkId.replace(/^"|"$/g, '')
-          let linkEntity = entities.find(
-            entity => entity.id === linkId
-          )
-          if (!linkEntity) {
-            entities.push({
-              id: linkId,
-              label: document[link],
-              type: 'person'
-            })
-            linkEntity = entities[entities.length - 1]
-          }
-          let linkRelation = relations.find(
-            relation =>
-              relation.source === personid && relation.target === linkId
-          )
-          if (!linkRelation) {
-            relations.push({
-              source: personid,
-              target: linkId,
-              type: link
-            })
-          }
-        }
+      const values = Array.isArray(linkValues) ? linkValues : [linkValues]
+      for (const linkValue of values) {
+        if (typeof linkValue !== 'string') continue
+        const linkId = linkValue.replace(/^"|"$/g, '')
+        if (!linkId.startsWith('person/')) continue
+        graph.addEntity(linkId, names.get(linkId) ?? '', 'person')
+        graph.addRelation(personid, linkId, link)
       }
     }
   }
-  return {
-    entities: entities,
-    relations: relations
+  return graph.toJSON()
+}
+
+// Terminus/subgraph.py serves the graph for a set of hits from an index
+// precomputed on the server; without it the graph is built here
+const SUBGRAPH_URL = import.meta.env.VITE_SUBGRAPH_URL
+
+export async function fetchKnowledgeGraph(graph: string, hits: object[]): Promise<object> {
+  if (SUBGRAPH_URL) {
+    try {
+      const response = await fetch(`${SUBGRAPH_URL}/subgraph/${graph}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ids: hits.map(hit => hit['id']) })
+      })
+      if (response.ok) return await response.json()
+      console.error(`subgraph service returned ${response.status}`)
+    } catch (error) {
+      console.error('subgraph service unavailable:', error)
+    }
   }
+  return generateKnowledgeGraph(hits)
 }
 
 export default generateKnowledgeGraph
@@ -5,119 +5,93 @@ import * as fs from 'fs'
 
 const WOQL = TerminusClient.WOQL
 
+type Entity = { id: string; label: string; type: string }
+type Relation = { source: string; target: string; type: string }
+
+// Entities and relations are keyed in Maps, so every lookup is O(1)
+// instead of a scan of everything added so far
+class GraphBuilder {
+  entities = new Map<string, Entity>()
+  relations = new Map<string, Relation>()
+
+  addEntity(id: string, label: string, type: string): void {
+    if (!this.entities.has(id)) this.entities.set(id, { id, label, type })
+  }
+
+  addRelation(source: string, target: string, type: string): void {
+    const key = source + '\u0000' + target
+    if (!this.relations.has(key)) this.relations.set(key, { source, target, type })
+  }
+
+  toJSON(): { entities: Entity[]; relations: Relation[] } {
+    return {
+      entities: [...this.entities.values()],
+      relations: [...this.relations.values()]
+    }
+  }
+}
+
+function parseValues(values: unknown): unknown {
+  // older indexes stored every field as a JSON string
+  if (typeof values === 'string') {
+    try {
+      return JSON.parse(values)
+    } catch (error) {
+      console.log(error)
+    }
+  }
+  return values
+}
+
 export async function generateKnowledgeGraph(ids: object[]): Promise<object> {
-  const entities: { id: string; label: string; type: string }[] = []
-  const relations: { source: string; target: string; type: string }[] = []
+  const graph = new GraphBuilder()
   for (const document of ids) {
     const orgid = 'Organization/' + document['id']
-      let orgEntity = entities.find(entity => entity.id === orgid)
-      if (!orgEntity) {
-        entities.push({
-          id: orgid,
-          label: document['name'],
-          type: 'organization'
-        })
-        orgEntity = entities[entities.length - 1]
-      }
+    graph.addEntity(orgid, document['name'], 'organization')
 
-      if (document['assignee'] !== undefined) {
-        const assigneeId = document['assignee'].replace(/^"|"$/g, '')
-        if (assigneeId !== undefined && assigneeId !== '') {
-          let assigneeEntity = entities.find(entity => entity.id === assigneeId)
-          if (!assigneeEntity) {
-            entities.push({
-              id: assigneeId,
-              label: document['name'] + ' assignee',
-              type: 'attribute'
-            })
-            assigneeEntity = entities[entities.length - 1]
-          }
-          let assigneeRelation = relations.find(
-            relation =>
-              relation.source === orgid && relation.target === assigneeId
-          )
-          if (!assigneeRelation) {
-            relations.push({
-              source: orgid,
-              target: assigneeId,
-              type: 'assignee'
-            })
-          }
-        }
+    if (document['assignee'] !== undefined) {
+      const assigneeId = document['assignee'].replace(/^"|"$/g, '')
+      if (assigneeId !== '') {
+        graph.addEntity(assigneeId, document['name'] + ' assignee', 'attribute')
+        graph.addRelation(orgid, assigneeId, 'assignee')
       }
+    }
 
-      const ecosystems = ['blockchainecosystem', 'web3', 'topic', 'impactarea']
-for (const ecosystem of ecosystems) {
-  let ecosystemValues = document[ecosystem]
-  try {
-    ecosystemValues = JSON.parse(ecosystemValues)
-  } catch (error) {
-    console.log(error)
-  }
-        if (Array.isArray(ecosystemValues)) {
-          for (const ecosystemValue of ecosystemValues) {
-            if(ecosystemValue === undefined) continue; 
-            const ecosystemId = ecosystemValue.replace(/^"|"$/g, '')
-            if (ecosystemId !== undefined && ecosystemId !== '') {
-              let ecosystemEntity = entities.find(
-                entity => entity.id === ecosystemId
-              )
-              if (!ecosystemEntity) {
-                entities.push({
-                  id: ecosystemId,
-                  label: ecosystemValue,
-                  type: 'attribute'
-                })
-                ecosystemEntity = entities[entities.length - 1]
-              }
-              let ecosystemRelation = relations.find(
-                relation =>
-                  relation.source === orgid && relation.target === ecosystemId
-              )
-              if (!ecosystemRelation) {
-                relations.push({
-                  source: orgid,
-                  target: ecosystemId,
-                  type: ecosystem
-                })
-              }
-            }
-          }
-        } else {
-          let ecosystemId = ecosystemValues
-          // console.log(ecosystemId)
-          if (ecosystemId !== undefined && ecosystemId !== '') {
-            ecosystemId = ecosystemId.replace(/^"|"$/g, '')
-            let ecosystemEntity = entities.find(
-              entity => entity.id === ecosystemId
-            )
-            if (!ecosystemEntity) {
-              entities.push({
-                id: ecosystemId,
-                label: document[ecosystem],
-                type: 'attribute'
-              })
-              ecosystemEntity = entities[entities.length - 1]
-            }
-            let ecosystemRelation = relations.find(
-              relation =>
-                relation.source === orgid && relation.target === ecosystemId
-            )
-            if (!ecosystemRelation) {
-              relations.push({
-                source: orgid,
-                target: ecosystemId,
-                type: ecosystem
-              })
-            }
-          }
-        }
+    const ecosystems = ['blockchainecosystem', 'web3', 'topic', 'impactarea']
+    for (const ecosystem of ecosystems) {
+      const ecosystemValues = parseValues(document[ecosystem])
+      const values = Array.isArray(ecosystemValues) ? ecosystemValues : [ecosystemValues]
+      for (const ecosystemValue of values) {
+        if (typeof ecosystemValue !== 'string') continue
+        const ecosystemId = ecosystemValue.replace(/^"|"$/g, '')
+        if (ecosystemId === '') continue
+        graph.addEntity(ecosystemId, ecosystemValue, 'attribute')
+        graph.addRelation(orgid, ecosystemId, ecosystem)
+      }
     }
   }
-  return {
-    entities: entities,
-    relations: relations
+  return graph.toJSON()
+}
+
+// Terminus/subgraph.py serves the graph for a set of hits from an index
+// precomputed on the server; without it the graph is built here
+const SUBGRAPH_URL = import.meta.env.VITE_SUBGRAPH_URL
+
+export async function fetchKnowledgeGraph(graph: string, hits: object[]): Promise<object> {
+  if (SUBGRAPH_URL) {
+    try {
+      const response = await fetch(`${SUBGRAPH_URL}/subgraph/${graph}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ids: hits.map(hit => hit['id']) })
+      })
+      if (response.ok) return await response.json()
+      console.error(`subgraph service returned ${response.status}`)
+    } catch (error) {
+      console.error('subgraph service unavailable:', error)
+    }
   }
+  return generateKnowledgeGraph(hits)
 }
 
 export default generateKnowledgeGraph
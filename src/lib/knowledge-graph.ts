@@ -0,0 +1,107 @@
+// Reader for the binary knowledge graph written by Terminus/graph_format.py.
+// Every section is a typed array view straight over the fetched buffer;
+// only the string table and the IDs are decoded.
+
+export type Entity = { id: string; label: string; type: string; [property: string]: unknown }
+export type Relation = { source: string; target: string; type: string }
+export type KnowledgeGraph = { entities: Entity[]; relations: Relation[] }
+
+type Header = {
+  entities: number
+  nodes: number
+  hashed: number
+  relations: number
+  strings: number
+  string_bytes: number
+  prefixes: string[]
+  types: string[]
+  relation_types: string[]
+  properties: [string, 'string' | 'number'][]
+}
+
+const HEX = Array.from({ length: 256 }, (_, i) => i.toString(16).padStart(2, '0'))
+
+export function decodeKnowledgeGraph(buffer: ArrayBuffer): KnowledgeGraph {
+  const bytes = new Uint8Array(buffer)
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== 'MKG1') {
+    throw new Error('not a binary knowledge graph')
+  }
+  const headerLength = new DataView(buffer).getUint32(4, true)
+  const decoder = new TextDecoder()
+  const header: Header = JSON.parse(decoder.decode(bytes.subarray(8, 8 + headerLength)))
+
+  let position = 8 + headerLength
+  function section<T>(Type: { new (b: ArrayBuffer, o: number, n: number): T; BYTES_PER_ELEMENT: number }, count: number): T {
+    position += (8 - (position % 8)) % 8
+    const view = new Type(buffer, position, count)
+    position += count * Type.BYTES_PER_ELEMENT
+    return view
+  }
+
+  const stringOffsets = section(Uint32Array, header.strings + 1)
+  const stringBytes = section(Uint8Array, header.string_bytes)
+  const strings: string[] = new Array(header.strings)
+  for (let i = 0; i < header.strings; i++) {
+    strings[i] = decoder.decode(stringBytes.subarray(stringOffsets[i], stringOffsets[i + 1]))
+  }
+
+  const digests = section(Uint8Array, header.hashed * 32)
+  const idPrefix = section(Uint8Array, header.hashed)
+  const idString = section(Uint32Array, header.nodes - header.hashed)
+  const labels = section(Uint32Array, header.entities)
+  const entityType = section(Uint8Array, header.entities)
+  const offsets = section(Uint32Array, header.nodes + 1)
+  const targets = section(Uint32Array, header.relations)
+  const relationType = section(Uint8Array, header.relations)
+  const columns = header.properties.map(([name, kind]) =>
+    [name, kind === 'string' ? section(Int32Array, header.entities) : section(Float32Array, header.entities)] as const
+  )
+
+  const ids: string[] = new Array(header.nodes)
+  for (let i = 0; i < header.hashed; i++) {
+    let hex = ''
+    for (let j = i * 32; j < i * 32 + 32; j++) hex += HEX[digests[j]]
+    ids[i] = header.prefixes[idPrefix[i]] + hex
+  }
+  for (let i = header.hashed; i < header.nodes; i++) ids[i] = strings[idString[i - header.hashed]]
+
+  const entities: Entity[] = new Array(header.entities)
+  for (let i = 0; i < header.entities; i++) {
+    const entity: Entity = { id: ids[i], label: strings[labels[i]], type: header.types[entityType[i]] }
+    for (const [name, column] of columns) {
+      const value = column[i]
+      if (column instanceof Int32Array) {
+        if (value >= 0) entity[name] = strings[value]
+      } else if (!Number.isNaN(value)) {
+        entity[name] = value
+      }
+    }
+    entities[i] = entity
+  }
+
+  const relations: Relation[] = new Array(header.relations)
+  for (let source = 0; source < header.nodes; source++) {
+    for (let k = offsets[source]; k < offsets[source + 1]; k++) {
+      relations[k] = { source: ids[source], target: ids[targets[k]], type: header.relation_types[relationType[k]] }
+    }
+  }
+  return { entities, relations }
+}
+
+export async function loadKnowledgeGraph(url: string): Promise<KnowledgeGraph> {
+  const response = await fetch(url)
+  if (!response.ok) throw new Error(`loading ${url}: ${response.status}`)
+  return decodeKnowledgeGraph(await response.arrayBuffer())
+}
+
+// Graphs exported by Terminus/layout.py carry x/y on every entity, so
+// Cytoscape can place them as they are instead of running 'cose'
+export function nodePosition(entity: { x?: unknown; y?: unknown }): { x: number; y: number } | undefined {
+  return typeof entity.x === 'number' && typeof entity.y === 'number' ? { x: entity.x, y: entity.y } : undefined
+}
+
+export function graphLayout(entities: { x?: unknown; y?: unknown }[]): { name: string; fit?: boolean } {
+  return entities.length > 0 && entities.every(entity => nodePosition(entity) !== undefined)
+    ? { name: 'preset', fit: true }
+    : { name: 'cose' }
+}